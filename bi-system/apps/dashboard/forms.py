@@ -54,7 +54,7 @@ class DataSourceForm(forms.ModelForm):
 
     class Meta:
         model = DataSource
-        fields = ['name', 'db_type', 'host', 'port', 'username', 'password', 'db_name']
+        fields = ['name', 'db_type', 'host', 'port', 'username', 'password', 'db_name', 'max_concurrent_queries']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'db_type': forms.Select(attrs={'class': 'form-select'}),
@@ -62,8 +62,18 @@ class DataSourceForm(forms.ModelForm):
             'port': forms.NumberInput(attrs={'class': 'form-control'}),
             'username': forms.TextInput(attrs={'class': 'form-control'}),
             'db_name': forms.TextInput(attrs={'class': 'form-control'}),
+            'max_concurrent_queries': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('db_type') not in DataSource.LOCAL_DB_TYPES:
+            # Server databases need a host and a user; local files only a path
+            for field in ('host', 'username'):
+                if not cleaned_data.get(field):
+                    self.add_error(field, '此字段为必填项')
+        return cleaned_data
+
     def save(self, commit=True):
         datasource = super().save(commit=False)
         if self.cleaned_data['password']:
@@ -21,7 +21,7 @@ urlpatterns = [
     path('system/permission/edit/<int:pk>', views.generic_view, name='role_edit'),
     path('system/permission/delete/<int:pk>', views.generic_view, name='role_delete'),
 
-    path('system/scheduler', views.generic_view, name='scheduler_list'),
+    path('system/scheduler', views.scheduler_list_view, name='scheduler_list'),
     path('system/log', views.generic_view, name='log_list'),
     
     path('datasource', views.datasource_list_view, name='datasource_list'),
@@ -59,6 +59,7 @@ urlpatterns = [
     path('api/dataset/<int:dataset_id>/delete', views.api_delete_dataset, name='api_delete_dataset'),
     path('api/dataset/<int:dataset_id>/detail', views.api_get_dataset_detail, name='api_get_dataset_detail'),
     path('api/dataset/preview_sql', views.api_preview_sql, name='api_preview_sql'),
+    path('api/datasource/<int:datasource_id>/schema', views.api_get_datasource_schema, name='api_get_datasource_schema'),
     path('api/report/<int:report_id>/save_config', views.api_save_report_config, name='api_save_report_config'),
     path('api/report/<int:report_id>/save_meta', views.api_save_report_meta, name='api_save_report_meta'),
     path('api/report/<int:report_id>/publish', views.api_publish_report, name='api_publish_report'),
@@ -72,7 +73,7 @@ urlpatterns = [
 
     # API
     path('datasource/test/<int:datasource_id>', views.datasource_test_view, name='test_connection'),
-    path('datasource/test_params', views.not_implemented_api_view, name='test_connection_params'),
+    path('datasource/test_params', views.api_test_connection_params, name='test_connection_params'),
 
     # Catch-all for other paths to render generic view
     # Using re_path to capture everything else
@@ -3,22 +3,34 @@ import pandas as pd
 def aggregate_data(data, x_col, y_cols, agg_type, series_col=None):
     """
     Aggregates data based on x_col and agg_type.
-    :param data: List of dicts
+    :param data: List of dicts, or a columnar QueryResult
     :param x_col: Group by column
     :param y_cols: List of value columns or single string
     :param agg_type: 'sum', 'mean', 'max', 'min', 'count'
     :param series_col: Optional series column for pivoting
     :return: List of dicts (aggregated)
     """
-    if not data or not x_col or not agg_type or agg_type == 'none':
-        return data
+    # Columnar results go to pandas without building row dicts, but callers
+    # always get a list of dicts back
+    if hasattr(data, 'to_dataframe'):
+        result = data
+        data = None
+    else:
+        result = None
+
+    def unchanged():
+        return result.records() if result is not None else data
+
+    if (result is None and not data) or (result is not None and not len(result)) \
+            or not x_col or not agg_type or agg_type == 'none':
+        return unchanged()
 
     try:
-        df = pd.DataFrame(data)
+        df = result.to_dataframe() if result is not None else pd.DataFrame(data)
         
         # Ensure cols exist
         if x_col not in df.columns:
-            return data
+            return unchanged()
             
         if isinstance(y_cols, str):
             y_cols = [y_cols]
@@ -28,12 +40,12 @@ def aggregate_data(data, x_col, y_cols, agg_type, series_col=None):
         
         valid_y_cols = [c for c in y_cols if c in df.columns]
         if not valid_y_cols:
-            return data
+            return unchanged()
 
         # Convert Y cols to numeric
         for col in valid_y_cols:
-            # Handle string numbers with commas
-            if df[col].dtype == 'object':
+            # Handle string numbers with commas (object, or pandas' str dtype)
+            if not pd.api.types.is_numeric_dtype(df[col]):
                  df[col] = df[col].astype(str).str.replace(',', '')
             df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
@@ -53,9 +65,9 @@ def aggregate_data(data, x_col, y_cols, agg_type, series_col=None):
         elif agg_type == 'count':
             df_agg = df.groupby(group_cols)[valid_y_cols].count().reset_index()
         else:
-            return data
+            return unchanged()
             
         return df_agg.to_dict('records')
     except Exception as e:
         print(f"Aggregation error: {e}")
-        return data
+        return unchanged()
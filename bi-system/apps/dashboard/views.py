@@ -1,10 +1,11 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from core.auth.models import SysMenu, SysRole
 from core.data_source.models import DataSource
-from core.reporting.models import ScheduledTask, Report, ReportDirectory
+from core.reporting.models import ScheduledTask, ScheduledTaskRun, Report, ReportDirectory
 from apps.admin.logging.audit_logs.models import AuditLog
 from django.http import JsonResponse
 from django.contrib import messages
@@ -12,66 +13,37 @@ from django.views.decorators.http import require_http_methods
 from apps.dashboard.forms import DataSourceForm, DataSetForm, ReportForm, UserForm, SysRoleForm, SysMenuForm, ReportDirectoryForm
 from core.dataset.models import DataSet
 from core.dataset.executor import QueryExecutor
+from core.dataset.cache import QueryCache, get_dataset_cache_ttl
+from core.dataset.parallel import ExecutionPlan
+from core.dataset.resolver import SqlResolver, TemplateParamError, resolve_dataset, resolve_dataset_sql
+from core.dataset.dependencies import check_dependency_cycle
+from core.dataset.metadata import get_dataset_metadata, get_numeric_columns, get_unknown_filter_columns
+from core.dataset.rollup import RollupStore
+from core.dataset.extract import execute_dataset
+from core.dataset.admission import QueryRejected, admission_stats
 from core.data_source.connector import DBConnector
+from core.data_source.catalog import SchemaCatalog
+from core.data_source.health import DataSourceUnavailable, health_stats
+from core.data_source.pool import pool_stats
 from core.reporting.charts import ChartFactory
 import json
+import logging
 import time
 import importlib
 import os
-import re
 from django.conf import settings
 
-def resolve_dataset_sql(sql_script, depth=0, params=None):
+logger = logging.getLogger(__name__)
+
+def get_cache_flags(source):
     """
-    Recursively resolve {{ dataset:ID }} and {{ param:KEY }} placeholders in SQL.
+    Read the result cache flags from GET params or a JSON body.
+    _nocache=1 bypasses the cache, _refresh=1 re-runs the query and re-caches it.
+    Returns (use_cache, refresh).
     """
-    if not sql_script:
-        return sql_script
-    if depth > 5: # Prevent infinite recursion
-        return sql_script
-        
-    if params is None:
-        params = {}
-        
-    # 1. Resolve Parameters {{ param:key }}
-    def replace_param(match):
-        key = match.group(1)
-        val = params.get(key)
-        
-        if val is None:
-            return ""
-            
-        # Handle list/tuple (Multi-select)
-        if isinstance(val, (list, tuple)):
-            # If items are strings, wrap in quotes
-            formatted_items = []
-            for item in val:
-                if isinstance(item, str):
-                    formatted_items.append(f"'{item}'")
-                else:
-                    formatted_items.append(str(item))
-            return ",".join(formatted_items)
-            
-        return str(val)
-
-    param_pattern = r'\{\{\s*param:(\w+)\s*\}\}'
-    sql_script = re.sub(param_pattern, replace_param, sql_script)
-
-    # 2. Resolve Datasets {{ dataset:ID }}
-    pattern = r'\{\{\s*dataset:(\d+)\s*\}\}'
-    
-    def replace_match(match):
-        dataset_id = match.group(1)
-        try:
-            dataset = DataSet.objects.get(pk=dataset_id)
-            # Recursively resolve the child dataset's SQL first, passing params down
-            child_sql = resolve_dataset_sql(dataset.sql_script, depth + 1, params)
-            # Wrap in subquery
-            return f"({child_sql})"
-        except DataSet.DoesNotExist:
-            return match.group(0) # Keep as is if not found
-            
-    return re.sub(pattern, replace_match, sql_script)
+    def is_set(name):
+        return str(source.get(name, '')).lower() in ('1', 'true', 'yes')
+    return not is_set('_nocache'), is_set('_refresh')
 
 def get_menus():
     # Get all menus
@@ -149,10 +121,18 @@ def index_view(request):
 @login_required(login_url='/admin/login/')
 def datasource_list_view(request):
     menus = get_menus()
-    datasources = DataSource.objects.all().order_by('-created_at')
+    datasources = list(DataSource.objects.all().order_by('-created_at'))
+    # Connection pool and health statistics of this worker process (connect latency etc.)
+    stats = pool_stats()
+    health = health_stats()
+    admission = admission_stats()
+    for ds in datasources:
+        ds.pool_stats = stats.get(ds.pk)
+        ds.health = health.get(ds.pk)
+        ds.admission = admission.get(ds.pk)
     context = {
         'menus': menus,
-        'datasources': datasources,
+        'data_sources': datasources,
         'title': '数据源管理',
         'content_title': '数据源列表'
     }
@@ -200,17 +180,35 @@ def datasource_edit_view(request, pk):
     return render(request, 'dashboard/datasource/form.html', context)
 
 @login_required(login_url='/admin/login/')
-def datasource_test_view(request, pk):
-    datasource = get_object_or_404(DataSource, pk=pk)
-    try:
-        conn = DBConnector(datasource)
-        conn.connect()
-        conn.close()
+def datasource_test_view(request, datasource_id):
+    datasource = get_object_or_404(DataSource, pk=datasource_id)
+    success, message = DBConnector.test_connection(datasource)
+    if success:
         messages.success(request, '连接测试成功')
-    except Exception as e:
-        messages.error(request, f'连接测试失败: {str(e)}')
+    else:
+        messages.error(request, f'连接测试失败: {message}')
     return redirect('datasource_list')
 
+@login_required(login_url='/admin/login/')
+def api_test_connection_params(request):
+    """Test connection settings from the data source form before they are saved."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid method'})
+    try:
+        data = json.loads(request.body)
+        datasource = DataSource(
+            db_type=data.get('db_type') or 'mssql',
+            host=data.get('host') or '',
+            port=int(data.get('port') or 0),
+            db_name=data.get('db_name') or '',
+            username=data.get('username') or '',
+            password=data.get('password') or '',
+        )
+        success, message = DBConnector.test_connection(datasource)
+        return JsonResponse({'success': success, 'message': message})
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
 @login_required(login_url='/admin/login/')
 def datasource_delete_view(request, pk):
     datasource = get_object_or_404(DataSource, pk=pk)
@@ -285,8 +283,14 @@ def dataset_preview_view(request, pk):
     error = None
     
     try:
-        resolved_sql = resolve_dataset_sql(dataset.sql_script)
-        columns, data = QueryExecutor.execute(dataset.datasource, resolved_sql, limit=100)
+        use_cache, refresh = get_cache_flags(request.GET)
+        resolved_sql, bind_params = resolve_dataset(dataset)
+        result = execute_dataset(
+            dataset, resolved_sql, limit=100, params=bind_params,
+            cache_ttl=get_dataset_cache_ttl(dataset), cache_version=QueryCache.dataset_version(dataset.pk),
+            use_cache=use_cache, refresh=refresh
+        )
+        columns, data = result.columns, result.rows()
     except Exception as e:
         error = str(e)
         
@@ -327,6 +331,20 @@ def menu_list_view(request):
     }
     return render(request, 'dashboard/system/menu_list.html', context)
 
+@login_required(login_url='/admin/login/')
+def scheduler_list_view(request):
+    menus = get_menus()
+    tasks = ScheduledTask.objects.all().order_by('next_run', 'id')
+    runs = ScheduledTaskRun.objects.select_related('task')[:50]
+    context = {
+        'menus': menus,
+        'tasks': tasks,
+        'runs': runs,
+        'title': '系统管理',
+        'content_title': '定时调度任务'
+    }
+    return render(request, 'dashboard/system/scheduler_list.html', context)
+
 @login_required(login_url='/admin/login/')
 def menu_create_view(request):
     menus = get_menus()
@@ -611,7 +629,144 @@ def report_edit_view(request, report_id):
 
 from apps.dashboard.utils.data_processing import aggregate_data
 
-def _get_report_render_data(report, params=None):
+def get_chart_columns(chart):
+    """
+    Columns a chart config reads from its dataset, or None when it needs all of them.
+    ChartFactory falls back to the first row's keys when the axis columns are not
+    configured (and tables show every column), so those charts are not pruned.
+    Filter columns are not needed: filters apply inside the wrapper query.
+    """
+    x_axis = chart.get('x_axis') or chart.get('category_col') or chart.get('x_col')
+    y_axis = chart.get('y_axis') or chart.get('value_col') or chart.get('y_col')
+    if chart.get('type') == 'table':
+        if not x_axis and not y_axis:
+            return None
+    elif not x_axis or not y_axis:
+        return None
+
+    columns = []
+    for value in (x_axis, y_axis, chart.get('series_col'), chart.get('timeline_field'),
+                  chart.get('tooltip_cols'), chart.get('left_cols'), chart.get('right_cols')):
+        if isinstance(value, str) and value:
+            columns.append(value)
+        elif isinstance(value, (list, tuple)):
+            columns.extend(c for c in value if isinstance(c, str) and c)
+    return list(dict.fromkeys(columns)) or None
+
+def fetch_chart_data(dataset, resolved_sql, x_axis, y_axis, aggregation, series_col=None,
+                     filters=None, limit=None, use_cache=True, refresh=False, params=None, columns=None):
+    """
+    Fetch a chart's rows as a list of dicts, returns (columns, data).
+    Aggregation is answered from a dataset rollup (core.dataset.rollup) when one
+    covers it, otherwise pushed down into SQL (GROUP BY) when the chart config allows it
+    and every measure has a numeric column type; otherwise (e.g. text columns holding
+    formatted numbers such as '1,234'), or if the database rejects the grouped query,
+    raw rows are aggregated by aggregate_data.
+    columns (see get_chart_columns) limits the raw query to the columns the chart uses.
+    Datasets in extract mode are queried from their local snapshot (core.dataset.extract).
+    """
+    cache_ttl = get_dataset_cache_ttl(dataset)
+    cache_version = QueryCache.dataset_version(dataset.pk)
+    spec = QueryExecutor.get_aggregation_spec(x_axis, y_axis, aggregation, series_col)
+    if spec:
+        # SQLite and MySQL don't reject SUM('1,234'), they silently sum the leading digits
+        try:
+            numeric = get_numeric_columns(dataset, resolved_sql, params)
+        except Exception as e:
+            logger.warning(f"Describing dataset {dataset.pk} failed, aggregating in memory: {e}")
+            numeric = set()
+        if not numeric.issuperset(spec['measures']):
+            spec = None
+    if spec and use_cache and not refresh:
+        # Hot datasets may have a pre-aggregated rollup covering the grouping
+        try:
+            result = RollupStore.answer(dataset, resolved_sql, params, spec, filters=filters, limit=limit)
+        except Exception as e:
+            logger.warning(f"Rollup lookup failed for dataset {dataset.pk}: {e}")
+            result = None
+        if result is not None:
+            return result.columns, result.records()
+    if spec:
+        try:
+            result = execute_dataset(
+                dataset, resolved_sql, limit=limit, filters=filters, aggregation=spec,
+                params=params, cache_ttl=cache_ttl, cache_version=cache_version,
+                use_cache=use_cache, refresh=refresh
+            )
+            return result.columns, result.records()
+        except (DataSourceUnavailable, QueryRejected):
+            raise
+        except Exception as e:
+            logger.warning(f"SQL aggregation failed for dataset {dataset.pk}, aggregating in memory: {e}")
+
+    try:
+        result = execute_dataset(
+            dataset, resolved_sql, limit=limit, filters=filters, params=params, columns=columns,
+            cache_ttl=cache_ttl, cache_version=cache_version, use_cache=use_cache, refresh=refresh
+        )
+    except (DataSourceUnavailable, QueryRejected):
+        raise
+    except Exception as e:
+        if not columns:
+            raise
+        # e.g. a chart config naming a column the dataset no longer has
+        logger.warning(f"Column pruning failed for dataset {dataset.pk}, selecting all columns: {e}")
+        result = execute_dataset(
+            dataset, resolved_sql, limit=limit, filters=filters, params=params,
+            cache_ttl=cache_ttl, cache_version=cache_version, use_cache=use_cache, refresh=refresh
+        )
+    # aggregate_data takes the columnar result directly (no per-row dicts)
+    return result.columns, aggregate_data(result, x_axis, y_axis, aggregation, series_col)
+
+def _build_chart_options(chart, chart_entry):
+    """
+    Generate the Pyecharts options (or table HTML) for a chart entry in place.
+    """
+    try:
+        # If static options exist, prioritize them and skip generation
+        if chart.get('pyecharts_options'):
+            chart_entry['pyecharts_options'] = chart.get('pyecharts_options')
+        # If we have data (either static or processed), create chart
+        # Note: processed_data might be empty if query failed, but error is set
+        elif chart_entry.get('error'):
+            pass 
+        else:
+            # Use static data if processed_data is empty but static data exists
+            chart_data = chart_entry.get('data')
+            if not chart_data and (chart.get('data') or chart.get('source')):
+                chart_data = chart.get('data') or chart.get('source')
+                
+            # Prepare kwargs by excluding explicitly passed arguments to avoid "multiple values" error
+            chart_kwargs = chart.copy()
+            # Clean up all potential parameter aliases from kwargs
+            for k in ['type', 'title', 'data', 'x_axis', 'y_axis', 'series_col', 
+                     'category_col', 'value_col', 'x_col', 'y_col']:
+                chart_kwargs.pop(k, None)
+                
+            # Resolve axis columns with fallbacks
+            x_axis_val = chart.get('x_axis') or chart.get('category_col') or chart.get('x_col')
+            y_axis_val = chart.get('y_axis') or chart.get('value_col') or chart.get('y_col')
+                
+            chart_obj = ChartFactory.create_chart(
+                chart_type=chart.get('type', 'bar'),
+                title=chart.get('title', '未命名图表'),
+                data=chart_data,
+                category_col=x_axis_val,
+                value_col=y_axis_val,
+                series_col=chart.get('series_col'),
+                **chart_kwargs
+            )
+            if chart_obj:
+                if chart_obj.__class__.__name__ == 'Table':
+                    chart_entry['table_html'] = chart_obj.render_embed()
+                else:
+                    chart_entry['pyecharts_options'] = ChartFactory.dump_options(chart_obj)
+    except Exception as e:
+        print(f"Pyecharts generation failed: {e}")
+        if not chart_entry.get('error'):
+             chart_entry['error'] = f"图表生成失败: {str(e)}"
+
+def _get_report_render_data(report, params=None, use_cache=True, refresh=False, resolver=None):
     report_data = []
     charts_data = []
     error = None
@@ -621,23 +776,33 @@ def _get_report_render_data(report, params=None):
     
     if params is None:
         params = {}
+    # Nested dataset templates are loaded once for all queries of the render
+    if resolver is None:
+        resolver = SqlResolver()
+
+    # Queries are collected into a render-scoped plan first and then run together
+    # on a bounded thread pool (see core.dataset.parallel), so page latency is
+    # roughly the slowest query. Charts that resolve to the same query (dataset,
+    # SQL, filters, grouping) share a single execution.
+    plan = ExecutionPlan()
     
     # 1. Fetch Data (Legacy/Table Mode)
-    for dataset in report.datasets.all():
+    legacy_tasks = []
+    for dataset in report.datasets.all().select_related('datasource'):
         try:
-            resolved_sql = resolve_dataset_sql(dataset.sql_script, params=params)
-            columns, data = QueryExecutor.execute(dataset.datasource, resolved_sql)
-            report_data.append({
-                'dataset_name': dataset.name,
-                'columns': columns,
-                'data': data
-            })
+            resolved_sql, bind_params = resolve_dataset(dataset, params=params, resolver=resolver)
         except Exception as e:
-            report_data.append({
-                'dataset_name': dataset.name,
-                'error': f'Execution failed: {e}'
-            })
-            error = str(e)
+            legacy_tasks.append((dataset, None, e))
+            continue
+
+        def run_legacy(dataset=dataset, resolved_sql=resolved_sql, bind_params=bind_params):
+            return execute_dataset(
+                dataset, resolved_sql, params=bind_params,
+                cache_ttl=get_dataset_cache_ttl(dataset), cache_version=QueryCache.dataset_version(dataset.pk),
+                use_cache=use_cache, refresh=refresh
+            )
+        query_key = ('rows', dataset.datasource_id, resolved_sql, json.dumps(bind_params, default=str))
+        legacy_tasks.append((dataset, plan.add(query_key, dataset.datasource_id, run_legacy), None))
 
     # 2. Process Visual Configuration
     config = load_report_from_file(report)
@@ -647,6 +812,7 @@ def _get_report_render_data(report, params=None):
         except Exception:
             config = None
 
+    chart_plan = []  # (chart, chart_entry, task index or None)
     if config:
         try:
             charts = config.get('charts', [])
@@ -693,99 +859,110 @@ def _get_report_render_data(report, params=None):
                          # If static data exists, we don't strictly need a dataset
                          # But if dataset_id is explicitly invalid, we might still warn?
                          # For now, if static data is present, we prioritize it and skip dataset validation error
-                         pass
+                         chart_plan.append((chart, chart_entry, None))
                     elif not dataset_id:
                         chart_entry['error'] = '需绑定数据集'
-                        charts_data.append(chart_entry)
-                        continue
+                        chart_plan.append((chart, chart_entry, None))
                     else:
                         # Process Dataset Logic
                         # Try to find dataset in report's bound datasets first
-                        target_dataset = report.datasets.filter(pk=dataset_id).first()
+                        target_dataset = report.datasets.filter(pk=dataset_id).select_related('datasource').first()
                         
                         # If not found in bound datasets, try global lookup (for imported reports or loose coupling)
                         if not target_dataset:
-                            target_dataset = DataSet.objects.filter(pk=dataset_id).first()
+                            target_dataset = DataSet.objects.filter(pk=dataset_id).select_related('datasource').first()
                             
                         if not target_dataset:
                             # If dataset is missing but chart has no static data, then it's an error
                             chart_entry['error'] = '数据集未找到'
-                            charts_data.append(chart_entry)
+                            chart_plan.append((chart, chart_entry, None))
                             continue
                             
                         try:
-                            chart_filters = chart.get('filters', [])
-                            resolved_sql = resolve_dataset_sql(target_dataset.sql_script, params=params)
-                            columns, data = QueryExecutor.execute(target_dataset.datasource, resolved_sql, filters=chart_filters)
-                            
-                            # Convert to list of dicts for aggregation
-                            data_dicts = [dict(zip(columns, row)) for row in data]
-                            
-                            processed_data = aggregate_data(
-                                data_dicts,
-                                chart.get('x_axis'),
-                                chart.get('y_axis'),
-                                chart.get('aggregation', chart.get('aggregate', 'none')),
-                                chart.get('series_col')
+                            resolved_sql, bind_params = resolve_dataset(
+                                target_dataset, params=params, resolver=resolver
                             )
-                            
-                            chart_entry['data'] = processed_data
-                            chart_entry['columns'] = columns
-                            
                         except Exception as e:
                             chart_entry['error'] = f'查询失败: {str(e)}'
-                            charts_data.append(chart_entry)
+                            chart_plan.append((chart, chart_entry, None))
                             continue
 
-                    # Generate Pyecharts Options
-                    try:
-                        # If static options exist, prioritize them and skip generation
-                        if chart.get('pyecharts_options'):
-                            chart_entry['pyecharts_options'] = chart.get('pyecharts_options')
-                        # If we have data (either static or processed), create chart
-                        # Note: processed_data might be empty if query failed, but error is set
-                        elif chart_entry.get('error'):
-                            pass 
-                        else:
-                            # Use static data if processed_data is empty but static data exists
-                            chart_data = chart_entry.get('data')
-                            if not chart_data and (chart.get('data') or chart.get('source')):
-                                chart_data = chart.get('data') or chart.get('source')
-                                
-                            # Prepare kwargs by excluding explicitly passed arguments to avoid "multiple values" error
-                            chart_kwargs = chart.copy()
-                            # Clean up all potential parameter aliases from kwargs
-                            for k in ['type', 'title', 'data', 'x_axis', 'y_axis', 'series_col', 
-                                     'category_col', 'value_col', 'x_col', 'y_col']:
-                                chart_kwargs.pop(k, None)
-                                
-                            # Resolve axis columns with fallbacks
-                            x_axis_val = chart.get('x_axis') or chart.get('category_col') or chart.get('x_col')
-                            y_axis_val = chart.get('y_axis') or chart.get('value_col') or chart.get('y_col')
-                                
-                            chart_obj = ChartFactory.create_chart(
-                                chart_type=chart.get('type', 'bar'),
-                                title=chart.get('title', '未命名图表'),
-                                data=chart_data,
-                                category_col=x_axis_val,
-                                value_col=y_axis_val,
-                                series_col=chart.get('series_col'),
-                                **chart_kwargs
+                        def run_chart(chart=chart, target_dataset=target_dataset, resolved_sql=resolved_sql,
+                                      bind_params=bind_params):
+                            return fetch_chart_data(
+                                target_dataset,
+                                resolved_sql,
+                                chart.get('x_axis'),
+                                chart.get('y_axis'),
+                                chart.get('aggregation', chart.get('aggregate', 'none')),
+                                chart.get('series_col'),
+                                filters=chart.get('filters', []),
+                                use_cache=use_cache,
+                                refresh=refresh,
+                                params=bind_params,
+                                columns=get_chart_columns(chart)
                             )
-                            if chart_obj:
-                                if chart_obj.__class__.__name__ == 'Table':
-                                    chart_entry['table_html'] = chart_obj.render_embed()
-                                else:
-                                    chart_entry['pyecharts_options'] = ChartFactory.dump_options(chart_obj)
-                    except Exception as e:
-                        print(f"Pyecharts generation failed: {e}")
-                        if not chart_entry.get('error'):
-                             chart_entry['error'] = f"图表生成失败: {str(e)}"
-                        
-                    charts_data.append(chart_entry)
+                        query_key = (
+                            'chart',
+                            target_dataset.datasource_id,
+                            resolved_sql,
+                            json.dumps(bind_params, default=str),
+                            json.dumps(QueryCache.normalize_filters(chart.get('filters', []))),
+                            json.dumps([
+                                chart.get('x_axis'),
+                                chart.get('y_axis'),
+                                chart.get('aggregation', chart.get('aggregate', 'none')),
+                                chart.get('series_col')
+                            ], default=str),
+                            json.dumps(get_chart_columns(chart)),
+                        )
+                        task_index = plan.add(query_key, target_dataset.datasource_id, run_chart)
+                        chart_plan.append((chart, chart_entry, task_index))
             
         except Exception as e:
             visual_error = str(e)
+
+    # 3. Run all queries, results come back in task order
+    results = plan.run()
+
+    for dataset, task_index, exc in legacy_tasks:
+        if task_index is not None:
+            result, exc = results[task_index]
+        if exc is None:
+            report_data.append({
+                'dataset_name': dataset.name,
+                'columns': result.columns,
+                'data': result.rows()
+            })
+        else:
+            report_data.append({
+                'dataset_name': dataset.name,
+                'error': f'Execution failed: {exc}'
+            })
+            error = str(exc)
+
+    # 4. Assemble charts in their configured order
+    try:
+        for chart, chart_entry, task_index in chart_plan:
+            if task_index is not None:
+                result, exc = results[task_index]
+                if exc is not None:
+                    # The source is known to be down (core.data_source.health): no query was sent
+                    if isinstance(exc, DataSourceUnavailable):
+                        chart_entry['error'] = '数据源不可用'
+                    else:
+                        chart_entry['error'] = f'查询失败: {str(exc)}'
+                    charts_data.append(chart_entry)
+                    continue
+                chart_entry['columns'], chart_entry['data'] = result
+            elif chart_entry.get('error'):
+                charts_data.append(chart_entry)
+                continue
+
+            _build_chart_options(chart, chart_entry)
+            charts_data.append(chart_entry)
+    except Exception as e:
+        visual_error = str(e)
             
     return {
         'report_data': report_data,
@@ -803,6 +980,10 @@ def report_detail_view(request, report_id):
     
     # Extract query params
     params = request.GET.dict()
+    use_cache, refresh = get_cache_flags(params)
+    params.pop('_nocache', None)
+    params.pop('_refresh', None)
+    resolver = SqlResolver()
     
     # Process Report Parameters for UI
     report_params = []
@@ -825,8 +1006,13 @@ def report_detail_view(request, report_id):
                     try:
                         ds = DataSet.objects.get(pk=p['dataset_id'])
                         # Execute SQL with current params (allows cascading)
-                        resolved_sql = resolve_dataset_sql(ds.sql_script, params=params)
-                        cols, data = QueryExecutor.execute(ds.datasource, resolved_sql)
+                        resolved_sql, bind_params = resolve_dataset(ds, params=params, resolver=resolver)
+                        result = execute_dataset(
+                            ds, resolved_sql, params=bind_params,
+                            cache_ttl=get_dataset_cache_ttl(ds), cache_version=QueryCache.dataset_version(ds.pk),
+                            use_cache=use_cache, refresh=refresh
+                        )
+                        cols = result.columns
                         
                         label_field = p.get('label_field')
                         value_field = p.get('value_field') or label_field
@@ -835,12 +1021,14 @@ def report_detail_view(request, report_id):
                         label_idx = cols.index(label_field) if label_field and label_field in cols else 0
                         value_idx = cols.index(value_field) if value_field and value_field in cols else label_idx
                         
-                        # Build options string
+                        # Build options string (only the two columns involved are read)
                         opts = []
                         seen = set()
-                        for row in data:
-                            val = str(row[value_idx])
-                            lbl = str(row[label_idx])
+                        values = result.arrays[value_idx].tolist() if cols else []
+                        labels = result.arrays[label_idx].tolist() if cols else []
+                        for raw_val, raw_lbl in zip(values, labels):
+                            val = str(raw_val)
+                            lbl = str(raw_lbl)
                             if val not in seen:
                                 seen.add(val)
                                 # Simple sanitization
@@ -863,7 +1051,9 @@ def report_detail_view(request, report_id):
         print(f"Error parsing report params: {e}")
 
     # Render Data
-    render_context = _get_report_render_data(report, params=params)
+    render_context = _get_report_render_data(
+        report, params=params, use_cache=use_cache, refresh=refresh, resolver=resolver
+    )
     
     # Build Tree for Sidebar (Viewer Mode)
     all_dirs = list(ReportDirectory.objects.all().order_by('sort_order', 'id'))
@@ -1096,9 +1286,35 @@ def api_save_report_meta(request, report_id):
 def api_get_dataset_columns(request, dataset_id):
     try:
         dataset = get_object_or_404(DataSet, pk=dataset_id)
-        resolved_sql = resolve_dataset_sql(dataset.sql_script)
-        columns, _ = QueryExecutor.execute(dataset.datasource, resolved_sql, limit=1)
-        return JsonResponse({'success': True, 'columns': columns})
+        use_cache, refresh = get_cache_flags(request.GET)
+        # Served from DataSet.metadata; a zero-row probe refreshes it when the SQL changed
+        fields = get_dataset_metadata(dataset, refresh=refresh or not use_cache)
+        return JsonResponse({
+            'success': True,
+            'columns': [f['name'] for f in fields],
+            'fields': fields
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required(login_url='/admin/login/')
+def api_get_datasource_schema(request, datasource_id):
+    """
+    Tables and columns of a DataSource for SQL autocompletion, from the cached
+    schema catalog. Optional ?schema= / ?table= narrow the response.
+    """
+    try:
+        datasource = get_object_or_404(DataSource, pk=datasource_id)
+        use_cache, refresh = get_cache_flags(request.GET)
+        catalog = SchemaCatalog.get(datasource, refresh=refresh or not use_cache)
+        tables = catalog['tables']
+        schema = request.GET.get('schema')
+        table = request.GET.get('table')
+        if schema:
+            tables = [t for t in tables if str(t['schema']).lower() == schema.lower()]
+        if table:
+            tables = [t for t in tables if str(t['name']).lower() == table.lower()]
+        return JsonResponse({'success': True, 'tables': tables, 'loaded_at': catalog['loaded_at']})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
 
@@ -1122,6 +1338,7 @@ def api_create_dataset(request):
             dataset.name = name
             dataset.datasource = datasource
             dataset.sql_script = sql_script
+            check_dependency_cycle(dataset)
             dataset.save()
         else:
             # Create new
@@ -1146,6 +1363,8 @@ def api_create_dataset(request):
                 'datasource_name': datasource.name
             }
         })
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': '; '.join(e.messages)})
     except IntegrityError as e:
         if 'unique constraint' in str(e).lower() or 'duplicate key' in str(e).lower():
              return JsonResponse({'success': False, 'message': f'数据集名称 "{name}" 已存在，请使用其他名称'})
@@ -1511,16 +1730,17 @@ def api_preview_sql(request):
              
         datasource = get_object_or_404(DataSource, pk=datasource_id)
         
-        resolved_sql = resolve_dataset_sql(content)
-        columns, data = QueryExecutor.execute(datasource, resolved_sql, limit=100)
+        use_cache, refresh = get_cache_flags(data)
+        resolved_sql, bind_params = resolve_dataset_sql(content, db_type=datasource.db_type)
+        result = QueryExecutor.execute(
+            datasource, resolved_sql, limit=100, params=bind_params, use_cache=use_cache, refresh=refresh
+        )
         
         # Convert to list of dicts for frontend table rendering
-        data_dicts = [dict(zip(columns, row)) for row in data]
-        
         return JsonResponse({
             'success': True,
-            'columns': columns,
-            'data': data_dicts
+            'columns': result.columns,
+            'data': result.records()
         })
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
@@ -1545,16 +1765,19 @@ def api_get_dataset_detail(request, dataset_id):
 def api_preview_dataset_data(request, dataset_id):
     try:
         dataset = get_object_or_404(DataSet, pk=dataset_id)
-        resolved_sql = resolve_dataset_sql(dataset.sql_script)
-        columns, data = QueryExecutor.execute(dataset.datasource, resolved_sql, limit=100)
+        use_cache, refresh = get_cache_flags(request.GET)
+        resolved_sql, bind_params = resolve_dataset(dataset)
+        result = execute_dataset(
+            dataset, resolved_sql, limit=100, params=bind_params,
+            cache_ttl=get_dataset_cache_ttl(dataset), cache_version=QueryCache.dataset_version(dataset.pk),
+            use_cache=use_cache, refresh=refresh
+        )
         
         # Convert to list of dicts for frontend table rendering
-        data_dicts = [dict(zip(columns, row)) for row in data]
-        
         return JsonResponse({
             'success': True,
-            'columns': columns,
-            'data': data_dicts
+            'columns': result.columns,
+            'data': result.records()
         })
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
@@ -1598,15 +1821,16 @@ def api_preview_chart(request):
               
         dataset = get_object_or_404(DataSet, pk=dataset_id)
         
-        resolved_sql = resolve_dataset_sql(dataset.sql_script, params=params)
+        resolved_sql, bind_params = resolve_dataset(dataset, params=params)
         filters = data.get('filters', [])
-        
-        sql_execution_time = time.time()
-        columns, db_data = QueryExecutor.execute(dataset.datasource, resolved_sql, limit=1000, filters=filters)
-        sql_execution_end = time.time()
-        
-        df_data = [dict(zip(columns, row)) for row in db_data]
-        
+        if not isinstance(filters, list):
+            return JsonResponse({'success': False, 'message': '过滤条件格式错误'}, status=400)
+        unknown = get_unknown_filter_columns(dataset, filters, params=params)
+        if unknown:
+            return JsonResponse(
+                {'success': False, 'message': f"未知的过滤字段: {', '.join(map(str, unknown))}"}, status=400
+            )
+
         # Use data as chart_config
         chart_config = data
         
@@ -1615,16 +1839,22 @@ def api_preview_chart(request):
         series_col = chart_config.get('series_col')
         aggregation = chart_config.get('aggregation') or chart_config.get('aggregate') or 'none'
         
-        aggregation_start = time.time()
-        processed_data = aggregate_data(df_data, x_axis, y_axis, aggregation, series_col)
-        aggregation_end = time.time()
+        # Aggregation runs in SQL where possible, so the limit caps the number of
+        # groups rather than truncating the raw rows before grouping
+        sql_execution_time = time.time()
+        use_cache, refresh = get_cache_flags(data)
+        columns, processed_data = fetch_chart_data(
+            dataset, resolved_sql, x_axis, y_axis, aggregation, series_col,
+            filters=filters, limit=1000, use_cache=use_cache, refresh=refresh, params=bind_params,
+            columns=get_chart_columns(chart_config)
+        )
+        sql_execution_end = time.time()
         
         total_time = time.time() - start_time
         print(f"API Preview Chart Execution Time:")
         print(f"Total: {total_time:.2f}s")
-        print(f"SQL Execution: {sql_execution_end - sql_execution_time:.2f}s")
-        print(f"Data Aggregation: {aggregation_end - aggregation_start:.2f}s")
-        print(f"Data Rows: {len(db_data)}")
+        print(f"Query + Aggregation: {sql_execution_end - sql_execution_time:.2f}s")
+        print(f"Data Rows: {len(processed_data) if processed_data else 0}")
         
         clean_config = chart_config.copy()
         for k in ['type', 'title', 'data', 'x_axis', 'y_axis', 'series_col', 'dataset_id', 'id', 'category_col', 'value_col', 'x_col', 'y_col']:
@@ -1659,6 +1889,8 @@ def api_preview_chart(request):
                   }
         
         return JsonResponse(response_data)
+    except TemplateParamError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
 
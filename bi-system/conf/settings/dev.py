@@ -102,6 +102,95 @@ STATICFILES_DIRS = [
 ]
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Source database connection pool (core.data_source.pool)
+BI_POOL_MAX_SIZE = 5            # Max open connections per DataSource
+BI_POOL_IDLE_TIMEOUT = 300      # Seconds before an idle connection is closed
+BI_POOL_CHECKOUT_TIMEOUT = 30   # Seconds to wait for a free connection
+BI_POOL_VALIDATE_AFTER = 30     # Validate connections idle longer than this on checkout
+
+# SQL Server over ODBC (core.data_source.backends.mssql)
+BI_MSSQL_ODBC_DRIVER = ''       # e.g. 'ODBC Driver 18 for SQL Server'; empty = detect once per process
+BI_MSSQL_ODBC_POOLING = True    # Driver manager connection pooling (pyodbc.pooling)
+BI_MSSQL_CONNECT_TIMEOUT = 10   # Login timeout in seconds
+
+# Data source health (core.data_source.health)
+# After this many connect/query failures in a row queries fail at once ("数据源不可用")
+# until a background probe reaches the source again. 0 disables the breaker.
+BI_BREAKER_FAILURE_THRESHOLD = 3
+BI_BREAKER_PROBE_INTERVAL = 15  # Seconds between probes while a source is down
+BI_BREAKER_WINDOW = 50          # Recent queries kept per DataSource for failure/latency stats
+
+# Query admission control (core.dataset.admission)
+# Limit per DataSource with DataSource.max_concurrent_queries (0 = this default, 0 here = unlimited).
+# Slots live in the BI_QUERY_CACHE_ALIAS cache: the limit is per worker unless that cache is Redis
+# (see "Query result cache" below).
+BI_QUERY_MAX_CONCURRENT = 0
+BI_QUERY_QUEUE_SIZE = 20            # Queries that may wait for a slot per DataSource and worker
+BI_QUERY_QUEUE_TIMEOUT = 30         # Seconds a query waits before "数据源繁忙" is returned
+BI_QUERY_SLOT_LEASE = 600           # Seconds before a slot held by a crashed worker is freed
+BI_QUERY_INTERACTIVE_RESERVE = 1    # Slots scheduled tasks / pre-warming never take (at most limit - 1,
+                                    # so with a limit of 1 background queries still share the one slot)
+BI_QUERY_QUEUE_POLL = 0.1           # Seconds between checks for slots freed by other workers
+
+# Source schema browser (core.data_source.catalog)
+BI_SCHEMA_CACHE_TTL = 3600          # Seconds before tables/columns are introspected again
+BI_SCHEMA_MAX_TABLES = 5000         # Tables returned per DataSource
+
+# Query result cache (core.dataset.cache)
+# Uses this CACHES alias. CACHES isn't configured above (the cache_config import is commented
+# out), so it is Django's default per-process local memory cache: every worker keeps its own
+# results, semantic index, query locks and admission slots. Sharing the cache, coalescing
+# identical queries and enforcing BI_QUERY_MAX_CONCURRENT across workers all need Redis:
+# uncomment `from conf.db.cache_config import CACHES` at the top of this file.
+# Per-dataset TTLs can be set with {"cache_ttl": <seconds>} in DataSet.params_config.
+BI_QUERY_CACHE_ALIAS = 'default'
+BI_QUERY_CACHE_TTL = 300            # Default TTL in seconds, 0 disables the cache
+BI_QUERY_CACHE_COMPRESS_LEVEL = 6   # zlib level for cached payloads
+# Identical in-flight queries are always coalesced within a process. Enable the
+# lock below (needs a shared cache such as Redis) to coalesce across workers too.
+BI_QUERY_CACHE_DISTRIBUTED_LOCK = False
+BI_QUERY_CACHE_LOCK_TIMEOUT = 60    # Seconds a worker may hold the query lock, and that callers wait
+                                    # for an identical in-flight query before running it themselves
+BI_QUERY_CACHE_LOCK_POLL = 0.1      # Seconds between checks while waiting on another worker
+BI_QUERY_CACHE_INDEX_SIZE = 16      # Cached variants (limit/filters/columns) remembered per query
+
+# Database backends (core.data_source.backends), imported on first use of their db_type.
+# Extra or replacement plugins: {'db_type': 'dotted.module.path'} (module exposes `backend`)
+BI_DB_BACKENDS = {}
+# Directories SQLite/DuckDB data sources may open files from; relative paths use the first one
+BI_LOCAL_DATA_DIRS = [os.path.join(BASE_DIR, 'data')]
+
+# Query fetching (core.dataset.executor)
+BI_QUERY_FETCH_SIZE = 5000                  # Rows per fetchmany batch
+BI_QUERY_MAX_ROWS = 1000000                 # Default per-request row budget, 0 = unlimited
+BI_QUERY_MAX_BYTES = 512 * 1024 * 1024      # Default per-request memory budget, 0 = unlimited
+
+# Dataset SQL templates (core.dataset.resolver)
+# Render {{ dataset:ID }} as WITH clauses (emitted once) instead of inline subqueries.
+# Needs CTE support (MySQL 8+); a dataset can override it with params_config {"cte": true/false}
+BI_DATASET_CTE = False
+
+# Dataset rollups (core.dataset.rollup), refreshed by 'cache' scheduled tasks
+# Declared per dataset in params_config {"rollups": [{"dimensions": [...], "measures": [...]}]}
+BI_ROLLUP_MAX_ROWS = 200000         # A rollup with more groups than this is not stored
+
+# Dataset extracts (core.dataset.extract), refreshed by 'cache' scheduled tasks
+# A dataset opts in with params_config {"extract": true}; needs pyarrow. Append-mostly datasets can
+# refresh incrementally: {"extract": {"watermark": "id", "lookback": 0}} (see get_extract_watermark)
+BI_EXTRACT_DIR = os.path.join(BASE_DIR, 'data', 'extracts')
+BI_EXTRACT_MAX_ROWS = 5000000               # Row budget of one extract pull
+BI_EXTRACT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+BI_EXTRACT_KEEP_VERSIONS = 2                # Extract files kept per dataset (current + previous)
+
+# Report rendering (core.dataset.parallel)
+BI_RENDER_MAX_WORKERS = 8           # Threads used to fetch chart data for one report
+BI_RENDER_MAX_PER_DATASOURCE = 4    # Concurrent queries per DataSource within one report
+
+# Task scheduler (core.reporting.scheduler), run with "python manage.py run_scheduler"
+BI_SCHEDULER_WORKERS = 4            # Tasks run in parallel per node
+BI_SCHEDULER_POLL_INTERVAL = 30     # Seconds between checks for due tasks
+BI_SCHEDULER_LEASE_SECONDS = 3600   # A task leased by a node that died becomes runnable again after this
+
 # Auth
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -0,0 +1,11 @@
+# Settings for the test suite:
+#   python manage.py test tests --settings=conf.settings.test
+# Source databases in the tests are local SQLite/DuckDB files, so no server is needed.
+from conf.settings.dev import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+class DataSourceConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core.data_source'
+    label = 'data_source'
+
+    def ready(self):
+        # Register signal handlers
+        from core.data_source import signals  # noqa: F401
@@ -0,0 +1,55 @@
+"""
+Database backend registry. Each db_type is a plugin module exposing a `backend`
+object (see base.BaseBackend); the module, and with it the database driver,
+is only imported the first time that db_type is used.
+"""
+import importlib
+import logging
+import threading
+
+from django.conf import settings
+
+from core.data_source.backends.base import BaseBackend
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = {
+    'mssql': 'core.data_source.backends.mssql',
+    'mysql': 'core.data_source.backends.mysql',
+    'postgresql': 'core.data_source.backends.postgresql',
+    'oracle': 'core.data_source.backends.oracle',
+    'sqlite': 'core.data_source.backends.sqlite',
+    'duckdb': 'core.data_source.backends.duckdb',
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def register_backend(db_type, module_path):
+    """Register (or replace) the plugin module for a db_type."""
+    with _lock:
+        BACKENDS[db_type] = module_path
+        _loaded.pop(db_type, None)
+
+
+def get_backend(db_type):
+    """
+    The backend for a db_type, importing its plugin on first use.
+    Unknown types get the generic ANSI backend, which can build SQL but not connect.
+    """
+    backend = _loaded.get(db_type)
+    if backend is not None:
+        return backend
+    with _lock:
+        backend = _loaded.get(db_type)
+        if backend is None:
+            # BI_DB_BACKENDS adds or overrides plugins: {'db_type': 'dotted.module'}
+            module_path = getattr(settings, 'BI_DB_BACKENDS', {}).get(db_type) or BACKENDS.get(db_type)
+            if module_path:
+                backend = importlib.import_module(module_path).backend
+                logger.debug(f"Loaded database backend {db_type} from {module_path}")
+            else:
+                backend = BaseBackend(db_type)
+            _loaded[db_type] = backend
+    return backend
@@ -0,0 +1,65 @@
+import re
+
+
+class BaseBackend:
+    """
+    Hooks a database plugin provides. The defaults are ANSI SQL (double-quoted
+    identifiers, LIMIT, "AS" table aliases, qmark parameters).
+    """
+    # DB-API paramstyle of the driver: 'qmark' (?), 'format' (%s) or 'numeric' (:1)
+    paramstyle = 'qmark'
+    # Whether backslash escapes quotes inside string literals (MySQL)
+    backslash_escapes = False
+    validation_query = "SELECT 1"
+    # CAST target for averages, so AVG over an integer column isn't truncated
+    float_type = "DOUBLE PRECISION"
+    # type_name() values (lower-case, without length/precision) of numeric columns
+    numeric_types = frozenset({
+        'int', 'integer', 'smallint', 'tinyint', 'mediumint', 'bigint', 'hugeint',
+        'int2', 'int4', 'int8', 'utinyint', 'usmallint', 'uinteger', 'ubigint', 'uhugeint',
+        'decimal', 'numeric', 'number', 'float', 'float4', 'float8', 'double', 'double precision',
+        'real', 'money', 'smallmoney',
+    })
+
+    def __init__(self, db_type):
+        self.db_type = db_type
+
+    def connect(self, host, port, db_name, username, password):
+        raise NotImplementedError(f"Database type {self.db_type} not supported yet.")
+
+    def open_cursor(self, conn, server_side=False, fetch_size=None):
+        """Cursor returning plain row tuples; server_side streams rows where the driver needs it."""
+        return conn.cursor()
+
+    def quote_identifier(self, name):
+        return '"' + str(name).replace('"', '""') + '"'
+
+    def table_alias(self, alias):
+        """Alias clause for a derived table, with its leading space."""
+        return f" AS {alias}"
+
+    def select_sql(self, select_part, sql, where_clause, limit):
+        """SELECT columns FROM (sql) WHERE ... with at most limit rows."""
+        limit_part = f" LIMIT {limit}" if limit else ""
+        return f"SELECT {select_part} FROM ({sql}){self.table_alias('_wrapper_')}{where_clause}{limit_part}"
+
+    def aggregate_sql(self, select_part, sql, where_clause, group_part, limit):
+        """SELECT ... GROUP BY ... ORDER BY ... with at most limit groups."""
+        limit_part = f" LIMIT {limit}" if limit else ""
+        return (f"SELECT {select_part} FROM ({sql}){self.table_alias('_wrapper_')}{where_clause} "
+                f"GROUP BY {group_part} ORDER BY {group_part}{limit_part}")
+
+    def type_name(self, type_code):
+        """Readable column type from cursor.description's type_code."""
+        if type_code is None:
+            return None
+        if isinstance(type_code, type):
+            # e.g. pyodbc reports the Python type the column converts to
+            return type_code.__name__
+        return getattr(type_code, 'name', str(type_code))
+
+    def is_numeric_type(self, type_name):
+        """Whether a type_name() value is numeric; unknown (None) types are not."""
+        if not type_name:
+            return False
+        return re.sub(r'\(.*\)', '', str(type_name)).strip().lower() in self.numeric_types
@@ -0,0 +1,74 @@
+import logging
+import os
+import threading
+
+import duckdb
+
+from core.data_source.backends.base import BaseBackend
+from core.data_source.backends.local import resolve_local_path
+
+logger = logging.getLogger(__name__)
+
+# One read-only database instance per file and process: path -> (instance, file mtime)
+_databases = {}
+_databases_lock = threading.Lock()
+
+# A read-only instance can still read and write other files (read_csv, COPY ... TO,
+# ATTACH). Queries only get the database file itself, and can't SET these back.
+DATABASE_CONFIG = {
+    'enable_external_access': False,
+    'lock_configuration': True,
+}
+
+
+class DuckdbConnection:
+    """
+    Pooled handle on a shared DuckDB instance. Each cursor is an independent
+    DuckDB connection (safe to use from its own thread).
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return self.database.cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        # Read-only: nothing to roll back (DuckDB raises without an open transaction)
+        pass
+
+    def close(self):
+        # The instance is shared by every handle on the file
+        pass
+
+
+class DuckdbBackend(BaseBackend):
+    """
+    Local DuckDB file (DataSource.db_name is the path), opened read-only without
+    access to any other file. In-memory databases are not supported: a writable
+    instance shared by every user can't be made read-only. To query CSV/Parquet
+    files, load them into (or create views in) a DuckDB file.
+    """
+
+    def connect(self, host, port, db_name, username, password):
+        try:
+            if not db_name or db_name.strip().lower().startswith(':memory:'):
+                raise ValueError("DuckDB 数据源需要指定数据库文件，不支持 :memory:")
+            path = resolve_local_path(db_name)
+            # A rewritten file gets a new instance, so it isn't served from stale pages
+            mtime = os.path.getmtime(path)
+            with _databases_lock:
+                database, opened_mtime = _databases.get(path, (None, None))
+                if database is None or opened_mtime != mtime:
+                    database = duckdb.connect(path, read_only=True, config=DATABASE_CONFIG)
+                    _databases[path] = (database, mtime)
+            return DuckdbConnection(database)
+        except Exception as e:
+            logger.error(f"Failed to open DuckDB database: {e}")
+            raise e
+
+
+backend = DuckdbBackend('duckdb')
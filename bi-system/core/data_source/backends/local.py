@@ -0,0 +1,24 @@
+import os
+
+from django.conf import settings
+
+
+def get_local_data_dirs():
+    """Directories local database files may be opened from (BI_LOCAL_DATA_DIRS)."""
+    dirs = getattr(settings, 'BI_LOCAL_DATA_DIRS', None) or [os.path.join(settings.BASE_DIR, 'data')]
+    return [os.path.realpath(d) for d in dirs]
+
+
+def resolve_local_path(path):
+    """
+    Absolute path of a local database file (DataSource.db_name). Relative paths
+    are taken from the first BI_LOCAL_DATA_DIRS entry; paths outside those
+    directories are rejected, so a data source can't open arbitrary server files.
+    """
+    if not path:
+        raise ValueError("未指定数据库文件路径")
+    dirs = get_local_data_dirs()
+    full = os.path.realpath(path if os.path.isabs(path) else os.path.join(dirs[0], path))
+    if not any(full == d or full.startswith(d + os.sep) for d in dirs):
+        raise ValueError(f"数据库文件不在允许的目录中: {path}")
+    return full
@@ -0,0 +1,96 @@
+import logging
+import threading
+from functools import lru_cache
+
+import pyodbc
+from django.conf import settings
+
+from core.data_source.backends.base import BaseBackend
+
+logger = logging.getLogger(__name__)
+
+# Preferred drivers; any other driver named "... SQL Server ..." comes after.
+# (ODBC Driver 18 encrypts by default, so it is picked only when it is the one installed or configured)
+PREFERRED_DRIVERS = ['ODBC Driver 17 for SQL Server', 'SQL Server']
+DEFAULT_DRIVER = 'ODBC Driver 17 for SQL Server'
+
+_driver = None
+_setup_lock = threading.Lock()
+_pooling_configured = False
+
+
+def get_odbc_driver():
+    """
+    ODBC driver used for SQL Server, resolved once per process: BI_MSSQL_ODBC_DRIVER
+    when set, otherwise the best installed one from pyodbc.drivers().
+    """
+    global _driver
+    if _driver is not None:
+        return _driver
+    with _setup_lock:
+        if _driver is None:
+            driver = getattr(settings, 'BI_MSSQL_ODBC_DRIVER', '')
+            if not driver:
+                installed = pyodbc.drivers()
+                candidates = [d for d in PREFERRED_DRIVERS if d in installed]
+                candidates += [d for d in installed if 'SQL Server' in d and d not in candidates]
+                driver = candidates[0] if candidates else DEFAULT_DRIVER
+            logger.info(f"Using ODBC driver '{driver}' for SQL Server")
+            _driver = driver
+    return _driver
+
+
+def _configure_pooling():
+    """Set pyodbc.pooling from BI_MSSQL_ODBC_POOLING; it only applies before the first connect."""
+    global _pooling_configured
+    if _pooling_configured:
+        return
+    with _setup_lock:
+        if not _pooling_configured:
+            pyodbc.pooling = bool(getattr(settings, 'BI_MSSQL_ODBC_POOLING', True))
+            _pooling_configured = True
+
+
+def _odbc_value(value):
+    # Values with ';', braces or outer spaces must be wrapped in {} ('}' doubled)
+    value = str(value)
+    if any(c in value for c in ';{}') or value != value.strip():
+        return '{' + value.replace('}', '}}') + '}'
+    return value
+
+
+@lru_cache(maxsize=256)
+def build_connection_string(driver, host, port, db_name, username, password):
+    """ODBC connection string for one DataSource's settings (cached, it's rebuilt for every connect otherwise)."""
+    server = f"{host},{port}" if port else host
+    return (f"DRIVER={{{driver}}};SERVER={_odbc_value(server)};DATABASE={_odbc_value(db_name)};"
+            f"UID={_odbc_value(username)};PWD={_odbc_value(password)}")
+
+
+class MssqlBackend(BaseBackend):
+    float_type = "FLOAT"
+
+    def connect(self, host, port, db_name, username, password):
+        try:
+            _configure_pooling()
+            conn_str = build_connection_string(get_odbc_driver(), host, port, db_name, username, password)
+            # timeout in seconds
+            return pyodbc.connect(conn_str, timeout=getattr(settings, 'BI_MSSQL_CONNECT_TIMEOUT', 10))
+        except Exception as e:
+            logger.error(f"Failed to connect to MSSQL: {e}")
+            raise e
+
+    def quote_identifier(self, name):
+        return "[" + str(name).replace("]", "]]") + "]"
+
+    def select_sql(self, select_part, sql, where_clause, limit):
+        limit_part = f"TOP {limit}" if limit else ""
+        return f"SELECT {limit_part} {select_part} FROM ({sql}) AS _wrapper_{where_clause}"
+
+    def aggregate_sql(self, select_part, sql, where_clause, group_part, limit):
+        limit_part = f"TOP {limit} " if limit else ""
+        return (f"SELECT {limit_part}{select_part} FROM ({sql}) AS _wrapper_{where_clause} "
+                f"GROUP BY {group_part} ORDER BY {group_part}")
+
+
+backend = MssqlBackend('mssql')
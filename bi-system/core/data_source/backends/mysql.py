@@ -0,0 +1,48 @@
+import logging
+
+import pymysql
+
+from core.data_source.backends.base import BaseBackend
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlBackend(BaseBackend):
+    paramstyle = 'format'
+    # CAST(... AS DOUBLE) needs MySQL 8.0.17+
+    float_type = 'DECIMAL(65,30)'
+    backslash_escapes = True
+    # pymysql FIELD_TYPE names
+    numeric_types = BaseBackend.numeric_types | {'tiny', 'short', 'long', 'longlong', 'int24', 'newdecimal'}
+
+    def connect(self, host, port, db_name, username, password):
+        try:
+            return pymysql.connect(
+                host=host,
+                port=int(port),
+                user=username,
+                password=password,
+                database=db_name,
+                charset='utf8mb4',
+                cursorclass=pymysql.cursors.DictCursor
+            )
+        except Exception as e:
+            logger.error(f"Failed to connect to MySQL: {e}")
+            raise e
+
+    def open_cursor(self, conn, server_side=False, fetch_size=None):
+        # Connections default to DictCursor, which doesn't give positional rows
+        return conn.cursor(pymysql.cursors.SSCursor if server_side else pymysql.cursors.Cursor)
+
+    def quote_identifier(self, name):
+        return "`" + str(name).replace("`", "``") + "`"
+
+    def type_name(self, type_code):
+        if isinstance(type_code, int):
+            from pymysql.constants import FIELD_TYPE
+            names = {v: k for k, v in vars(FIELD_TYPE).items() if k.isupper()}
+            return names.get(type_code, str(type_code)).lower()
+        return super().type_name(type_code)
+
+
+backend = MysqlBackend('mysql')
@@ -0,0 +1,51 @@
+import logging
+
+import oracledb
+
+from core.data_source.backends.base import BaseBackend
+
+logger = logging.getLogger(__name__)
+
+
+class OracleBackend(BaseBackend):
+    paramstyle = 'numeric'
+    validation_query = "SELECT 1 FROM DUAL"
+    # oracledb DbType names
+    numeric_types = BaseBackend.numeric_types | {
+        'db_type_number', 'db_type_binary_integer', 'db_type_binary_float', 'db_type_binary_double',
+    }
+
+    def connect(self, host, port, db_name, username, password):
+        try:
+            # Construct DSN (Data Source Name)
+            dsn = f"{host}:{port}/{db_name}"
+            return oracledb.connect(
+                user=username,
+                password=password,
+                dsn=dsn
+            )
+        except Exception as e:
+            logger.error(f"Failed to connect to Oracle: {e}")
+            raise e
+
+    def table_alias(self, alias):
+        # Oracle has no AS for table aliases (and no leading "_" in unquoted ones);
+        # derived tables don't need one
+        return ""
+
+    def select_sql(self, select_part, sql, where_clause, limit):
+        if limit:
+            where_part = f"{where_clause} AND ROWNUM <= {limit}" if where_clause else f" WHERE ROWNUM <= {limit}"
+            return f"SELECT {select_part} FROM ({sql}) {where_part}"
+        return f"SELECT {select_part} FROM ({sql}) {where_clause}"
+
+    def aggregate_sql(self, select_part, sql, where_clause, group_part, limit):
+        # ROWNUM must be applied after ORDER BY
+        grouped = (f"SELECT {select_part} FROM ({sql}){where_clause} "
+                   f"GROUP BY {group_part} ORDER BY {group_part}")
+        if limit:
+            return f"SELECT * FROM ({grouped}) WHERE ROWNUM <= {limit}"
+        return grouped
+
+
+backend = OracleBackend('oracle')
@@ -0,0 +1,49 @@
+import logging
+import uuid
+
+import psycopg2
+
+from core.data_source.backends.base import BaseBackend
+
+logger = logging.getLogger(__name__)
+
+PG_TYPE_NAMES = {
+    16: 'bool', 17: 'bytea', 20: 'int8', 21: 'int2', 23: 'int4', 25: 'text',
+    700: 'float4', 701: 'float8', 1042: 'bpchar', 1043: 'varchar', 1082: 'date',
+    1083: 'time', 1114: 'timestamp', 1184: 'timestamptz', 1700: 'numeric',
+    2950: 'uuid', 114: 'json', 3802: 'jsonb',
+}
+
+
+class PostgresqlBackend(BaseBackend):
+    paramstyle = 'format'
+
+    def connect(self, host, port, db_name, username, password):
+        try:
+            return psycopg2.connect(
+                host=host,
+                port=port,
+                database=db_name,
+                user=username,
+                password=password
+            )
+        except Exception as e:
+            logger.error(f"Failed to connect to PostgreSQL: {e}")
+            raise e
+
+    def open_cursor(self, conn, server_side=False, fetch_size=None):
+        if not server_side:
+            return conn.cursor()
+        # Named cursor: rows stay on the server until fetched
+        cursor = conn.cursor(name=f"bi_stream_{uuid.uuid4().hex}")
+        if fetch_size:
+            cursor.itersize = fetch_size
+        return cursor
+
+    def type_name(self, type_code):
+        if isinstance(type_code, int):
+            return PG_TYPE_NAMES.get(type_code, str(type_code))
+        return super().type_name(type_code)
+
+
+backend = PostgresqlBackend('postgresql')
@@ -0,0 +1,28 @@
+import logging
+import pathlib
+import sqlite3
+
+from core.data_source.backends.base import BaseBackend
+from core.data_source.backends.local import resolve_local_path
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteBackend(BaseBackend):
+    """Local SQLite file (DataSource.db_name is the path), opened read-only."""
+
+    def connect(self, host, port, db_name, username, password):
+        try:
+            path = resolve_local_path(db_name)
+            # mode=ro: the file is never written or created; readers don't block each other
+            uri = pathlib.Path(path).as_uri() + '?mode=ro'
+            # Pooled connections are handed between threads, one user at a time
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA query_only = ON")
+            return conn
+        except Exception as e:
+            logger.error(f"Failed to open SQLite database: {e}")
+            raise e
+
+
+backend = SqliteBackend('sqlite')
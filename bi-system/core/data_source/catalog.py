@@ -0,0 +1,184 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.data_source.connector import DBConnector
+from core.data_source.health import check_available
+from core.dataset.admission import admit, background_queries
+from core.dataset.cache import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Every query returns one row per column:
+# schema, table, table type, row estimate, column, data type, nullable (0/1)
+CATALOG_QUERIES = {
+    'mssql': """
+        SELECT c.TABLE_SCHEMA, c.TABLE_NAME, t.TABLE_TYPE, r.row_count,
+               c.COLUMN_NAME, c.DATA_TYPE, CASE WHEN c.IS_NULLABLE = 'YES' THEN 1 ELSE 0 END
+        FROM INFORMATION_SCHEMA.COLUMNS c
+        JOIN INFORMATION_SCHEMA.TABLES t
+          ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        LEFT JOIN (
+            SELECT s.name AS schema_name, o.name AS table_name, SUM(p.rows) AS row_count
+            FROM sys.objects o
+            JOIN sys.schemas s ON s.schema_id = o.schema_id
+            JOIN sys.partitions p ON p.object_id = o.object_id AND p.index_id IN (0, 1)
+            WHERE o.type = 'U'
+            GROUP BY s.name, o.name
+        ) r ON r.schema_name = c.TABLE_SCHEMA AND r.table_name = c.TABLE_NAME
+        ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION
+    """,
+    'mysql': """
+        SELECT c.TABLE_SCHEMA, c.TABLE_NAME, t.TABLE_TYPE, t.TABLE_ROWS,
+               c.COLUMN_NAME, c.COLUMN_TYPE, CASE WHEN c.IS_NULLABLE = 'YES' THEN 1 ELSE 0 END
+        FROM INFORMATION_SCHEMA.COLUMNS c
+        JOIN INFORMATION_SCHEMA.TABLES t
+          ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        WHERE c.TABLE_SCHEMA = DATABASE()
+        ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION
+    """,
+    # pg_catalog directly: information_schema views are slow on large catalogs
+    'postgresql': """
+        SELECT n.nspname, c.relname,
+               CASE c.relkind WHEN 'v' THEN 'VIEW' WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'BASE TABLE' END,
+               CASE WHEN c.reltuples < 0 THEN NULL ELSE c.reltuples::bigint END,
+               a.attname, format_type(a.atttypid, a.atttypmod), CASE WHEN a.attnotnull THEN 0 ELSE 1 END
+        FROM pg_catalog.pg_attribute a
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE a.attnum > 0 AND NOT a.attisdropped
+          AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+          AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+          AND n.nspname !~ '^pg_(toast|temp)'
+          AND has_schema_privilege(n.oid, 'USAGE')
+        ORDER BY n.nspname, c.relname, a.attnum
+    """,
+    'oracle': """
+        SELECT c.OWNER, c.TABLE_NAME, CASE WHEN t.TABLE_NAME IS NULL THEN 'VIEW' ELSE 'BASE TABLE' END,
+               t.NUM_ROWS, c.COLUMN_NAME, c.DATA_TYPE, CASE WHEN c.NULLABLE = 'Y' THEN 1 ELSE 0 END
+        FROM ALL_TAB_COLUMNS c
+        LEFT JOIN ALL_TABLES t ON t.OWNER = c.OWNER AND t.TABLE_NAME = c.TABLE_NAME
+        WHERE c.OWNER IN (SELECT USERNAME FROM ALL_USERS WHERE ORACLE_MAINTAINED = 'N')
+        ORDER BY c.OWNER, c.TABLE_NAME, c.COLUMN_ID
+    """,
+    'sqlite': """
+        SELECT 'main', m.name, CASE m.type WHEN 'view' THEN 'VIEW' ELSE 'BASE TABLE' END, NULL,
+               p.name, p.type, CASE WHEN p."notnull" THEN 0 ELSE 1 END
+        FROM sqlite_master m
+        JOIN pragma_table_info(m.name) p
+        WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%'
+        ORDER BY m.name, p.cid
+    """,
+    'duckdb': """
+        SELECT c.table_schema, c.table_name, t.table_type, d.estimated_size,
+               c.column_name, c.data_type, CASE WHEN c.is_nullable = 'YES' THEN 1 ELSE 0 END
+        FROM information_schema.columns c
+        JOIN information_schema.tables t
+          ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+        LEFT JOIN duckdb_tables() d
+          ON d.schema_name = c.table_schema AND d.table_name = c.table_name
+        ORDER BY c.table_schema, c.table_name, c.ordinal_position
+    """,
+}
+
+_catalog_flights = SingleFlight()
+
+
+class SchemaCatalog:
+    """
+    Cached catalog of a DataSource's schemas, tables, columns and row-count
+    estimates, for the SQL editor's autocompletion. Read from the database's
+    system catalog, never from the tables themselves.
+    """
+    KEY_PREFIX = 'bi:schema:'
+
+    @staticmethod
+    def get_backend():
+        return caches[getattr(settings, 'BI_QUERY_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def build_key(datasource):
+        # Editing the DataSource (another server/database) changes the key
+        version = int(datasource.updated_at.timestamp() * 1000000) if datasource.updated_at else 0
+        return f"{SchemaCatalog.KEY_PREFIX}{datasource.pk}:{version}"
+
+    @staticmethod
+    def get(datasource, refresh=False):
+        """
+        Return {'tables': [...], 'loaded_at': epoch seconds}; each table is
+        {schema, name, type, rows, columns: [{name, type, nullable}]}.
+        Cached for BI_SCHEMA_CACHE_TTL seconds; refresh=True reloads it.
+        """
+        key = SchemaCatalog.build_key(datasource)
+        if not refresh:
+            try:
+                cached = SchemaCatalog.get_backend().get(key)
+            except Exception as e:
+                logger.warning(f"Schema cache read failed: {e}")
+                cached = None
+            if cached is not None:
+                return cached
+
+        def load():
+            catalog = SchemaCatalog.load(datasource)
+            try:
+                SchemaCatalog.get_backend().set(key, catalog, getattr(settings, 'BI_SCHEMA_CACHE_TTL', 3600))
+            except Exception as e:
+                logger.warning(f"Schema cache write failed: {e}")
+            return catalog
+
+        # Concurrent editors opening the same source share one introspection
+        return _catalog_flights.do(key, load)
+
+    @staticmethod
+    def load(datasource):
+        """
+        Introspect the source database (one catalog query). Like dataset queries it
+        is refused while the source is down and goes through admission control, at
+        background priority so a large catalog never holds up viewer queries.
+        """
+        sql = CATALOG_QUERIES.get(datasource.db_type)
+        if not sql:
+            raise ValueError(f"Schema browsing is not supported for {datasource.db_type}")
+
+        started = time.monotonic()
+        check_available(datasource.pk)
+        with background_queries(), admit(datasource), DBConnector.pooled_connection(datasource) as conn:
+            cursor = DBConnector.open_cursor(conn, datasource.db_type)
+            try:
+                cursor.execute(sql)
+                rows = cursor.fetchall()
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+        tables = []
+        current = None
+        max_tables = getattr(settings, 'BI_SCHEMA_MAX_TABLES', 5000)
+        for schema, table, table_type, row_count, column, data_type, nullable in rows:
+            if current is None or current['schema'] != schema or current['name'] != table:
+                if len(tables) >= max_tables:
+                    break
+                current = {
+                    'schema': schema,
+                    'name': table,
+                    'type': 'view' if table_type and 'VIEW' in str(table_type).upper() else 'table',
+                    'rows': int(row_count) if row_count is not None else None,
+                    'columns': [],
+                }
+                tables.append(current)
+            current['columns'].append({
+                'name': column,
+                'type': data_type,
+                'nullable': bool(nullable),
+            })
+
+        logger.info(
+            f"Loaded schema catalog for '{datasource.name}': {len(tables)} tables "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return {'tables': tables, 'loaded_at': time.time()}
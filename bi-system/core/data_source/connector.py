@@ -1,8 +1,9 @@
-import pyodbc
-import pymysql
-import psycopg2
-import oracledb
 import logging
+import time
+from contextlib import contextmanager
+from core.data_source.backends import get_backend
+from core.data_source.health import get_breaker, is_connection_error
+from core.data_source.pool import PoolTimeout, get_pool
 
 logger = logging.getLogger(__name__)
 
@@ -10,79 +11,107 @@ class DBConnector:
     @staticmethod
     def get_connection(db_type, host, port, db_name, username, password):
         """
-        Factory method to get DB connection
+        Factory method to get DB connection (see core.data_source.backends)
         """
-        if db_type == 'mssql':
-            try:
-                # Try to find available driver
-                drivers = pyodbc.drivers()
-                driver = '{ODBC Driver 17 for SQL Server}'
-                
-                # Fallback to SQL Server if ODBC 17 not found (though less likely on modern Windows)
-                if 'ODBC Driver 17 for SQL Server' not in drivers:
-                    if 'SQL Server' in drivers:
-                        driver = '{SQL Server}'
-                    elif drivers:
-                        # Use the first available one that looks like SQL Server
-                        for d in drivers:
-                            if 'SQL Server' in d:
-                                driver = f'{{{d}}}'
-                                break
-                
-                conn_str = f'DRIVER={driver};SERVER={host},{port};DATABASE={db_name};UID={username};PWD={password}'
-                # timeout in seconds
-                conn = pyodbc.connect(conn_str, timeout=10)
-                return conn
-            except Exception as e:
-                logger.error(f"Failed to connect to MSSQL: {e}")
-                raise e
-        
-        elif db_type == 'mysql':
-            try:
-                conn = pymysql.connect(
-                    host=host,
-                    port=int(port),
-                    user=username,
-                    password=password,
-                    database=db_name,
-                    charset='utf8mb4',
-                    cursorclass=pymysql.cursors.DictCursor
-                )
-                return conn
-            except Exception as e:
-                logger.error(f"Failed to connect to MySQL: {e}")
-                raise e
+        return get_backend(db_type).connect(host, port, db_name, username, password)
 
-        elif db_type == 'postgresql':
-            try:
-                conn = psycopg2.connect(
-                    host=host,
-                    port=port,
-                    database=db_name,
-                    user=username,
-                    password=password
-                )
-                return conn
-            except Exception as e:
-                logger.error(f"Failed to connect to PostgreSQL: {e}")
-                raise e
+    @staticmethod
+    def get_validation_query(db_type):
+        return get_backend(db_type).validation_query
 
-        elif db_type == 'oracle':
+    @staticmethod
+    def open_cursor(conn, db_type, server_side=False, fetch_size=None):
+        """
+        Open a cursor that returns plain row tuples.
+        server_side=True streams rows from the server instead of buffering the whole
+        result in the client: named cursor on PostgreSQL, SSCursor on MySQL.
+        pyodbc and oracledb already fetch in batches of cursor.arraysize.
+        """
+        cursor = get_backend(db_type).open_cursor(conn, server_side=server_side, fetch_size=fetch_size)
+        if fetch_size:
             try:
-                # Construct DSN (Data Source Name)
-                dsn = f"{host}:{port}/{db_name}"
-                conn = oracledb.connect(
-                    user=username,
-                    password=password,
-                    dsn=dsn
-                )
-                return conn
-            except Exception as e:
-                logger.error(f"Failed to connect to Oracle: {e}")
-                raise e
+                cursor.arraysize = fetch_size
+            except Exception:
+                pass
+        return cursor
 
+    @staticmethod
+    @contextmanager
+    def pooled_connection(datasource):
+        """
+        Borrow a connection from the DataSource's pool for the duration of the block.
+        Connections that raised a driver error are discarded instead of reused.
+        Failures and latency feed the DataSource's circuit breaker (core.data_source.health):
+        while the source is known to be down this raises DataSourceUnavailable at once.
+        """
+        connect = lambda: DBConnector.get_connection(
+            datasource.db_type,
+            datasource.host,
+            datasource.port,
+            datasource.db_name,
+            datasource.username,
+            datasource.password
+        )
+        breaker = get_breaker(datasource, lambda: DBConnector._probe(datasource, connect))
+        breaker.check()
+        pool = get_pool(datasource, connect, DBConnector.get_validation_query(datasource.db_type))
+
+        start = time.monotonic()
+        try:
+            conn = pool.acquire()
+        except PoolTimeout:
+            raise  # The pool is busy, the source isn't necessarily failing
+        except Exception as e:
+            breaker.record_failure(e, time.monotonic() - start)
+            raise
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            # The connection may be in an unusable state (network error, aborted transaction)
+            discard = True
+            if is_connection_error(e) and not DBConnector._is_alive(conn, datasource.db_type):
+                breaker.record_failure(e, time.monotonic() - start)
+            raise
         else:
-            raise NotImplementedError(f"Database type {db_type} not supported yet.")
+            breaker.record_success(time.monotonic() - start)
+        finally:
+            pool.release(conn, discard=discard)
+
+    @staticmethod
+    def _is_alive(conn, db_type):
+        """Whether conn still answers the validation query (errors like "no such column" leave it usable)."""
+        cursor = None
+        try:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            cursor = conn.cursor()
+            cursor.execute(DBConnector.get_validation_query(db_type))
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _probe(datasource, connect):
+        """Background health probe: open a fresh connection and run the validation query."""
+        conn = connect()
+        try:
+            if not DBConnector._is_alive(conn, datasource.db_type):
+                raise ConnectionError(f"Validation query failed on '{datasource.name}'")
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
 
     @staticmethod
     def test_connection(datasource):
@@ -99,11 +128,8 @@ class DBConnector:
             cursor = conn.cursor()
             
             # Different validation queries for different DBs
-            if datasource.db_type == 'oracle':
-                cursor.execute("SELECT 1 FROM DUAL")
-            else:
-                cursor.execute("SELECT 1")
-                
+            cursor.execute(DBConnector.get_validation_query(datasource.db_type))
+
             cursor.fetchone()
             return True, "Connection successful"
         except Exception as e:
@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from core.data_source.pool import _signature
+
+logger = logging.getLogger(__name__)
+
+
+class DataSourceUnavailable(Exception):
+    """Raised instead of connecting while a DataSource's circuit breaker is open."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Health of one DataSource in this process. Recent connect/query outcomes
+    and latencies are kept for statistics; after failure_threshold failures in
+    a row the breaker opens: queries fail at once with DataSourceUnavailable
+    and a background thread probes the source every probe_interval seconds,
+    closing the breaker again as soon as a probe connects.
+    """
+
+    def __init__(self, name, probe, failure_threshold=3, probe_interval=15, window=50):
+        self.name = name
+        self._probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)  # (ok, latency)
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._last_error = ''
+        self._last_probe = None
+        self._probe_thread = None
+        self._stopped = threading.Event()
+
+        # Statistics
+        self._failures = 0
+        self._rejected = 0
+        self._probes = 0
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def check(self):
+        """Raise DataSourceUnavailable while the breaker is open."""
+        if self._opened_at is None:
+            return
+        with self._lock:
+            self._rejected += 1
+        raise DataSourceUnavailable(f"数据源不可用: {self.name}")
+
+    def record_success(self, latency):
+        with self._lock:
+            self._recent.append((True, latency))
+            self._consecutive_failures = 0
+
+    def record_failure(self, error, latency=None):
+        with self._lock:
+            self._recent.append((False, latency))
+            self._failures += 1
+            self._consecutive_failures += 1
+            self._last_error = str(error)
+            if (self._opened_at is not None or not self.failure_threshold
+                    or self._consecutive_failures < self.failure_threshold):
+                return
+            self._opened_at = time.time()
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, name=f"bi-probe-{self.name}", daemon=True
+            )
+        logger.warning(
+            f"Data source '{self.name}' is unavailable after {self.failure_threshold} failures, "
+            f"probing every {self.probe_interval}s: {error}"
+        )
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        while not self._stopped.wait(self.probe_interval):
+            start = time.monotonic()
+            try:
+                self._probe()
+            except Exception as e:
+                with self._lock:
+                    self._probes += 1
+                    self._last_probe = time.time()
+                    self._last_error = str(e)
+                logger.info(f"Probe of data source '{self.name}' failed: {e}")
+                continue
+            with self._lock:
+                self._probes += 1
+                self._last_probe = time.time()
+                self._recent.append((True, time.monotonic() - start))
+                self._consecutive_failures = 0
+                self._opened_at = None
+                self._probe_thread = None
+            logger.info(f"Data source '{self.name}' is available again")
+            return
+
+    def close(self):
+        """Stop probing (the breaker is being replaced or dropped)."""
+        self._stopped.set()
+
+    def stats(self):
+        with self._lock:
+            latencies = [latency for ok, latency in self._recent if ok and latency is not None]
+            return {
+                'name': self.name,
+                'state': 'open' if self._opened_at is not None else 'closed',
+                'opened_at': self._opened_at,
+                'consecutive_failures': self._consecutive_failures,
+                'recent_failures': sum(1 for ok, _ in self._recent if not ok),
+                'recent_total': len(self._recent),
+                'latency_avg': round(sum(latencies) / len(latencies), 4) if latencies else None,
+                'latency_max': round(max(latencies), 4) if latencies else None,
+                'failures': self._failures,
+                'rejected': self._rejected,
+                'probes': self._probes,
+                'last_probe': self._last_probe,
+                'last_error': self._last_error,
+            }
+
+
+def is_connection_error(error):
+    """
+    Whether a driver error may mean the source itself is failing (as opposed
+    to e.g. a SQL syntax error): DB-API OperationalError/InterfaceError and
+    network errors. Callers confirm with a validation query on the connection.
+    """
+    if isinstance(error, (OSError, TimeoutError)):
+        return True
+    return any(cls.__name__ in ('OperationalError', 'InterfaceError') for cls in type(error).__mro__)
+
+
+# Breakers keyed by DataSource pk, with the same staleness signature as the pools
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(datasource, probe):
+    """
+    Return the circuit breaker for a DataSource, creating (or replacing a
+    stale) one. probe is a zero-argument callable that raises while the
+    source is down.
+    """
+    signature = _signature(datasource)
+    stale = None
+    with _breakers_lock:
+        entry = _breakers.get(datasource.pk)
+        if entry and entry[0] == signature:
+            return entry[1]
+        if entry:
+            stale = entry[1]
+        breaker = CircuitBreaker(
+            name=datasource.name,
+            probe=probe,
+            failure_threshold=getattr(settings, 'BI_BREAKER_FAILURE_THRESHOLD', 3),
+            probe_interval=getattr(settings, 'BI_BREAKER_PROBE_INTERVAL', 15),
+            window=getattr(settings, 'BI_BREAKER_WINDOW', 50),
+        )
+        _breakers[datasource.pk] = (signature, breaker)
+    if stale:
+        stale.close()
+    return breaker
+
+
+def check_available(datasource_id):
+    """
+    Raise DataSourceUnavailable while the DataSource's breaker in this process
+    is open, so callers can fail before queueing for a query slot.
+    """
+    with _breakers_lock:
+        entry = _breakers.get(datasource_id)
+    if entry:
+        entry[1].check()
+
+
+def reset_breaker(datasource_id):
+    """Forget a DataSource's health (e.g. after it was edited)."""
+    with _breakers_lock:
+        entry = _breakers.pop(datasource_id, None)
+    if entry:
+        entry[1].close()
+
+
+def health_stats():
+    """Return circuit breaker statistics for every DataSource in this process, keyed by pk."""
+    with _breakers_lock:
+        entries = list(_breakers.items())
+    return {pk: breaker.stats() for pk, (_, breaker) in entries}
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_source', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='datasource',
+            name='db_name',
+            field=models.CharField(help_text='Database name, or the file path for SQLite/DuckDB', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='datasource',
+            name='db_type',
+            field=models.CharField(choices=[('mssql', 'Microsoft SQL Server'), ('mysql', 'MySQL'), ('postgresql', 'PostgreSQL'), ('oracle', 'Oracle'), ('sqlite', 'SQLite (local file)'), ('duckdb', 'DuckDB (local file)')], default='mssql', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='datasource',
+            name='host',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='datasource',
+            name='username',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_source', '0002_local_db_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='max_concurrent_queries',
+            field=models.PositiveIntegerField(default=0, help_text='Queries run at once across all workers, 0 = BI_QUERY_MAX_CONCURRENT (unlimited by default)'),
+        ),
+    ]
@@ -9,15 +9,22 @@ class DataSource(models.Model):
         ('mysql', 'MySQL'),
         ('postgresql', 'PostgreSQL'),
         ('oracle', 'Oracle'),
+        ('sqlite', 'SQLite (local file)'),
+        ('duckdb', 'DuckDB (local file)'),
     )
+    # File-based types: db_name is the file path, host/port/username are unused
+    LOCAL_DB_TYPES = ('sqlite', 'duckdb')
 
     name = models.CharField(max_length=100, unique=True, verbose_name="Connection Name")
     db_type = models.CharField(max_length=20, choices=DB_TYPES, default='mssql')
-    host = models.CharField(max_length=200)
+    host = models.CharField(max_length=200, blank=True)
     port = models.IntegerField(default=1433)
-    username = models.CharField(max_length=100)
+    username = models.CharField(max_length=100, blank=True)
     password = models.CharField(max_length=200, help_text="Encrypted storage recommended")
-    db_name = models.CharField(max_length=100)
+    db_name = models.CharField(max_length=255, help_text="Database name, or the file path for SQLite/DuckDB")
+    max_concurrent_queries = models.PositiveIntegerField(
+        default=0, help_text="Queries run at once across all workers, 0 = BI_QUERY_MAX_CONCURRENT (unlimited by default)"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,261 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections for a single DataSource.
+
+    Connections are created lazily up to max_size, validated on checkout
+    when they have been idle for a while, and closed after idle_timeout.
+    """
+
+    def __init__(self, name, connect, validation_sql, max_size=5, idle_timeout=300,
+                 checkout_timeout=30, validate_after=30):
+        self.name = name
+        self._connect = connect
+        self.validation_sql = validation_sql
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.validate_after = validate_after
+
+        self._lock = threading.Condition()
+        self._idle = []  # list of (conn, last_used)
+        self._in_use = 0
+        self._closed = False
+
+        # Statistics
+        self._created = 0
+        self._destroyed = 0
+        self._checkouts = 0
+        self._waiting = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._connect_total = 0.0
+        self._connect_max = 0.0
+        self._connect_last = 0.0
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        with self._lock:
+            expired = self._evict_idle()
+        # Closing may block on the network, so it happens outside the lock
+        for conn in expired:
+            self._close_quietly(conn)
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout(f"Connection pool '{self.name}' is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Timed out after {self.checkout_timeout}s waiting for a connection to '{self.name}'"
+                    )
+                self._waiting += 1
+                try:
+                    self._lock.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            # Reserve the slot before doing any I/O outside the lock
+            self._in_use += 1
+            self._checkouts += 1
+            waited = time.monotonic() - start
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if conn is not None and time.monotonic() - last_used > self.validate_after:
+                if not self._validate(conn):
+                    self._close_quietly(conn)
+                    conn = None
+            if conn is None:
+                connect_start = time.monotonic()
+                conn = self._connect()
+                elapsed = time.monotonic() - connect_start
+                logger.debug(f"Opened connection to '{self.name}' in {elapsed:.3f}s")
+                with self._lock:
+                    self._created += 1
+                    self._connect_total += elapsed
+                    self._connect_max = max(self._connect_max, elapsed)
+                    self._connect_last = elapsed
+            return conn
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        """
+        Return a connection to the pool. Any open transaction is rolled back
+        so the next borrower starts clean; broken connections are closed.
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding pooled connection for '{self.name}': {e}")
+                discard = True
+
+        with self._lock:
+            self._in_use -= 1
+            if discard or self._closed:
+                keep = False
+            else:
+                keep = True
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+        if not keep:
+            self._close_quietly(conn)
+
+    def close(self):
+        """Close all idle connections; in-use ones are closed when released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._lock.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'created': self._created,
+                'closed': self._destroyed,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_time_total': round(self._wait_total, 4),
+                'wait_time_max': round(self._wait_max, 4),
+                # Time spent opening new connections (driver lookup, network, login)
+                'connect_time_total': round(self._connect_total, 4),
+                'connect_time_avg': round(self._connect_total / self._created, 4) if self._created else 0.0,
+                'connect_time_max': round(self._connect_max, 4),
+                'connect_time_last': round(self._connect_last, 4),
+            }
+
+    def _evict_idle(self):
+        """Remove connections idle longer than idle_timeout, returns them for the caller to close."""
+        # Caller must hold the lock
+        now = time.monotonic()
+        keep = []
+        expired = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        return expired
+
+    def _validate(self, conn):
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.validation_sql)
+            cursor.fetchall()
+            return True
+        except Exception as e:
+            logger.info(f"Pooled connection for '{self.name}' failed validation: {e}")
+            return False
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._destroyed += 1
+
+
+# Pools keyed by DataSource pk. The signature lets us notice that a row was
+# edited by another process (different updated_at / credentials).
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _signature(datasource):
+    return (
+        datasource.updated_at,
+        datasource.db_type,
+        datasource.host,
+        datasource.port,
+        datasource.db_name,
+        datasource.username,
+        datasource.password,
+    )
+
+
+def get_pool(datasource, connect, validation_sql):
+    """
+    Return the pool for a DataSource, creating (or replacing a stale) one.
+    connect is a zero-argument callable that opens a new raw connection.
+    """
+    signature = _signature(datasource)
+    stale = None
+    with _pools_lock:
+        entry = _pools.get(datasource.pk)
+        if entry and entry[0] == signature:
+            return entry[1]
+        if entry:
+            stale = entry[1]
+        pool = ConnectionPool(
+            name=datasource.name,
+            connect=connect,
+            validation_sql=validation_sql,
+            max_size=getattr(settings, 'BI_POOL_MAX_SIZE', 5),
+            idle_timeout=getattr(settings, 'BI_POOL_IDLE_TIMEOUT', 300),
+            checkout_timeout=getattr(settings, 'BI_POOL_CHECKOUT_TIMEOUT', 30),
+            validate_after=getattr(settings, 'BI_POOL_VALIDATE_AFTER', 30),
+        )
+        _pools[datasource.pk] = (signature, pool)
+    if stale:
+        stale.close()
+    return pool
+
+
+def invalidate_pool(datasource_id):
+    """Drop and close the pool for a DataSource (e.g. after it was edited)."""
+    with _pools_lock:
+        entry = _pools.pop(datasource_id, None)
+    if entry:
+        entry[1].close()
+
+
+def pool_stats():
+    """Return statistics for every pool in this process, keyed by DataSource pk."""
+    with _pools_lock:
+        entries = list(_pools.items())
+    return {pk: pool.stats() for pk, (_, pool) in entries}
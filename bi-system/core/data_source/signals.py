@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.data_source.models import DataSource
+from core.data_source.health import reset_breaker
+from core.data_source.pool import invalidate_pool
+
+@receiver(post_save, sender=DataSource)
+@receiver(post_delete, sender=DataSource)
+def datasource_changed(sender, instance, **kwargs):
+    """
+    Close pooled connections when a DataSource is edited or removed,
+    so the next query reconnects with the new settings (and its health is tracked anew).
+    """
+    invalidate_pool(instance.pk)
+    reset_breaker(instance.pk)
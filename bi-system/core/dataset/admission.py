@@ -0,0 +1,237 @@
+import contextvars
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from core.dataset.cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# Priority of the queries issued by the current thread/task, see background_queries()
+_priority = contextvars.ContextVar('bi_query_priority', default=INTERACTIVE)
+
+_owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class QueryRejected(Exception):
+    """Raised when a query is not admitted: the DataSource's wait queue is full or the wait timed out."""
+    pass
+
+
+@contextmanager
+def background_queries():
+    """
+    Run the block's queries at background priority (scheduled tasks, pre-warming):
+    they queue behind viewer queries and leave BI_QUERY_INTERACTIVE_RESERVE slots free.
+    """
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def get_query_priority():
+    return _priority.get()
+
+
+def get_max_concurrent(datasource):
+    """Queries a DataSource may run at once across all workers, 0 = unlimited."""
+    return (getattr(datasource, 'max_concurrent_queries', 0)
+            or getattr(settings, 'BI_QUERY_MAX_CONCURRENT', 0))
+
+
+class AdmissionController:
+    """
+    Concurrency limit of one DataSource. Running queries hold a slot key
+    ("<prefix>:<n>", n < limit) in the shared query cache, taken with the atomic
+    cache.add(), so the limit holds across worker processes when the cache is
+    shared (Redis). Slots expire after lease seconds, so a crashed worker can't
+    leak them. Queries that find no free slot wait in a bounded local queue,
+    interactive ones ahead of background ones; background queries also never take
+    the last `reserve` slots (see background_slots()).
+    """
+
+    def __init__(self, key, queue_size=20, timeout=30, lease=600, reserve=1, poll_interval=0.1):
+        if reserve < 0:
+            raise ValueError(f"reserve must be >= 0, got {reserve}")
+        self.key = key
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.lease = lease
+        self.reserve = reserve
+        self.poll_interval = poll_interval
+        self._reserve_warned = False
+
+        self._cond = threading.Condition()
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+
+        # Statistics
+        self._admitted = 0
+        self._queued = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _slot_key(self, index):
+        return f"bi:admission:{self.key}:{index}"
+
+    def background_slots(self, limit):
+        """
+        Slots background queries may take. The reserve is capped at limit - 1:
+        with limit <= reserve, scheduled tasks would otherwise never run, so
+        they keep a single slot.
+        """
+        reserve = min(self.reserve, limit - 1)
+        if reserve < self.reserve and not self._reserve_warned:
+            self._reserve_warned = True
+            logger.warning(
+                f"Interactive reserve {self.reserve} of '{self.key}' is not below its limit {limit}, "
+                f"reserving {reserve} slot(s) instead"
+            )
+        return limit - reserve
+
+    def _claim(self, limit, priority, owner):
+        """Take a free slot; returns its cache key, None when all are taken, '' if the cache failed."""
+        slots = limit if priority == INTERACTIVE else self.background_slots(limit)
+        try:
+            backend = QueryCache.get_backend()
+            for index in range(slots):
+                slot_key = self._slot_key(index)
+                if backend.add(slot_key, owner, self.lease):
+                    return slot_key
+        except Exception as e:
+            # Don't turn a cache outage into a query outage
+            logger.warning(f"Admission control for '{self.key}' unavailable, admitting query: {e}")
+            return ''
+        return None
+
+    def acquire(self, limit, priority=INTERACTIVE):
+        """Wait for a slot, returns (slot_key, owner) to pass to release(); raises QueryRejected."""
+        owner = f"{_owner_prefix}:{uuid.uuid4().hex[:12]}"
+        start = time.monotonic()
+        with self._cond:
+            queued = self._waiting[INTERACTIVE] + (self._waiting[BACKGROUND] if priority == BACKGROUND else 0)
+        if not queued:
+            slot_key = self._claim(limit, priority, owner)
+            if slot_key is not None:
+                with self._cond:
+                    self._admitted += 1
+                return slot_key, owner
+
+        with self._cond:
+            if sum(self._waiting.values()) >= self.queue_size:
+                self._rejected += 1
+                raise QueryRejected(f"数据源繁忙，请稍后再试 ({self.key}: {self.queue_size} queries waiting)")
+            self._waiting[priority] += 1
+            self._queued += 1
+        deadline = start + self.timeout
+        try:
+            while True:
+                with self._cond:
+                    # Background queries only compete once no viewer query is waiting here
+                    turn = priority == INTERACTIVE or not self._waiting[INTERACTIVE]
+                if turn:
+                    slot_key = self._claim(limit, priority, owner)
+                    if slot_key is not None:
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        self._timeouts += 1
+                    raise QueryRejected(f"数据源繁忙，请稍后再试 ({self.key}: waited {self.timeout}s)")
+                with self._cond:
+                    # Woken by local releases; slots freed by other workers are seen on the next poll
+                    self._cond.wait(min(self.poll_interval, remaining))
+        finally:
+            with self._cond:
+                self._waiting[priority] -= 1
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._admitted += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return slot_key, owner
+
+    def release(self, slot):
+        slot_key, owner = slot
+        if slot_key:
+            try:
+                backend = QueryCache.get_backend()
+                # The lease may have expired and been taken over by another query
+                if backend.get(slot_key) == owner:
+                    backend.delete(slot_key)
+            except Exception as e:
+                logger.warning(f"Releasing query slot {slot_key} failed: {e}")
+        with self._cond:
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'key': self.key,
+                'waiting_interactive': self._waiting[INTERACTIVE],
+                'waiting_background': self._waiting[BACKGROUND],
+                'admitted': self._admitted,
+                'queued': self._queued,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'wait_time_total': round(self._wait_total, 4),
+                'wait_time_max': round(self._wait_max, 4),
+            }
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(datasource):
+    with _controllers_lock:
+        controller = _controllers.get(datasource.pk)
+        if controller is None:
+            controller = AdmissionController(
+                key=f"ds{datasource.pk}",
+                queue_size=getattr(settings, 'BI_QUERY_QUEUE_SIZE', 20),
+                timeout=getattr(settings, 'BI_QUERY_QUEUE_TIMEOUT', 30),
+                lease=getattr(settings, 'BI_QUERY_SLOT_LEASE', 600),
+                reserve=getattr(settings, 'BI_QUERY_INTERACTIVE_RESERVE', 1),
+                poll_interval=getattr(settings, 'BI_QUERY_QUEUE_POLL', 0.1),
+            )
+            _controllers[datasource.pk] = controller
+        return controller
+
+
+@contextmanager
+def admit(datasource):
+    """
+    Hold one of the DataSource's query slots for the block (no-op when it has
+    no concurrency limit). Raises QueryRejected when the source is saturated.
+    """
+    limit = get_max_concurrent(datasource)
+    if not limit:
+        yield
+        return
+    controller = get_controller(datasource)
+    slot = controller.acquire(limit, get_query_priority())
+    try:
+        yield
+    finally:
+        controller.release(slot)
+
+
+def admission_stats():
+    """Return admission statistics for every DataSource in this process, keyed by pk."""
+    with _controllers_lock:
+        entries = list(_controllers.items())
+    return {pk: controller.stats() for pk, controller in entries}
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+class DataSetConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core.dataset'
+    label = 'dataset'
+
+    def ready(self):
+        # Register signal handlers
+        from core.dataset import signals  # noqa: F401
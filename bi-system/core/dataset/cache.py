@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """
+    Result cache for QueryExecutor backed by Django's cache framework.
+    Payloads are pickled and zlib-compressed before they are stored.
+    """
+    KEY_PREFIX = 'bi:query:v2:'
+    VERSION_PREFIX = 'bi:dataset:ver:'
+
+    @staticmethod
+    def get_backend():
+        return caches[getattr(settings, 'BI_QUERY_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def default_ttl():
+        return getattr(settings, 'BI_QUERY_CACHE_TTL', 300)
+
+    @staticmethod
+    def normalize_filters(filters):
+        """
+        Turn a filter list into a stable, order-independent representation.
+        Entries without col/op are dropped, just like the SQL builder does.
+        """
+        if not filters or not isinstance(filters, list):
+            return []
+        normalized = []
+        for f in filters:
+            if not isinstance(f, dict) or not f.get('col') or not f.get('op'):
+                continue
+            normalized.append([f.get('col'), f.get('op'), '' if f.get('val') is None else str(f.get('val'))])
+        return sorted(normalized)
+
+    @staticmethod
+    def build_key(datasource, sql, filters=None, limit=None, aggregation=None, params=None, version=None,
+                  columns=None):
+        payload = json.dumps({
+            'ds': datasource.pk,
+            # Editing the DataSource (e.g. pointing it at another server) changes the key
+            'ds_ver': str(datasource.updated_at),
+            'sql': sql.strip(),
+            'filters': QueryCache.normalize_filters(filters),
+            'limit': limit,
+            'aggregation': aggregation,
+            'params': list(params or []),
+            'version': version,
+            'columns': list(columns) if columns else None,
+        }, sort_keys=True, default=str)
+        return QueryCache.KEY_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def dataset_version(dataset_id):
+        """
+        Version token of a dataset's cached results. Bumping it (see
+        core.dataset.dependencies.invalidate_dataset) orphans all old entries.
+        """
+        key = QueryCache.VERSION_PREFIX + str(dataset_id)
+        try:
+            backend = QueryCache.get_backend()
+            version = backend.get(key)
+            if version is None:
+                # Never reuse a token: an evicted version must not revive old entries
+                version = time.time_ns()
+                if not backend.add(key, version, None):
+                    version = backend.get(key) or version
+            return version
+        except Exception as e:
+            logger.warning(f"Query cache version read failed: {e}")
+            return None
+
+    @staticmethod
+    def bump_versions(dataset_ids):
+        try:
+            version = time.time_ns()
+            QueryCache.get_backend().set_many(
+                {QueryCache.VERSION_PREFIX + str(pk): version for pk in dataset_ids}, None
+            )
+        except Exception as e:
+            logger.warning(f"Query cache invalidation failed: {e}")
+
+    @staticmethod
+    def get(key):
+        try:
+            raw = QueryCache.get_backend().get(key)
+            if raw is None:
+                return None
+            return pickle.loads(zlib.decompress(raw))
+        except Exception as e:
+            # A broken cache must never break the report
+            logger.warning(f"Query cache read failed: {e}")
+            return None
+
+    @staticmethod
+    def set(key, value, ttl):
+        try:
+            level = getattr(settings, 'BI_QUERY_CACHE_COMPRESS_LEVEL', 6)
+            raw = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), level)
+            QueryCache.get_backend().set(key, raw, ttl)
+        except Exception as e:
+            logger.warning(f"Query cache write failed: {e}")
+
+    @staticmethod
+    def delete(key):
+        try:
+            QueryCache.get_backend().delete(key)
+        except Exception as e:
+            logger.warning(f"Query cache delete failed: {e}")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs the
+    function, everyone arriving while it is in flight waits for its result.
+    A caller that waits longer than timeout seconds stops waiting and runs
+    the function itself, so a hung leader can't block every caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                logger.warning(f"In-flight query still running after {timeout}s, running it independently")
+                return fn()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+
+_query_flights = SingleFlight()
+
+
+def coalesce_query(key, fn, cache_key=None, refresh=False):
+    """
+    Run fn() once for all concurrent callers of the same query in this process.
+
+    When BI_QUERY_CACHE_DISTRIBUTED_LOCK is enabled and the result is cached
+    (cache_key given), the leader also takes a lock in the cache backend so
+    other worker processes wait for the cached result instead of querying.
+    Callers wait at most BI_QUERY_CACHE_LOCK_TIMEOUT seconds for another
+    caller's query, then run it themselves.
+    """
+    timeout = getattr(settings, 'BI_QUERY_CACHE_LOCK_TIMEOUT', 60)
+    if cache_key and getattr(settings, 'BI_QUERY_CACHE_DISTRIBUTED_LOCK', False):
+        return _query_flights.do(key, lambda: _run_with_cache_lock(cache_key, fn, refresh), timeout)
+    return _query_flights.do(key, fn, timeout)
+
+
+def _run_with_cache_lock(cache_key, fn, refresh):
+    backend = QueryCache.get_backend()
+    lock_key = cache_key + ':lock'
+    lock_ttl = getattr(settings, 'BI_QUERY_CACHE_LOCK_TIMEOUT', 60)
+    poll_interval = getattr(settings, 'BI_QUERY_CACHE_LOCK_POLL', 0.1)
+
+    try:
+        acquired = backend.add(lock_key, 1, lock_ttl)
+    except Exception as e:
+        logger.warning(f"Query cache lock failed, running without it: {e}")
+        return fn()
+
+    if acquired:
+        try:
+            return fn()
+        finally:
+            try:
+                backend.delete(lock_key)
+            except Exception:
+                pass
+
+    # Another process is running the same query: wait for it to release the
+    # lock and pick up what it cached. With refresh the old entry is still
+    # there, so only look at the cache once the lock is gone.
+    deadline = time.monotonic() + lock_ttl
+    while time.monotonic() < deadline:
+        if not refresh:
+            cached = QueryCache.get(cache_key)
+            if cached is not None:
+                return cached
+        try:
+            locked = backend.get(lock_key) is not None
+        except Exception:
+            locked = False
+        if not locked:
+            cached = QueryCache.get(cache_key)
+            if cached is not None:
+                return cached
+            break
+        time.sleep(poll_interval)
+
+    # The other process failed or timed out: run it ourselves
+    return fn()
+
+
+def get_dataset_cache_ttl(dataset):
+    """
+    Read the result cache TTL (seconds) for a DataSet from params_config,
+    e.g. {"cache_ttl": 600}. 0 disables caching for the dataset.
+    Returns None when the dataset does not override the default.
+    """
+    try:
+        config = json.loads(dataset.params_config or '{}')
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(config, dict) or config.get('cache_ttl') is None:
+        return None
+    try:
+        return max(int(config['cache_ttl']), 0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,97 @@
+import logging
+
+from django.core.exceptions import ValidationError
+
+from core.dataset.cache import QueryCache
+from core.dataset.models import DataSet, DataSetDependency
+from core.dataset.resolver import compile_template, forget_templates, get_dependencies
+
+logger = logging.getLogger(__name__)
+
+
+def parse_dependencies(sql_script):
+    """Dataset ids referenced by a SQL template through {{ dataset:ID }}."""
+    return set(get_dependencies(compile_template(sql_script or '')))
+
+
+def find_cycle(dataset_id, depends_on):
+    """
+    Return the cycle (list of dataset ids) that saving dataset_id with the
+    given direct dependencies would create, or None.
+    """
+    if dataset_id is None:
+        # A new dataset can only have a cycle with itself
+        return None
+    if dataset_id in depends_on:
+        return [dataset_id, dataset_id]
+
+    edges = {}
+    for src, dst in DataSetDependency.objects.exclude(dataset_id=dataset_id).values_list('dataset_id', 'depends_on_id'):
+        edges.setdefault(src, []).append(dst)
+
+    # Depth-first search from the new dependencies back to dataset_id
+    parents = {pk: dataset_id for pk in depends_on}
+    stack = list(depends_on)
+    while stack:
+        pk = stack.pop()
+        for dst in edges.get(pk, ()):
+            if dst in parents:
+                continue
+            parents[dst] = pk
+            if dst == dataset_id:
+                path = [dst]
+                node = pk
+                while node != dataset_id:
+                    path.append(node)
+                    node = parents[node]
+                path.append(dataset_id)
+                return list(reversed(path))
+            stack.append(dst)
+    return None
+
+
+def check_dependency_cycle(dataset):
+    """Raise ValidationError if dataset's SQL would create a dependency cycle."""
+    cycle = find_cycle(dataset.pk, parse_dependencies(dataset.sql_script))
+    if cycle:
+        names = dict(DataSet.objects.filter(pk__in=cycle).values_list('id', 'name'))
+        if dataset.pk:
+            names[dataset.pk] = dataset.name
+        path = " -> ".join(names.get(pk, str(pk)) for pk in cycle)
+        raise ValidationError({'sql_script': f"数据集存在循环引用: {path}"})
+
+
+def sync_dependencies(dataset):
+    """Store dataset's direct {{ dataset:ID }} references as DataSetDependency rows."""
+    referenced = parse_dependencies(dataset.sql_script)
+    existing = set(DataSet.objects.filter(pk__in=referenced).values_list('id', flat=True))
+    current = set(DataSetDependency.objects.filter(dataset=dataset).values_list('depends_on_id', flat=True))
+
+    DataSetDependency.objects.filter(dataset=dataset).exclude(depends_on_id__in=existing).delete()
+    DataSetDependency.objects.bulk_create(
+        [DataSetDependency(dataset=dataset, depends_on_id=pk) for pk in existing - current],
+        ignore_conflicts=True,
+    )
+
+
+def get_dependents(dataset_id):
+    """Ids of every dataset that (transitively) references dataset_id."""
+    dependents = set()
+    frontier = {dataset_id}
+    while frontier:
+        found = set(DataSetDependency.objects.filter(depends_on_id__in=frontier).values_list('dataset_id', flat=True))
+        frontier = found - dependents - {dataset_id}
+        dependents |= frontier
+    return dependents
+
+
+def invalidate_dataset(dataset_id):
+    """
+    Invalidate cached results and compiled templates of a dataset and of
+    every dataset built on it. Unrelated datasets keep their cache.
+    """
+    affected = {dataset_id} | get_dependents(dataset_id)
+    QueryCache.bump_versions(affected)
+    forget_templates(affected)
+    logger.info(f"Invalidated cache for datasets {sorted(affected)}")
+    return affected
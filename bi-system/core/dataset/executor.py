@@ -1,21 +1,401 @@
 import logging
+import re
+from django.conf import settings
+from core.data_source.backends import get_backend
 from core.data_source.connector import DBConnector
+from core.data_source.health import check_available
+from core.dataset.admission import admit
+from core.dataset.cache import QueryCache, coalesce_query
+from core.dataset.result import QueryResult
+from core.dataset.semantic import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# Chart aggregation names (see apps.dashboard.utils.data_processing.aggregate_data) -> SQL functions.
+# Pushed-down aggregates (and the rollup/extract paths built on them) must give the
+# same numbers as aggregate_data: NULL measures count as 0 and rows with a NULL
+# group key are dropped. See QueryExecutor.measure_sql.
+SQL_AGGREGATES = {
+    'sum': 'SUM',
+    'mean': 'AVG',
+    'max': 'MAX',
+    'min': 'MIN',
+    'count': 'COUNT',
+}
+
+# Pieces of a leading "WITH name [(cols)] AS [[NOT] MATERIALIZED] (...), ..." clause
+WITH_PATTERN = re.compile(r'\s*WITH\s+(?:RECURSIVE\s+)?', re.IGNORECASE)
+CTE_NAME_PATTERN = re.compile(r'\s*("(?:[^"]|"")*"|\[[^\]]*\]|`[^`]*`|\w+)\s*')
+CTE_AS_PATTERN = re.compile(r'\s*AS\s*(?:(?:NOT\s+)?MATERIALIZED\s*)?', re.IGNORECASE)
+CTE_SEPARATOR_PATTERN = re.compile(r'\s*,')
+
+# Section kinds of scan_sql
+SQL_CODE = 'code'
+SQL_QUOTED = 'quoted'
+SQL_COMMENT = 'comment'
+
+def scan_sql(sql, pos=0, backslash_escapes=False):
+    """
+    Split sql (from pos) into sections, yielding (kind, start, end):
+      SQL_CODE     plain SQL
+      SQL_QUOTED   '...' / "..." / `...` (string literal or quoted identifier,
+                   sql[start] is the quote); a doubled quote is escaped, and so
+                   is a quote after a backslash when backslash_escapes (MySQL)
+      SQL_COMMENT  -- ... (up to and including the newline) or /* ... */
+    Unterminated quotes and comments run to the end of sql.
+    """
+    n = len(sql)
+    code_start = i = pos
+    while i < n:
+        ch = sql[i]
+        if ch in "'\"`":
+            kind = SQL_QUOTED
+            end = i + 1
+            while end < n:
+                if backslash_escapes and sql[end] == '\\' and ch != '`':
+                    end += 2
+                elif sql[end] == ch:
+                    if sql.startswith(ch, end + 1):
+                        end += 2
+                    else:
+                        break
+                else:
+                    end += 1
+            end = min(end + 1, n)
+        elif sql.startswith('--', i):
+            kind = SQL_COMMENT
+            end = sql.find('\n', i)
+            end = n if end == -1 else end + 1
+        elif sql.startswith('/*', i):
+            kind = SQL_COMMENT
+            end = sql.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+        else:
+            i += 1
+            continue
+        if code_start < i:
+            yield SQL_CODE, code_start, i
+        yield kind, i, end
+        code_start = i = end
+    if code_start < n:
+        yield SQL_CODE, code_start, n
+
+def _skip_parens(sql, pos):
+    """
+    Return the index just after the parenthesis group starting at sql[pos],
+    ignoring parentheses in string literals, quoted identifiers and comments.
+    """
+    depth = 0
+    for kind, start, end in scan_sql(sql, pos):
+        if kind != SQL_CODE:
+            continue
+        for i in range(start, end):
+            if sql[i] == '(':
+                depth += 1
+            elif sql[i] == ')':
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+    return None
+
+def _type_name(db_type, type_code):
+    """Readable column type from a driver's cursor.description type_code."""
+    return get_backend(db_type).type_name(type_code)
+
+def _parse_with(sql):
+    """
+    Scan a leading WITH clause, returns (end position, recursive, [(name, definition)])
+    or None when sql doesn't start with a recognizable one.
+    """
+    match = WITH_PATTERN.match(sql)
+    if not match:
+        return None
+    recursive = 'RECURSIVE' in match.group(0).upper()
+    pos = match.end()
+    definitions = []
+    while True:
+        name = CTE_NAME_PATTERN.match(sql, pos)
+        if not name:
+            return None
+        start = pos = name.end()
+        if sql.startswith('(', pos):
+            # Column list
+            pos = _skip_parens(sql, pos)
+            if pos is None:
+                return None
+        as_part = CTE_AS_PATTERN.match(sql, pos)
+        if not as_part or not sql.startswith('(', as_part.end()):
+            return None
+        pos = _skip_parens(sql, as_part.end())
+        if pos is None:
+            return None
+        definitions.append((name.group(1), sql[start:pos].strip()))
+        separator = CTE_SEPARATOR_PATTERN.match(sql, pos)
+        if not separator:
+            break
+        pos = separator.end()
+    return pos, recursive, definitions
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a query returns more rows/bytes than the request allows."""
+    pass
+
 class QueryExecutor:
     @staticmethod
-    def execute(datasource, sql, limit=None, filters=None):
+    def quote_identifier(db_type, name):
+        """
+        Quote a column name for the given database dialect
+        """
+        return get_backend(db_type).quote_identifier(name)
+
+    @staticmethod
+    def get_aggregation_spec(x_axis, y_axis, aggregation, series_col=None):
+        """
+        Build the aggregation spec for execute() from a chart's config.
+        Returns None when the chart has nothing that can be grouped in SQL,
+        in which case callers fall back to raw rows + aggregate_data.
+        """
+        if not x_axis or not isinstance(x_axis, str) or aggregation not in SQL_AGGREGATES:
+            return None
+        if isinstance(y_axis, str):
+            y_axis = [y_axis]
+        if not y_axis:
+            return None
+        group_cols = [x_axis]
+        if series_col and isinstance(series_col, str) and series_col != x_axis:
+            group_cols.append(series_col)
+        # Deduplicate like aggregate_data does; a measure can't also be a group column
+        measures = [c for c in dict.fromkeys(y_axis) if c and isinstance(c, str)]
+        if not measures or any(c in group_cols for c in measures):
+            return None
+        return {
+            'group_by': group_cols,
+            'measures': measures,
+            'aggregation': aggregation,
+        }
+
+    @staticmethod
+    def split_cte(sql):
+        """
+        Split a leading WITH clause off a statement, returns (with_prefix, body).
+        MSSQL and Oracle reject WITH inside a derived table, so execute() wraps
+        only the body and puts the WITH clause in front of the outer SELECT.
+        Returns ("", sql) when there is no (recognizable) WITH clause.
+        """
+        parsed = _parse_with(sql)
+        if parsed is None:
+            return "", sql
+        pos = parsed[0]
+        return sql[:pos].strip() + " ", sql[pos:].strip()
+
+    @staticmethod
+    def parse_cte(sql):
+        """
+        Parse a leading WITH clause into (definitions, body, recursive), where
+        definitions is a list of (name, definition) pairs such as
+        ('t', '(a, b) AS (SELECT ...)'); None when there is no (recognizable) WITH clause.
+        """
+        parsed = _parse_with(sql)
+        if parsed is None:
+            return None
+        pos, recursive, definitions = parsed
+        return definitions, sql[pos:].strip(), recursive
+
+    @staticmethod
+    def measure_sql(db_type, col, aggregation):
+        """
+        SQL aggregate of one measure with aggregate_data's semantics: NULLs are
+        aggregated as 0 (so COUNT counts every row) and AVG is computed in floating
+        point (MSSQL would truncate the AVG of an integer column).
+        """
+        backend = get_backend(db_type)
+        value = f"COALESCE({backend.quote_identifier(col)}, 0)"
+        if aggregation == 'count':
+            return "COUNT(*)"
+        if aggregation == 'mean':
+            return f"AVG(CAST({value} AS {backend.float_type}))"
+        return f"{SQL_AGGREGATES[aggregation]}({value})"
+
+    @staticmethod
+    def _build_aggregate_sql(db_type, sql, where_clause, limit, spec):
+        """
+        SELECT x, series, AGG(y) ... FROM (sql) WHERE x IS NOT NULL AND series IS NOT NULL
+        GROUP BY x, series ORDER BY x, series
+        Rows come back in the same order pandas groupby would produce, which
+        also drops NULL group keys.
+        """
+        group_cols = [QueryExecutor.quote_identifier(db_type, c) for c in spec['group_by']]
+        select_cols = list(group_cols)
+        for col in spec['measures']:
+            quoted = QueryExecutor.quote_identifier(db_type, col)
+            select_cols.append(f"{QueryExecutor.measure_sql(db_type, col, spec['aggregation'])} AS {quoted}")
+        not_null = " AND ".join(f"{c} IS NOT NULL" for c in group_cols)
+        where_clause = f"{where_clause} AND {not_null}" if where_clause else f" WHERE {not_null}"
+        select_part = ", ".join(select_cols)
+        group_part = ", ".join(group_cols)
+        return get_backend(db_type).aggregate_sql(select_part, sql, where_clause, group_part, limit)
+
+    @staticmethod
+    def apply_paramstyle(db_type, sql, params):
+        """
+        Rewrite '?' placeholders into the driver's paramstyle.
+        '?' inside string literals, quoted identifiers and comments is left alone.
+        pyodbc uses '?' natively; pymysql/psycopg2 use %s (so literal % must be
+        doubled); oracledb uses :1, :2, ...
+        """
+        backend = get_backend(db_type)
+        if not params or backend.paramstyle == 'qmark':
+            return sql
+        percent = backend.paramstyle == 'format'
+        out = []
+        index = 0
+        for kind, start, end in scan_sql(sql, backslash_escapes=backend.backslash_escapes):
+            chunk = sql[start:end]
+            if percent:
+                # Literal % must be doubled for format-style drivers, quoted or not
+                chunk = chunk.replace('%', '%%')
+            if kind != SQL_CODE:
+                out.append(chunk)
+                continue
+            for part_index, part in enumerate(chunk.split('?')):
+                if part_index:
+                    index += 1
+                    out.append('%s' if percent else f':{index}')
+                out.append(part)
+        return ''.join(out)
+
+    @staticmethod
+    def describe(datasource, sql, params=None):
+        """
+        Return the result columns of sql without fetching rows: a list of dicts
+        {name, type, nullable, size, precision, scale} from cursor.description.
+        The query is wrapped in a zero-row probe (WHERE 1=0), which databases
+        answer from the plan without scanning; SET FMTONLY is deprecated on MSSQL.
+        """
+        sql = sql.strip()
+        if sql.endswith(';'):
+            sql = sql[:-1]
+        with_prefix, sql = QueryExecutor.split_cte(sql)
+        probe = f"SELECT * FROM ({sql}){get_backend(datasource.db_type).table_alias('_wrapper_')} WHERE 1=0"
+        probe = with_prefix + probe
+        params = list(params or [])
+        driver_sql = QueryExecutor.apply_paramstyle(datasource.db_type, probe, params)
+
+        check_available(datasource.pk)
+        with admit(datasource), DBConnector.pooled_connection(datasource) as conn:
+            cursor = DBConnector.open_cursor(conn, datasource.db_type)
+            try:
+                if params:
+                    cursor.execute(driver_sql, params)
+                else:
+                    cursor.execute(driver_sql)
+                description = cursor.description or []
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+        columns = []
+        for col in description:
+            # name, type_code, display_size, internal_size, precision, scale, null_ok
+            col = tuple(col) + (None,) * (7 - len(col))
+            null_ok = col[6]
+            columns.append({
+                'name': col[0],
+                'type': _type_name(datasource.db_type, col[1]),
+                'nullable': None if null_ok is None else bool(null_ok),
+                'size': col[3],
+                'precision': col[4],
+                'scale': col[5],
+            })
+        return columns
+
+    @staticmethod
+    def _fetch_result(cursor, max_rows, max_bytes, fetch_size):
+        """
+        Read the cursor in fetchmany batches, converting each batch to columns
+        right away, and stop as soon as the row or byte budget is exceeded.
+        """
+        batch = None
+        if cursor.description is None and getattr(cursor, 'name', None):
+            # psycopg2 named cursors only describe the result after the first fetch
+            batch = cursor.fetchmany(fetch_size)
+        if not cursor.description:
+            return QueryResult.empty()
+
+        columns = [column[0] for column in cursor.description]
+        chunks = []
+        row_count = 0
+        byte_count = 0
+        while True:
+            if batch is None:
+                batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            chunk = QueryResult.from_rows(columns, batch)
+            batch = None
+            row_count += len(chunk)
+            if max_rows and row_count > max_rows:
+                raise QueryBudgetExceeded(
+                    f"Query returned more than {max_rows} rows; add filters or a limit to the dataset"
+                )
+            if max_bytes:
+                byte_count += chunk.nbytes
+                if byte_count > max_bytes:
+                    raise QueryBudgetExceeded(
+                        f"Query result exceeded {max_bytes / (1024 * 1024):.1f} MB after {row_count} rows; "
+                        f"add filters or a limit to the dataset"
+                    )
+            chunks.append(chunk)
+        return QueryResult.from_chunks(columns, chunks)
+
+    @staticmethod
+    def execute(datasource, sql, limit=None, filters=None, cache_ttl=None, use_cache=True, refresh=False,
+                aggregation=None, max_rows=None, max_bytes=None, params=None, cache_version=None,
+                columns=None):
         """
-        Execute SQL on datasource and return (columns, data)
+        Execute SQL on datasource and return a columnar QueryResult
         filters: list of dicts {'col': 'name', 'op': '=', 'val': 'value'}
+        params: bind values for '?' placeholders in sql (see resolve_dataset_sql)
+        aggregation: spec from get_aggregation_spec(); groups in SQL and returns only
+                     the aggregated rows (limit then applies to groups)
+        columns: only select these columns from the dataset (None = all); filters may
+                 still use any column
+        cache_ttl: result cache TTL in seconds (None = BI_QUERY_CACHE_TTL, 0 = no caching)
+        cache_version: dataset version token (QueryCache.dataset_version), so saving a
+                       dataset invalidates its results and those of its dependents
+        use_cache: False bypasses the result cache completely
+        refresh: skip the cached result but store the fresh one
+        max_rows / max_bytes: per-request budget (None = BI_QUERY_MAX_ROWS / BI_QUERY_MAX_BYTES,
+                              0 = unlimited); QueryBudgetExceeded is raised once it is exceeded
         """
         # Clean semicolon at the end if present
         sql = sql.strip()
         if sql.endswith(';'):
             sql = sql[:-1]
 
-        # Build WHERE clause from filters
+        if cache_ttl is None:
+            cache_ttl = QueryCache.default_ttl()
+        cache_key = None
+        base_key = None
+        if use_cache and cache_ttl:
+            cache_key = QueryCache.build_key(
+                datasource, sql, filters, limit, aggregation, params, cache_version, columns
+            )
+            if not aggregation:
+                # Lets e.g. limit=1 / limit=100 previews reuse a wider cached result
+                base_key = SemanticCache.base_key(datasource, sql, params, cache_version)
+            if not refresh:
+                cached = QueryCache.get(cache_key)
+                if cached is None and base_key:
+                    cached = SemanticCache.lookup(base_key, filters, limit, columns)
+                if cached is not None:
+                    return cached
+
+        # Build WHERE clause from filters. Values are bound, never inlined, so the
+        # statement text (and the server's cached plan) is the same for every value.
+        params = list(params or [])
         where_clause = ""
         if filters and isinstance(filters, list):
             conditions = []
@@ -24,39 +404,46 @@ class QueryExecutor:
                 op = f.get('op')
                 val = f.get('val')
                 
-                if not col or not op:
+                if not col or not op or not isinstance(col, str):
                     continue
-                    
-                # Basic SQL injection protection / quoting
-                # Determine if value is number or string
-                is_num = False
+                # Column names come from chart configs / the request: always quoted, never inlined
+                col = QueryExecutor.quote_identifier(datasource.db_type, col)
+
+                # Numeric-looking values are bound as numbers, like the unquoted literals before
+                bind_val = val
                 try:
-                    float(val)
-                    is_num = True
-                except (ValueError, TypeError):
-                    is_num = False
-                
-                safe_val = str(val).replace("'", "''")
-                val_str = f"{val}" if is_num else f"'{safe_val}'"
+                    num = float(val)
+                    bind_val = int(num) if num.is_integer() and '.' not in str(val) else num
+                except (ValueError, TypeError, OverflowError):
+                    bind_val = '' if val is None else str(val)
                 
                 if op == 'eq':
-                    conditions.append(f"{col} = {val_str}")
+                    conditions.append(f"{col} = ?")
+                    params.append(bind_val)
                 elif op == 'ne':
-                    conditions.append(f"{col} != {val_str}")
+                    conditions.append(f"{col} != ?")
+                    params.append(bind_val)
                 elif op == 'gt':
-                    conditions.append(f"{col} > {val_str}")
+                    conditions.append(f"{col} > ?")
+                    params.append(bind_val)
                 elif op == 'lt':
-                    conditions.append(f"{col} < {val_str}")
+                    conditions.append(f"{col} < ?")
+                    params.append(bind_val)
                 elif op == 'gte':
-                    conditions.append(f"{col} >= {val_str}")
+                    conditions.append(f"{col} >= ?")
+                    params.append(bind_val)
                 elif op == 'lte':
-                    conditions.append(f"{col} <= {val_str}")
+                    conditions.append(f"{col} <= ?")
+                    params.append(bind_val)
                 elif op == 'contains':
-                    conditions.append(f"{col} LIKE '%{safe_val}%'")
+                    conditions.append(f"{col} LIKE ?")
+                    params.append(f"%{val}%")
                 elif op == 'startswith':
-                    conditions.append(f"{col} LIKE '{safe_val}%'")
+                    conditions.append(f"{col} LIKE ?")
+                    params.append(f"{val}%")
                 elif op == 'endswith':
-                    conditions.append(f"{col} LIKE '%{safe_val}'")
+                    conditions.append(f"{col} LIKE ?")
+                    params.append(f"%{val}")
                 elif op == 'is_null':
                     conditions.append(f"{col} IS NULL")
                 elif op == 'is_not_null':
@@ -65,53 +452,61 @@ class QueryExecutor:
             if conditions:
                 where_clause = " WHERE " + " AND ".join(conditions)
 
-        # Apply wrapper with filters and limit
-        # Common syntax for MySQL, PG, SQLite, Oracle (with subquery)
-        # MSSQL uses TOP, different syntax
+        # Apply wrapper with filters and limit (LIMIT / TOP / ROWNUM per backend)
+        # A leading WITH clause (e.g. nested datasets rendered as CTEs) stays in
+        # front of the wrapper; its placeholders still come first, so params keep their order
+        with_prefix, sql = QueryExecutor.split_cte(sql)
+        select_part = "*"
+        if columns:
+            select_part = ", ".join(
+                QueryExecutor.quote_identifier(datasource.db_type, c) for c in dict.fromkeys(columns)
+            )
         
-        if datasource.db_type == 'mssql':
-             # MSSQL
-            limit_part = f"TOP {limit}" if limit else ""
-            sql = f"SELECT {limit_part} * FROM ({sql}) AS _wrapper_{where_clause}"
-        elif datasource.db_type == 'oracle':
-            # Oracle
-            if limit:
-                where_part = f"{where_clause} AND ROWNUM <= {limit}" if where_clause else f" WHERE ROWNUM <= {limit}"
-                sql = f"SELECT * FROM ({sql}) {where_part}"
-            else:
-                sql = f"SELECT * FROM ({sql}) {where_clause}"
+        if aggregation:
+            sql = QueryExecutor._build_aggregate_sql(datasource.db_type, sql, where_clause, limit, aggregation)
         else:
-            # MySQL, PostgreSQL, SQLite
-            limit_part = f" LIMIT {limit}" if limit else ""
-            sql = f"SELECT * FROM ({sql}) AS _wrapper_{where_clause}{limit_part}"
-        
-        conn = None
+            sql = get_backend(datasource.db_type).select_sql(select_part, sql, where_clause, limit)
+        sql = with_prefix + sql
         
-        conn = None
-        try:
-            conn = DBConnector.get_connection(
-                datasource.db_type,
-                datasource.host,
-                datasource.port,
-                datasource.db_name,
-                datasource.username,
-                datasource.password
-            )
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            
-            if cursor.description:
-                columns = [column[0] for column in cursor.description]
-                data = cursor.fetchall()
-                # Convert rows to lists for JSON serialization
-                # Also handle potentially non-serializable objects if needed (handled by DjangoJSONEncoder usually)
-                data = [list(row) for row in data]
-                return columns, data
-            else:
-                return [], []
-        except Exception as e:
-            logger.error(f"Query execution failed: {e}")
-            raise e
-        finally:
-            if conn:
-                conn.close()
+        if max_rows is None:
+            max_rows = getattr(settings, 'BI_QUERY_MAX_ROWS', 1000000)
+        if max_bytes is None:
+            max_bytes = getattr(settings, 'BI_QUERY_MAX_BYTES', 512 * 1024 * 1024)
+        fetch_size = getattr(settings, 'BI_QUERY_FETCH_SIZE', 5000)
+        driver_sql = QueryExecutor.apply_paramstyle(datasource.db_type, sql, params)
+
+        # Unbounded raw fetches stream from a server-side cursor, so an oversized
+        # result is cut off before it is buffered in the worker
+        server_side = not limit and not aggregation
+
+        def run_query():
+            try:
+                # Fail fast on a source known to be down rather than queueing for a slot;
+                # at most max_concurrent_queries per DataSource across workers (core.dataset.admission)
+                check_available(datasource.pk)
+                with admit(datasource), DBConnector.pooled_connection(datasource) as conn:
+                    cursor = DBConnector.open_cursor(conn, datasource.db_type, server_side, fetch_size)
+                    if params:
+                        cursor.execute(driver_sql, params)
+                    else:
+                        cursor.execute(driver_sql)
+                    # Rows are transposed into column arrays batch by batch; callers
+                    # use result.rows()/records() when they need JSON-ready rows
+                    result = QueryExecutor._fetch_result(cursor, max_rows, max_bytes, fetch_size)
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+
+                if cache_key:
+                    QueryCache.set(cache_key, result, cache_ttl)
+                    if base_key:
+                        SemanticCache.register(base_key, cache_key, filters, limit, columns, result, cache_ttl)
+                return result
+            except Exception as e:
+                logger.error(f"Query execution failed: {e}")
+                raise e
+
+        # Identical queries running concurrently share one execution
+        flight_key = cache_key or QueryCache.build_key(datasource, sql, params=params)
+        return coalesce_query(flight_key, run_query, cache_key=cache_key, refresh=refresh)
@@ -0,0 +1,405 @@
+import datetime
+import decimal
+import glob
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.data_source.backends import get_backend
+from core.dataset.executor import QueryExecutor
+from core.dataset.models import DataSet, DataSetExtract
+from core.dataset.result import QueryResult, _to_array
+from core.dataset.resolver import resolve_dataset
+from core.dataset.rollup import get_rollup_sql_hash
+from core.dataset.semantic import _to_number
+
+logger = logging.getLogger(__name__)
+
+# Chart aggregation names -> pyarrow hash aggregations
+ARROW_AGGREGATES = {
+    'sum': 'sum',
+    'mean': 'mean',
+    'max': 'max',
+    'min': 'min',
+    'count': 'count',
+}
+
+# Open extracts by dataset pk -> (file_name, pyarrow.Table over the memory-mapped file)
+_opened = {}
+_opened_lock = threading.Lock()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("数据集抽取需要安装 pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def get_dataset_extract_option(dataset):
+    """Whether a dataset runs in extract mode: params_config {"extract": true}."""
+    try:
+        config = json.loads(dataset.params_config or '{}')
+    except (TypeError, ValueError):
+        return False
+    return isinstance(config, dict) and bool(config.get('extract'))
+
+
+def get_extract_watermark(dataset):
+    """
+    Watermark column and lookback of an incremental extract, (None, 0) for full reloads:
+        params_config {"extract": {"watermark": "updated_at", "lookback": 3600}}
+    The watermark must be monotonic (an id or a timestamp). lookback re-reads
+    late-arriving rows: an amount for numeric watermarks, seconds for dates/timestamps.
+    """
+    try:
+        config = json.loads(dataset.params_config or '{}')
+    except (TypeError, ValueError):
+        return None, 0
+    extract = config.get('extract') if isinstance(config, dict) else None
+    if not isinstance(extract, dict) or not extract.get('watermark') or not isinstance(extract['watermark'], str):
+        return None, 0
+    lookback = _to_number(extract.get('lookback')) or 0
+    return extract['watermark'], max(lookback, 0)
+
+
+def _watermark_lower(last, lookback):
+    """Lowest watermark to fetch again, None when there is no watermark yet."""
+    if last is None:
+        return None
+    if isinstance(last, (datetime.date, datetime.datetime)):
+        return last - datetime.timedelta(seconds=lookback)
+    if isinstance(last, decimal.Decimal):
+        return last - decimal.Decimal(str(lookback))
+    if isinstance(last, (int, float)) and not isinstance(last, bool):
+        return last - lookback
+    # Text watermarks (e.g. ISO dates stored as strings) can't be shifted
+    return last
+
+
+def build_watermark_sql(db_type, sql, column):
+    """SELECT * FROM (sql) WHERE column >= ? (a leading WITH clause stays in front)."""
+    sql = sql.strip()
+    if sql.endswith(';'):
+        sql = sql[:-1]
+    with_prefix, body = QueryExecutor.split_cte(sql)
+    alias = get_backend(db_type).table_alias("bi_extract")
+    return f"{with_prefix}SELECT * FROM ({body}){alias} WHERE {QueryExecutor.quote_identifier(db_type, column)} >= ?"
+
+
+def get_extract_dir():
+    return getattr(settings, 'BI_EXTRACT_DIR', os.path.join(settings.BASE_DIR, 'data', 'extracts'))
+
+
+def _to_arrow_array(pa, arr):
+    if arr.dtype != object:
+        return pa.array(arr)
+    values = arr.tolist()
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        # Mixed types in one column: keep them as text
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def _to_numpy(column):
+    """Arrow column -> QueryResult array, typed (zero-copy) when there are no NULLs."""
+    import pyarrow.types as pat
+
+    if column.null_count == 0 and (
+            pat.is_integer(column.type) or pat.is_floating(column.type) or pat.is_boolean(column.type)):
+        return column.to_numpy()
+    return _to_array(column.to_pylist())
+
+
+def _is_numeric(arrow_type):
+    import pyarrow.types as pat
+
+    return pat.is_integer(arrow_type) or pat.is_floating(arrow_type) or pat.is_decimal(arrow_type)
+
+
+def _fill_measures(table, measures):
+    """NULL measures set to 0 before aggregating, as aggregate_data does (see QueryExecutor.measure_sql)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.types as pat
+
+    for col in dict.fromkeys(measures):
+        index = table.column_names.index(col)
+        column = table.column(index)
+        if column.null_count == 0:
+            continue
+        if pat.is_null(column.type):
+            column = pc.cast(column, pa.int64())
+        table = table.set_column(index, col, pc.fill_null(column, pa.scalar(0).cast(column.type)))
+    return table
+
+
+def _filter_expression(pc, table, filters):
+    """Build a boolean mask for filter dicts ({'col', 'op', 'val'}), like QueryExecutor's WHERE."""
+    mask = None
+    for f in filters or []:
+        if not isinstance(f, dict):
+            continue
+        col, op, val = f.get('col'), f.get('op'), f.get('val')
+        if not col or not op:
+            continue
+        if col not in table.column_names:
+            raise ValueError(f"Unknown column in filter: {col}")
+        column = table.column(col)
+        if op in ('is_null', 'is_not_null'):
+            cond = pc.is_null(column) if op == 'is_null' else pc.is_valid(column)
+        elif op in ('contains', 'startswith', 'endswith'):
+            text = column if str(column.type) == 'string' else pc.cast(column, 'string')
+            pattern = '' if val is None else str(val)
+            if op == 'contains':
+                cond = pc.match_substring(text, pattern)
+            elif op == 'startswith':
+                cond = pc.starts_with(text, pattern)
+            else:
+                cond = pc.ends_with(text, pattern)
+        else:
+            func = {'eq': pc.equal, 'ne': pc.not_equal, 'gt': pc.greater, 'lt': pc.less,
+                    'gte': pc.greater_equal, 'lte': pc.less_equal}.get(op)
+            if func is None:
+                continue
+            # Numeric-looking values compare as numbers on numeric columns, like the bound params
+            num = _to_number(val)
+            if num is not None and _is_numeric(column.type):
+                value = num
+            else:
+                value = '' if val is None else str(val)
+            cond = func(column, value)
+        # NULL comparisons are not matches, as in SQL
+        cond = pc.fill_null(cond, False)
+        mask = cond if mask is None else pc.and_(mask, cond)
+    return mask
+
+
+class ExtractStore:
+    """
+    Local columnar snapshots of datasets in extract mode. The dataset is pulled
+    in full into an Arrow IPC file (one file per version); DataSetExtract points
+    at the current file, so a refresh swaps versions atomically. Queries are
+    answered in process over the memory-mapped file.
+    """
+
+    @staticmethod
+    def refresh(dataset, resolver=None, full=False):
+        """
+        Pull a new version of the dataset's extract, returns the DataSetExtract.
+        With a watermark column (see get_extract_watermark) only rows at or past
+        the last watermark minus the lookback are fetched and they replace that
+        tail of the current snapshot; full=True forces a complete reload.
+        """
+        pa = _require_pyarrow()
+        import pyarrow.compute as pc
+
+        extract, _ = DataSetExtract.objects.get_or_create(dataset=dataset)
+        sql, bind_params = resolve_dataset(dataset, resolver=resolver)
+        sql_hash = get_rollup_sql_hash(dataset, sql, bind_params)
+        watermark, lookback = get_extract_watermark(dataset)
+
+        base = None
+        lower = None
+        if watermark and not full and extract.file_name and extract.sql_hash == sql_hash:
+            try:
+                base = ExtractStore._open(dataset.pk, extract.file_name)
+            except Exception as e:
+                logger.warning(f"Could not open extract {extract.file_name}, reloading in full: {e}")
+            if base is not None and watermark in base.column_names:
+                lower = _watermark_lower(pc.max(base.column(watermark)).as_py(), lookback)
+            if lower is None:
+                base = None
+
+        query_sql, query_params = sql, bind_params
+        if base is not None:
+            query_sql = build_watermark_sql(dataset.datasource.db_type, sql, watermark)
+            query_params = list(bind_params) + [lower]
+        try:
+            result = QueryExecutor.execute(
+                dataset.datasource, query_sql, params=query_params, use_cache=False,
+                max_rows=getattr(settings, 'BI_EXTRACT_MAX_ROWS', 5000000),
+                max_bytes=getattr(settings, 'BI_EXTRACT_MAX_BYTES', 2 * 1024 * 1024 * 1024),
+            )
+        except Exception as e:
+            logger.warning(f"Extract of dataset {dataset.pk} failed: {e}")
+            extract.error = str(e)
+            extract.save(update_fields=['error'])
+            raise
+
+        table = pa.Table.from_arrays(
+            [_to_arrow_array(pa, arr) for arr in result.arrays], names=result.columns
+        )
+        if base is not None:
+            try:
+                # Rows before the window are kept (and rows without a watermark, which
+                # the source query can't select again); the window is replaced
+                kept = base.filter(pc.fill_null(pc.less(base.column(watermark), lower), True))
+                table = pa.concat_tables([kept, table.cast(base.schema)])
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, ValueError) as e:
+                logger.warning(f"Could not merge new rows into extract of dataset {dataset.pk}, "
+                               f"reloading in full: {e}")
+                return ExtractStore.refresh(dataset, resolver=resolver, full=True)
+            logger.info(f"Fetched {len(result)} rows of dataset {dataset.pk} from {watermark} >= {lower}")
+
+        ExtractStore._write(pa, extract, table, sql_hash)
+        if watermark and watermark in table.column_names and table.num_rows:
+            extract.watermark = str(pc.max(table.column(watermark)).as_py())
+            extract.save(update_fields=['watermark'])
+        return extract
+
+    @staticmethod
+    def _write(pa, extract, table, sql_hash):
+        """Write table as the next version of the extract and point the row at it."""
+        directory = get_extract_dir()
+        os.makedirs(directory, exist_ok=True)
+        version = extract.version + 1
+        file_name = f"ds{extract.dataset_id}_v{version}.arrow"
+        path = os.path.join(directory, file_name)
+        tmp_path = path + '.tmp'
+
+        # Uncompressed IPC file, so readers can memory-map it without copying
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        extract.version = version
+        extract.file_name = file_name
+        extract.sql_hash = sql_hash
+        extract.row_count = table.num_rows
+        extract.size_bytes = os.path.getsize(path)
+        extract.refreshed_at = timezone.now()
+        extract.watermark = ''
+        extract.error = ''
+        extract.save()
+        logger.info(f"Extracted dataset {extract.dataset_id} v{version}: "
+                    f"{extract.row_count} rows, {extract.size_bytes} bytes")
+
+        ExtractStore.cleanup(extract.dataset_id, version)
+
+    @staticmethod
+    def cleanup(dataset_id, current_version):
+        """Delete extract files older than the previous version (readers may still hold it)."""
+        keep = getattr(settings, 'BI_EXTRACT_KEEP_VERSIONS', 2)
+        for path in glob.glob(os.path.join(get_extract_dir(), f"ds{dataset_id}_v*.arrow")):
+            try:
+                version = int(os.path.basename(path)[len(f"ds{dataset_id}_v"):-len('.arrow')])
+            except ValueError:
+                continue
+            if version <= current_version - keep:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    # e.g. still mapped by another process on Windows; retried next refresh
+                    logger.debug(f"Could not remove old extract {path}: {e}")
+
+    @staticmethod
+    def _open(dataset_id, file_name):
+        with _opened_lock:
+            opened = _opened.get(dataset_id)
+        if opened is not None and opened[0] == file_name:
+            return opened[1]
+        pa = _require_pyarrow()
+        source = pa.memory_map(os.path.join(get_extract_dir(), file_name), 'r')
+        table = pa.ipc.open_file(source).read_all()
+        with _opened_lock:
+            _opened[dataset_id] = (file_name, table)
+        return table
+
+    @staticmethod
+    def get_table(dataset, sql, bind_params):
+        """
+        The extract table of a dataset in extract mode, or None when the dataset
+        is live, has no extract yet, or the extract was taken from other SQL/params.
+        """
+        if not get_dataset_extract_option(dataset):
+            return None
+        extract = DataSetExtract.objects.filter(dataset_id=dataset.pk).exclude(file_name='').values_list(
+            'file_name', 'sql_hash').first()
+        if not extract:
+            return None
+        file_name, sql_hash = extract
+        if sql_hash != get_rollup_sql_hash(dataset, sql, bind_params):
+            logger.debug(f"Extract of dataset {dataset.pk} does not match the query, using the source")
+            return None
+        try:
+            return ExtractStore._open(dataset.pk, file_name)
+        except Exception as e:
+            logger.warning(f"Could not open extract {file_name}: {e}")
+            return None
+
+    @staticmethod
+    def query(table, filters=None, limit=None, columns=None, aggregation=None):
+        """Evaluate execute()'s filters/aggregation/columns/limit on an extract table."""
+        import pyarrow.compute as pc
+
+        mask = _filter_expression(pc, table, filters)
+        if mask is not None:
+            table = table.filter(mask)
+
+        if aggregation:
+            group_by = aggregation['group_by']
+            func = ARROW_AGGREGATES[aggregation['aggregation']]
+            # Same semantics as the pushed-down query: NULL group keys dropped, NULL measures as 0
+            table = table.select(group_by + aggregation['measures'])
+            for col in group_by:
+                table = table.filter(pc.is_valid(table.column(col)))
+            table = _fill_measures(table, aggregation['measures'])
+            grouped = table.group_by(group_by, use_threads=False)
+            table = grouped.aggregate([(col, func) for col in aggregation['measures']])
+            table = table.rename_columns(
+                [c[:-len(func) - 1] if c.endswith('_' + func) and c[:-len(func) - 1] in aggregation['measures']
+                 else c for c in table.column_names]
+            )
+            # Same column order and row order as the GROUP BY ... ORDER BY query
+            table = table.select(group_by + aggregation['measures']).sort_by([(c, 'ascending') for c in group_by])
+        elif columns:
+            table = table.select(list(dict.fromkeys(columns)))
+
+        if limit:
+            table = table.slice(0, limit)
+        return QueryResult(table.column_names, [_to_numpy(table.column(i)) for i in range(table.num_columns)])
+
+
+def execute_dataset(dataset, sql, params=None, limit=None, filters=None, aggregation=None, columns=None, **kwargs):
+    """
+    Run a query on a dataset: answered from its extract in extract mode,
+    otherwise by QueryExecutor.execute (kwargs are passed through).
+    """
+    table = ExtractStore.get_table(dataset, sql, params)
+    if table is not None:
+        return ExtractStore.query(table, filters=filters, limit=limit, columns=columns, aggregation=aggregation)
+    return QueryExecutor.execute(
+        dataset.datasource, sql, params=params, limit=limit, filters=filters,
+        aggregation=aggregation, columns=columns, **kwargs
+    )
+
+
+def refresh_extracts(dataset_ids=None, full=False):
+    """
+    Refresh the extracts of the given datasets (all datasets in extract mode
+    when None), returns the number refreshed. full=True skips incremental refresh.
+    """
+    queryset = DataSet.objects.select_related('datasource')
+    if dataset_ids is not None:
+        queryset = queryset.filter(pk__in=dataset_ids)
+    else:
+        queryset = queryset.filter(params_config__contains='extract')
+
+    refreshed = 0
+    for dataset in queryset:
+        if not get_dataset_extract_option(dataset):
+            continue
+        try:
+            ExtractStore.refresh(dataset, full=full)
+            refreshed += 1
+        except Exception as e:
+            logger.error(f"Refreshing extract of dataset {dataset.pk} failed: {e}")
+    return refreshed
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+
+from django.utils import timezone
+
+from core.data_source.backends import get_backend
+from core.dataset.executor import QueryExecutor
+from core.dataset.models import DataSet
+from core.dataset.resolver import resolve_dataset
+
+logger = logging.getLogger(__name__)
+
+
+def get_sql_hash(datasource, sql):
+    """Fingerprint of the resolved SQL a dataset's metadata was taken from."""
+    payload = f"{datasource.pk}:{datasource.db_type}:{sql.strip()}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_metadata(dataset):
+    """Parse DataSet.metadata, returns a dict (empty when unset or invalid)."""
+    try:
+        metadata = json.loads(dataset.metadata or '{}')
+    except (TypeError, ValueError):
+        return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def get_dataset_metadata(dataset, resolver=None, refresh=False, params=None):
+    """
+    Return the result columns of a dataset as stored in DataSet.metadata:
+    [{name, type, nullable, size, precision, scale}, ...].
+
+    The catalog is keyed by a hash of the resolved SQL, so it is refreshed by a
+    zero-row probe (QueryExecutor.describe) only when the dataset's SQL, or the
+    SQL of a dataset it references, has changed. params are the request's
+    parameters: a parameterised dataset may not even parse without them.
+    """
+    sql, bind_params = resolve_dataset(dataset, params=params, resolver=resolver)
+    return describe_dataset_sql(dataset, sql, bind_params, refresh=refresh)
+
+
+def describe_dataset_sql(dataset, sql, bind_params=None, refresh=False):
+    """Result columns of the dataset's already resolved sql, cached like get_dataset_metadata."""
+    sql_hash = get_sql_hash(dataset.datasource, sql)
+    metadata = load_metadata(dataset)
+    if not refresh and metadata.get('sql_hash') == sql_hash and metadata.get('columns') is not None:
+        return metadata['columns']
+
+    columns = QueryExecutor.describe(dataset.datasource, sql, bind_params)
+    metadata.update({
+        'sql_hash': sql_hash,
+        'columns': columns,
+        'described_at': timezone.now().isoformat(),
+    })
+    dataset.metadata = json.dumps(metadata, ensure_ascii=False, default=str)
+    # update() rather than save(): this is not an edit, so don't bump updated_at
+    # or invalidate the cached results of the dataset and its dependents
+    DataSet.objects.filter(pk=dataset.pk).update(metadata=dataset.metadata)
+    logger.info(f"Refreshed column metadata for dataset {dataset.pk}")
+    return columns
+
+
+def get_dataset_columns(dataset, resolver=None, refresh=False, params=None):
+    """Column names of a dataset, from the metadata catalog."""
+    return [col['name'] for col in get_dataset_metadata(dataset, resolver=resolver, refresh=refresh, params=params)]
+
+
+def get_numeric_columns(dataset, sql, bind_params=None):
+    """Names of the result columns of the dataset's resolved sql that the source types as numbers."""
+    backend = get_backend(dataset.datasource.db_type)
+    return {col['name'] for col in describe_dataset_sql(dataset, sql, bind_params)
+            if backend.is_numeric_type(col.get('type'))}
+
+
+def get_unknown_filter_columns(dataset, filters, resolver=None, params=None):
+    """
+    Filter columns ({'col': ...} dicts) the dataset doesn't return, in order.
+    When the columns can't be described nothing is reported: the filter
+    columns are quoted in the query anyway, so this check is only for a
+    readable error.
+    """
+    wanted = [f.get('col') for f in filters or [] if isinstance(f, dict) and f.get('col')]
+    if not wanted:
+        return []
+    unnamed = [col for col in dict.fromkeys(wanted) if not isinstance(col, str)]
+    try:
+        known = set(get_dataset_columns(dataset, resolver=resolver, params=params))
+    except Exception as e:
+        logger.warning(f"Describing dataset {dataset.pk} for filter validation failed: {e}")
+        return unnamed
+    return [col for col in dict.fromkeys(wanted) if not isinstance(col, str) or col not in known]
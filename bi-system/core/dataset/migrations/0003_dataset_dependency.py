@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-17 06:17
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_dependencies(apps, schema_editor):
+    # Populate the graph for datasets saved before it was tracked
+    DataSet = apps.get_model('dataset', 'DataSet')
+    DataSetDependency = apps.get_model('dataset', 'DataSetDependency')
+    ids = set(DataSet.objects.values_list('id', flat=True))
+    edges = []
+    for pk, sql_script in DataSet.objects.values_list('id', 'sql_script'):
+        referenced = {int(m) for m in re.findall(r'\{\{\s*dataset:(\d+)\s*\}\}', sql_script or '')}
+        edges.extend(DataSetDependency(dataset_id=pk, depends_on_id=dep) for dep in referenced & ids)
+    DataSetDependency.objects.bulk_create(edges)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataset', '0002_dataset_is_report_specific'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSetDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependencies', to='dataset.dataset')),
+                ('depends_on', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependents', to='dataset.dataset')),
+            ],
+            options={
+                'verbose_name': 'Data Set Dependency',
+                'db_table': 'bi_dataset_dependency',
+                'unique_together': {('dataset', 'depends_on')},
+            },
+        ),
+        migrations.RunPython(build_dependencies, migrations.RunPython.noop),
+    ]
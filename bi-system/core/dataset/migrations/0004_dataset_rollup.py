@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataset', '0003_dataset_dependency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSetRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('definition_key', models.CharField(max_length=64)),
+                ('dimensions', models.TextField(default='[]')),
+                ('measures', models.TextField(default='[]')),
+                ('sql_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('data', models.BinaryField(blank=True, null=True)),
+                ('row_count', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='dataset.dataset')),
+            ],
+            options={
+                'verbose_name': 'Data Set Rollup',
+                'db_table': 'bi_dataset_rollup',
+                'unique_together': {('dataset', 'definition_key')},
+            },
+        ),
+    ]
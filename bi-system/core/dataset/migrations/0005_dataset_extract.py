@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 06:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataset', '0004_dataset_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSetExtract',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(default=0)),
+                ('file_name', models.CharField(blank=True, default='', max_length=255)),
+                ('sql_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('dataset', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='extract', to='dataset.dataset')),
+            ],
+            options={
+                'verbose_name': 'Data Set Extract',
+                'db_table': 'bi_dataset_extract',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataset', '0005_dataset_extract'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetextract',
+            name='watermark',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
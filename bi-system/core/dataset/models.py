@@ -26,6 +26,81 @@ class DataSet(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        # Reject {{ dataset:ID }} references that would make the dependency graph cyclic
+        from core.dataset.dependencies import check_dependency_cycle
+        check_dependency_cycle(self)
+
     class Meta:
         db_table = 'bi_dataset'
         verbose_name = "Data Set"
+
+
+class DataSetDependency(models.Model):
+    """
+    Edge of the dataset dependency graph: dataset's SQL references depends_on
+    through {{ dataset:ID }}. Maintained automatically when a DataSet is saved.
+    """
+    dataset = models.ForeignKey(DataSet, on_delete=models.CASCADE, related_name='dependencies')
+    depends_on = models.ForeignKey(DataSet, on_delete=models.CASCADE, related_name='dependents')
+
+    def __str__(self):
+        return f"{self.dataset_id} -> {self.depends_on_id}"
+
+    class Meta:
+        db_table = 'bi_dataset_dependency'
+        verbose_name = "Data Set Dependency"
+        unique_together = ('dataset', 'depends_on')
+
+
+class DataSetRollup(models.Model):
+    """
+    Materialized GROUP BY of a dataset over declared dimensions, with
+    SUM/COUNT/MIN/MAX per measure (see core.dataset.rollup).
+    Declared in DataSet.params_config: {"rollups": [{"dimensions": [...], "measures": [...]}]}
+    """
+    dataset = models.ForeignKey(DataSet, on_delete=models.CASCADE, related_name='rollups')
+    # sha256 of the sorted dimensions/measures, identifies the declaration
+    definition_key = models.CharField(max_length=64)
+    dimensions = models.TextField(default='[]')
+    measures = models.TextField(default='[]')
+
+    # Hash of the resolved SQL the rollup was built from; a mismatch means it is stale
+    sql_hash = models.CharField(max_length=64, blank=True, default='')
+    data = models.BinaryField(null=True, blank=True)
+    row_count = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"{self.dataset_id}: {self.dimensions}"
+
+    class Meta:
+        db_table = 'bi_dataset_rollup'
+        verbose_name = "Data Set Rollup"
+        unique_together = ('dataset', 'definition_key')
+
+
+class DataSetExtract(models.Model):
+    """
+    Current local snapshot of a dataset in extract mode (see core.dataset.extract).
+    A refresh writes a new versioned file and then points this row at it.
+    """
+    dataset = models.OneToOneField(DataSet, on_delete=models.CASCADE, related_name='extract')
+    version = models.IntegerField(default=0)
+    file_name = models.CharField(max_length=255, blank=True, default='')
+    # Hash of the resolved SQL the extract was taken from; a mismatch means it is stale
+    sql_hash = models.CharField(max_length=64, blank=True, default='')
+    row_count = models.BigIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    # Highest watermark column value in the snapshot (incremental extracts only)
+    watermark = models.CharField(max_length=100, blank=True, default='')
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"{self.dataset_id} v{self.version}"
+
+    class Meta:
+        db_table = 'bi_dataset_extract'
+        verbose_name = "Data Set Extract"
@@ -0,0 +1,101 @@
+import contextvars
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _run_task(fn):
+    try:
+        return fn(), None
+    except Exception as e:
+        return None, e
+    finally:
+        # Worker threads get their own Django DB connections; don't leak them
+        connections.close_all()
+
+
+def run_parallel(tasks, max_workers=None, max_per_key=None):
+    """
+    Run independent tasks on a bounded thread pool.
+
+    tasks: list of (key, fn) where key groups tasks that share a resource
+           (e.g. a DataSource pk); at most max_per_key tasks with the same
+           key run at once.
+    Returns a list of (result, error) tuples in the same order as tasks, so
+    one failing task never affects the others.
+    """
+    if max_workers is None:
+        max_workers = getattr(settings, 'BI_RENDER_MAX_WORKERS', 8)
+    if max_per_key is None:
+        max_per_key = getattr(settings, 'BI_RENDER_MAX_PER_DATASOURCE', 4)
+
+    results = [(None, None)] * len(tasks)
+    if not tasks:
+        return results
+
+    # Nothing to overlap: avoid the thread pool overhead
+    if len(tasks) == 1 or max_workers <= 1:
+        for i, (_, fn) in enumerate(tasks):
+            try:
+                results[i] = (fn(), None)
+            except Exception as e:
+                results[i] = (None, e)
+        return results
+
+    # Queue tasks per key and only submit while the key is under its cap
+    queues = {}
+    for i, (key, fn) in enumerate(tasks):
+        queues.setdefault(key, deque()).append((i, fn))
+    running = {key: 0 for key in queues}
+    futures = {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)), thread_name_prefix='bi-query') as pool:
+        def submit_ready():
+            for key, queue in queues.items():
+                while queue and running[key] < max_per_key:
+                    i, fn = queue.popleft()
+                    running[key] += 1
+                    # Run in a copy of the caller's context (e.g. the query priority)
+                    futures[pool.submit(contextvars.copy_context().run, _run_task, fn)] = (i, key)
+
+        submit_ready()
+        while futures:
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                i, key = futures.pop(future)
+                running[key] -= 1
+                results[i] = future.result()
+            submit_ready()
+
+    return results
+
+
+class ExecutionPlan:
+    """
+    Render-scoped list of queries. Tasks registered under the same key are
+    executed once and their result is shared by every caller of add().
+    """
+
+    def __init__(self):
+        self.tasks = []
+        self._index = {}
+
+    def add(self, key, group, fn):
+        """
+        Register fn under key (hashable, identifies the query result) and
+        group (concurrency key, e.g. DataSource pk). Returns the task index
+        to look up in the list returned by run().
+        """
+        if key in self._index:
+            return self._index[key]
+        self._index[key] = len(self.tasks)
+        self.tasks.append((group, fn))
+        return self._index[key]
+
+    def run(self, **kwargs):
+        return run_parallel(self.tasks, **kwargs)
@@ -0,0 +1,450 @@
+import functools
+import json
+import re
+import threading
+
+from django.conf import settings
+
+from core.data_source.backends import get_backend
+from core.dataset.executor import SQL_CODE, SQL_QUOTED, QueryExecutor, scan_sql
+from core.dataset.models import DataSet
+
+# {{ param:key }} / {{ dataset:ID }} placeholders, matched in one pass so bind
+# parameters are collected in the order their placeholders appear in the SQL
+TEMPLATE_TOKEN_PATTERN = re.compile(r'\{\{\s*(?:param:(\w+)|dataset:(\d+))\s*\}\}')
+PARAM_PATTERN = re.compile(r'\{\{\s*param:(\w+)\s*\}\}')
+# Clauses that only take a literal row count and can't be parameterized
+ROW_COUNT_CLAUSE_PATTERN = re.compile(r'\b(?:TOP|LIMIT|OFFSET|FETCH\s+(?:FIRST|NEXT))\s*\(?\s*$', re.IGNORECASE)
+# A statement that already starts with its own WITH clause
+LEADING_WITH_PATTERN = re.compile(r'^\s*WITH\s+(RECURSIVE\s+)?', re.IGNORECASE)
+
+# Token kinds of a compiled template
+TEXT = 'text'
+PARAM = 'param'
+PARAM_LITERAL = 'param_literal'
+DATASET = 'dataset'
+
+
+class DatasetCycleError(ValueError):
+    """Raised when {{ dataset:ID }} references form a cycle."""
+    pass
+
+
+class TemplateParamError(ValueError):
+    """Raised when a {{ param:KEY }} value can't be used where it appears."""
+    pass
+
+
+def _coerce_param(val):
+    """
+    Request/default values arrive as strings; numeric-looking ones are bound as
+    numbers so they compare like the unquoted literals they used to be.
+    """
+    if isinstance(val, str):
+        text = val.strip()
+        if re.fullmatch(r'[+-]?\d+', text):
+            return int(text)
+        if re.fullmatch(r'[+-]?(\d+\.\d*|\.\d+)([eE][+-]?\d+)?', text):
+            return float(text)
+    return val
+
+
+def _append_text(tokens, text):
+    if not text:
+        return
+    if tokens and tokens[-1][0] == TEXT:
+        tokens[-1] = (TEXT, tokens[-1][1] + text)
+    else:
+        tokens.append((TEXT, text))
+
+
+def _compile_segment(text, tokens):
+    """Compile SQL text outside of string literals."""
+    pos = 0
+    for match in TEMPLATE_TOKEN_PATTERN.finditer(text):
+        _append_text(tokens, text[pos:match.start()])
+        param_key, dataset_id = match.group(1), match.group(2)
+        if param_key:
+            # e.g. TOP {{ param:n }} is inlined as an integer at render time
+            inline = bool(ROW_COUNT_CLAUSE_PATTERN.search(text[:match.start()]))
+            tokens.append((PARAM, param_key, inline))
+        else:
+            tokens.append((DATASET, int(dataset_id), match.group(0)))
+        pos = match.end()
+    _append_text(tokens, text[pos:])
+
+
+def _unquote(text, backslash_escapes):
+    """Contents of a quoted section ('it''s' -> it's)."""
+    quote = text[0]
+    body = text[1:-1] if len(text) > 1 and text.endswith(quote) else text[1:]
+    if backslash_escapes:
+        body = re.sub(r'\\(.)', r'\1', body)
+    return body.replace(quote * 2, quote)
+
+
+def get_backslash_escapes(db_type):
+    """Whether a db_type's string literals use backslash escapes (MySQL)."""
+    if not db_type:
+        return False
+    try:
+        return get_backend(db_type).backslash_escapes
+    except ImportError:
+        # Driver not installed here: the template is still compiled, with standard quoting
+        return False
+
+
+@functools.lru_cache(maxsize=512)
+def compile_template(sql_script, backslash_escapes=False):
+    """
+    Parse a SQL template into a tuple of tokens:
+      (TEXT, sql)
+      (PARAM, key, inline)              -> '?' (or an inlined row count)
+      (PARAM_LITERAL, parts, list_key)  -> a literal holding params, bound as one value;
+                                           parts alternates text and param keys
+      (DATASET, id, placeholder)        -> the nested dataset's SQL as a subquery
+    Placeholders in comments are left as they are. String literals are scanned like
+    QueryExecutor.apply_paramstyle does (scan_sql); backslash_escapes for MySQL.
+    Templates are immutable, so compiled results are shared between threads.
+    """
+    tokens = []
+    if not sql_script:
+        return ()
+    for kind, start, end in scan_sql(sql_script, backslash_escapes=backslash_escapes):
+        text = sql_script[start:end]
+        if kind == SQL_CODE:
+            _compile_segment(text, tokens)
+        elif kind == SQL_QUOTED and text[0] != '`' and PARAM_PATTERN.search(text):
+            # '...' or a MySQL "..." string holding params
+            body = _unquote(text, backslash_escapes)
+            whole = PARAM_PATTERN.fullmatch(body)
+            tokens.append((PARAM_LITERAL, tuple(PARAM_PATTERN.split(body)), whole.group(1) if whole else None))
+        else:
+            _append_text(tokens, text)
+    return tuple(tokens)
+
+
+def get_dependencies(tokens):
+    """Dataset ids referenced directly by a compiled template."""
+    return tuple(dict.fromkeys(token[1] for token in tokens if token[0] == DATASET))
+
+
+# Compiled dataset templates keyed by pk: (updated_at, sql_script, tokens).
+# Missing datasets are remembered as (None, None, None) so they don't force a reload.
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def _load_closure(root_ids):
+    """
+    Return {pk: (updated_at, sql_script, tokens)} for every dataset reachable
+    from root_ids.
+
+    When the dependency graph is already known the whole closure is validated
+    with a single (id, updated_at) query; only new or edited datasets have
+    their SQL loaded, level by level.
+    """
+    with _templates_lock:
+        cached = dict(_templates)
+
+    # Walk the cached graph; if every node is known, one query validates it
+    closure = set()
+    frontier = list(root_ids)
+    complete = True
+    while frontier:
+        next_frontier = []
+        for pk in frontier:
+            if pk in closure:
+                continue
+            closure.add(pk)
+            entry = cached.get(pk)
+            if entry is None:
+                complete = False
+                continue
+            if entry[2]:
+                next_frontier.extend(get_dependencies(entry[2]))
+        frontier = next_frontier
+
+    stale = closure
+    if complete:
+        versions = dict(DataSet.objects.filter(pk__in=closure).values_list('id', 'updated_at'))
+        stale = {pk for pk in closure if cached[pk][0] != versions.get(pk)}
+        if not stale:
+            return {pk: cached[pk] for pk in closure}
+
+    # Something changed: (re)load stale datasets breadth first, one query per level
+    result = {}
+    seen = set()
+    frontier = set(root_ids)
+    while frontier:
+        seen |= frontier
+        to_load = {pk for pk in frontier if pk in stale or pk not in closure}
+        loaded = {}
+        if to_load:
+            for pk, updated_at, sql_script, db_type in DataSet.objects.filter(pk__in=to_load).values_list(
+                    'id', 'updated_at', 'sql_script', 'datasource__db_type'):
+                tokens = compile_template(sql_script or '', get_backslash_escapes(db_type))
+                loaded[pk] = (updated_at, sql_script, tokens)
+        next_frontier = set()
+        for pk in frontier:
+            if pk in to_load:
+                entry = loaded.get(pk, (None, None, None))
+            else:
+                entry = cached[pk]
+            result[pk] = entry
+            if entry[2]:
+                next_frontier.update(get_dependencies(entry[2]))
+        frontier = next_frontier - seen
+
+    with _templates_lock:
+        for pk, entry in result.items():
+            if _templates.get(pk) != entry:
+                _templates[pk] = entry
+    return result
+
+
+def forget_templates(dataset_ids):
+    """Drop compiled templates of the given datasets (e.g. after they were edited)."""
+    with _templates_lock:
+        for pk in dataset_ids:
+            _templates.pop(pk, None)
+
+
+def _render_param(key, inline, params, bind_params):
+    val = params.get(key)
+    if val is None or val == '':
+        return ""
+
+    # Handle list/tuple (Multi-select): one placeholder per item
+    if isinstance(val, (list, tuple)):
+        bind_params.extend(val)
+        return ", ".join("?" for _ in val)
+
+    if inline:
+        try:
+            return str(int(val))
+        except (TypeError, ValueError):
+            raise TemplateParamError(f"参数 {key} 必须是整数: {val}")
+
+    bind_params.append(_coerce_param(val))
+    return "?"
+
+
+def _render_param_literal(parts, list_key, params, bind_params):
+    """
+    A literal containing params, e.g. '{{ param:start }}' or '%{{ param:kw }}%',
+    becomes a single placeholder bound to the literal's rendered text.
+    """
+    if list_key and isinstance(params.get(list_key), (list, tuple)):
+        # '{{ param:list }}' inside IN (...)
+        values = [str(v) for v in params.get(list_key)]
+        bind_params.extend(values)
+        return ", ".join("?" for _ in values)
+
+    text = []
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            text.append(part)
+            continue
+        val = params.get(part)
+        if val is None:
+            continue
+        if isinstance(val, (list, tuple)):
+            text.append(",".join(str(v) for v in val))
+        else:
+            text.append(str(val))
+    bind_params.append("".join(text))
+    return "?"
+
+
+def get_cte_name(dataset_id):
+    # Unquoted identifiers must start with a letter on Oracle
+    return f"bi_ds_{dataset_id}"
+
+
+def _bare_name(name):
+    """CTE name without its quotes ("t", [t], `t` -> t)."""
+    return name[1:-1] if name[:1] in ('"', '[', '`') else name
+
+
+def _rename_references(sql, name, new_name):
+    """Replace references to the CTE name in sql (outside literals and comments) with new_name."""
+    if name[:1] == '[':
+        pattern = re.compile(re.escape(name))
+    else:
+        # Unquoted identifiers are case-insensitive; "x.t" (a column t) is not a reference
+        pattern = re.compile(r'(?<![\w.\]])' + re.escape(name) + r'(?![\w\[])', re.IGNORECASE)
+    out = []
+    for kind, start, end in scan_sql(sql):
+        text = sql[start:end]
+        if kind == SQL_CODE and name[:1] not in ('"', '`'):
+            text = pattern.sub(lambda m: new_name, text)
+        elif kind == SQL_QUOTED and text == name:
+            text = new_name
+        out.append(text)
+    return "".join(out)
+
+
+def _hoist_cte(pk, body, used):
+    """
+    Split a nested dataset's own leading WITH clause off its body: MSSQL and
+    Oracle don't allow WITH inside a CTE. Returns (definitions, body, recursive);
+    definitions whose name is already in used (lower-cased names, updated
+    here) are renamed to <name>_<pk>, references in the dataset's SQL included.
+    """
+    parsed = QueryExecutor.parse_cte(body)
+    if parsed is None:
+        return [], body, False
+    child_definitions, body, recursive = parsed
+    renames = []
+    for name, _ in child_definitions:
+        bare = _bare_name(name)
+        new_bare = bare
+        suffix = 0
+        while new_bare.lower() in used:
+            suffix += 1
+            new_bare = f"{bare}_{pk}" if suffix == 1 else f"{bare}_{pk}_{suffix}"
+        used.add(new_bare.lower())
+        if new_bare != bare:
+            renames.append((name, name.replace(bare, new_bare, 1)))
+
+    definitions = []
+    for name, definition in child_definitions:
+        for old, new in renames:
+            definition = _rename_references(definition, old, new)
+        definitions.append(f"{dict(renames).get(name, name)} {definition}")
+    for old, new in renames:
+        body = _rename_references(body, old, new)
+    return definitions, body, recursive
+
+
+def get_dataset_cte_option(dataset):
+    """
+    Whether nested datasets of a DataSet are rendered as WITH clauses:
+    params_config {"cte": true/false}, otherwise BI_DATASET_CTE.
+    """
+    try:
+        config = json.loads(dataset.params_config or '{}')
+    except (TypeError, ValueError):
+        config = {}
+    if isinstance(config, dict) and config.get('cte') is not None:
+        return bool(config['cte'])
+    return getattr(settings, 'BI_DATASET_CTE', False)
+
+
+class SqlResolver:
+    """
+    Renders dataset SQL templates. Nested dataset templates are loaded once per
+    resolver, so reuse one instance for all queries of a request/render.
+    """
+
+    def __init__(self):
+        self._templates = {}
+
+    def _ensure_loaded(self, tokens):
+        missing = [pk for pk in get_dependencies(tokens) if pk not in self._templates]
+        if missing:
+            self._templates.update(_load_closure(missing))
+
+    def resolve(self, sql_script, params=None, cte=None, db_type=None):
+        """
+        Resolve {{ dataset:ID }} and {{ param:KEY }} placeholders in SQL.
+        Param values are never put into the SQL text: each one becomes a '?' placeholder
+        and its value is appended to bind_params, in placeholder order.
+        cte: render nested datasets as WITH clauses, each emitted once however often
+             it is referenced (None = BI_DATASET_CTE); otherwise they are inlined
+             as subqueries.
+        db_type: the DataSource type the SQL runs on, for its string literal syntax.
+        Returns (sql, bind_params); pass bind_params to QueryExecutor.execute(params=...).
+        """
+        bind_params = []
+        if not sql_script:
+            return sql_script, bind_params
+        if cte is None:
+            cte = getattr(settings, 'BI_DATASET_CTE', False)
+        tokens = compile_template(sql_script, get_backslash_escapes(db_type))
+        self._ensure_loaded(tokens)
+        out = []
+        ctes = {} if cte else None
+        self._render(tokens, params or {}, bind_params, (), out, ctes)
+        sql = "".join(out)
+        if not ctes:
+            return sql, bind_params
+
+        # CTEs were added after their own dependencies, so each only refers to earlier ones.
+        # A nested dataset's own WITH definitions are hoisted in front of its CTE
+        # (in the same order, so their params stay in placeholder order).
+        used = {get_cte_name(pk).lower() for pk in ctes}
+        outer = QueryExecutor.parse_cte(sql)
+        if outer:
+            used.update(_bare_name(name).lower() for name, _ in outer[0])
+        recursive = False
+        with_params = []
+        definitions = []
+        for pk, (body, cte_params) in ctes.items():
+            hoisted, body, child_recursive = _hoist_cte(pk, body, used)
+            recursive = recursive or child_recursive
+            definitions.extend(hoisted)
+            definitions.append(f"{get_cte_name(pk)} AS (\n{body}\n)")
+            with_params.extend(cte_params)
+        existing = LEADING_WITH_PATTERN.match(sql)
+        if existing:
+            # Merge with the script's own WITH clause
+            keyword = "WITH RECURSIVE" if recursive or existing.group(1) else "WITH"
+            sql = f"{keyword} {', '.join(definitions)},\n{sql[existing.end():]}"
+        else:
+            keyword = "WITH RECURSIVE" if recursive else "WITH"
+            sql = f"{keyword} {', '.join(definitions)}\n{sql}"
+        return sql, with_params + bind_params
+
+    def resolve_dataset(self, dataset, params=None):
+        """Resolve a DataSet's SQL using its CTE option, returns (sql, bind_params)."""
+        return self.resolve(
+            dataset.sql_script, params, cte=get_dataset_cte_option(dataset), db_type=dataset.datasource.db_type
+        )
+
+    def _render(self, tokens, params, bind_params, path, out, ctes=None):
+        for token in tokens:
+            kind = token[0]
+            if kind == TEXT:
+                out.append(token[1])
+            elif kind == PARAM:
+                out.append(_render_param(token[1], token[2], params, bind_params))
+            elif kind == PARAM_LITERAL:
+                out.append(_render_param_literal(token[1], token[2], params, bind_params))
+            else:
+                _, sql_script, child_tokens = self._templates.get(token[1], (None, None, None))
+                if sql_script is None:
+                    out.append(token[2])  # Keep as is if not found
+                    continue
+                if token[1] in path:
+                    # Saving a cyclic dataset is rejected; this guards rows saved before that check
+                    cycle = " -> ".join(str(pk) for pk in path[path.index(token[1]):] + (token[1],))
+                    raise DatasetCycleError(f"数据集存在循环引用: {cycle}")
+                if ctes is None:
+                    # Wrap in subquery
+                    out.append("(")
+                    self._render(child_tokens, params, bind_params, path + (token[1],), out)
+                    out.append(")")
+                    continue
+                if token[1] not in ctes:
+                    child_out = []
+                    child_params = []
+                    self._render(child_tokens, params, child_params, path + (token[1],), child_out, ctes)
+                    ctes[token[1]] = ("".join(child_out).strip().rstrip(';'), child_params)
+                # Still a derived table, so it works wherever the subquery did (FROM, IN, ...)
+                out.append(f"(SELECT * FROM {get_cte_name(token[1])})")
+
+
+def resolve_dataset_sql(sql_script, params=None, resolver=None, cte=None, db_type=None):
+    """
+    Resolve a SQL template, returns (sql, bind_params). See SqlResolver.resolve.
+    """
+    return (resolver or SqlResolver()).resolve(sql_script, params, cte=cte, db_type=db_type)
+
+
+def resolve_dataset(dataset, params=None, resolver=None):
+    """
+    Resolve a DataSet's SQL, returns (sql, bind_params). See SqlResolver.resolve_dataset.
+    """
+    return (resolver or SqlResolver()).resolve_dataset(dataset, params)
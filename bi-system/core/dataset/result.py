@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+# infer_dtype() results that can be stored as a typed NumPy array
+_TYPED_DTYPES = {
+    'integer': np.int64,
+    'floating': np.float64,
+    'mixed-integer-float': np.float64,
+    'boolean': np.bool_,
+}
+
+
+def _to_array(values):
+    """
+    Build a column array from a sequence of Python values.
+    Numbers/booleans without NULLs get a typed array; everything else
+    (strings, Decimal, dates, columns with NULLs) stays an object array so
+    values round-trip unchanged to JSON.
+    """
+    if not isinstance(values, (list, tuple)):
+        values = list(values)
+    dtype = _TYPED_DTYPES.get(infer_dtype(values, skipna=False)) if values else None
+    if dtype is not None:
+        try:
+            return np.array(values, dtype=dtype)
+        except (OverflowError, ValueError, TypeError):
+            pass
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+class QueryResult:
+    """
+    Columnar result of QueryExecutor.execute: one NumPy array per column.
+
+    Rows/dicts are only materialized at the edges (JSON responses, charts)
+    through rows()/records(); pandas gets the arrays directly.
+    """
+
+    def __init__(self, columns, arrays):
+        self.columns = list(columns)
+        self.arrays = list(arrays)
+
+    @classmethod
+    def from_rows(cls, columns, rows):
+        """
+        Transpose driver rows (tuples / pyodbc Row objects) into column arrays.
+        """
+        columns = list(columns)
+        if not rows:
+            return cls.empty(columns)
+        transposed = zip(*rows)
+        return cls(columns, [_to_array(values) for values in transposed])
+
+    @classmethod
+    def from_chunks(cls, columns, chunks):
+        """
+        Concatenate several QueryResults (e.g. fetchmany batches) with the same columns.
+        """
+        chunks = [c for c in chunks if len(c)]
+        if not chunks:
+            return cls.empty(columns)
+        if len(chunks) == 1:
+            return chunks[0]
+        arrays = []
+        for i in range(len(columns)):
+            parts = [c.arrays[i] for c in chunks]
+            if len({p.dtype for p in parts}) == 1:
+                arrays.append(np.concatenate(parts))
+            else:
+                # Mixed types across batches (e.g. NULLs showed up later)
+                arrays.append(_to_array([v for p in parts for v in p.tolist()]))
+        return cls(columns, arrays)
+
+    @classmethod
+    def empty(cls, columns=None):
+        columns = list(columns or [])
+        return cls(columns, [np.empty(0, dtype=object) for _ in columns])
+
+    @classmethod
+    def from_dataframe(cls, df):
+        return cls(list(df.columns), [df.iloc[:, i].to_numpy() for i in range(df.shape[1])])
+
+    def __len__(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    @property
+    def row_count(self):
+        return len(self)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the result."""
+        total = 0
+        for arr in self.arrays:
+            total += arr.nbytes
+            if arr.dtype == object:
+                # nbytes only counts the pointers of object arrays
+                total += sum(len(v) if isinstance(v, (str, bytes)) else 16 for v in arr.tolist())
+        return total
+
+    def column(self, name):
+        """Return the array for a column."""
+        return self.arrays[self.columns.index(name)]
+
+    def select(self, names):
+        """Return a result with only the given columns (no data copy)."""
+        return QueryResult(names, [self.column(n) for n in names])
+
+    def slice(self, start=0, stop=None):
+        """Return rows start:stop as a new result (views, no data copy)."""
+        return QueryResult(self.columns, [arr[start:stop] for arr in self.arrays])
+
+    def take(self, mask):
+        """Return the rows selected by a boolean mask (or index array) as a new result."""
+        return QueryResult(self.columns, [arr[mask] for arr in self.arrays])
+
+    def iter_rows(self):
+        """Yield rows as lists of Python values."""
+        if not self.arrays:
+            return iter(())
+        return (list(values) for values in zip(*(arr.tolist() for arr in self.arrays)))
+
+    def rows(self):
+        """Rows as list of lists (JSON serializable)."""
+        return list(self.iter_rows())
+
+    def iter_records(self):
+        """Yield rows as dicts keyed by column name."""
+        columns = self.columns
+        return (dict(zip(columns, values)) for values in self.iter_rows())
+
+    def records(self):
+        """Rows as list of dicts (JSON serializable)."""
+        return list(self.iter_records())
+
+    def to_dataframe(self):
+        """Hand the column arrays to pandas without building rows."""
+        df = pd.DataFrame({i: arr for i, arr in enumerate(self.arrays)}, copy=False)
+        df.columns = self.columns
+        return df
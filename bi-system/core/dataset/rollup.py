@@ -0,0 +1,295 @@
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from core.data_source.backends import get_backend
+from core.dataset.cache import QueryCache
+from core.dataset.executor import QueryExecutor
+from core.dataset.models import DataSet, DataSetRollup
+from core.dataset.result import QueryResult
+from core.dataset.resolver import resolve_dataset
+from core.dataset.semantic import _filter_mask
+
+logger = logging.getLogger(__name__)
+
+# Partial aggregates stored per measure; every chart aggregation can be derived from them
+ROLLUP_PARTS = ('sum', 'cnt', 'min', 'max')
+# Part of the definition key: rollups stored with other aggregate semantics are not used
+ROLLUP_FORMAT = 2
+
+# Decoded rollup data by DataSetRollup pk -> (refreshed_at, QueryResult)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def get_rollup_definitions(dataset):
+    """
+    Rollups declared in DataSet.params_config:
+        {"rollups": [{"dimensions": ["region", "month"], "measures": ["amount", "qty"]}]}
+    Returns a list of {'key', 'dimensions', 'measures'} (invalid entries are skipped).
+    """
+    try:
+        config = json.loads(dataset.params_config or '{}')
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(config, dict) or not isinstance(config.get('rollups'), list):
+        return []
+
+    definitions = []
+    for entry in config['rollups']:
+        if not isinstance(entry, dict):
+            continue
+        dimensions = [c for c in dict.fromkeys(entry.get('dimensions') or []) if c and isinstance(c, str)]
+        measures = [c for c in dict.fromkeys(entry.get('measures') or [])
+                    if c and isinstance(c, str) and c not in dimensions]
+        if not dimensions or not measures:
+            continue
+        payload = json.dumps([sorted(dimensions), sorted(measures), ROLLUP_FORMAT])
+        definitions.append({
+            'key': hashlib.sha256(payload.encode('utf-8')).hexdigest(),
+            'dimensions': dimensions,
+            'measures': measures,
+        })
+    return definitions
+
+
+def get_rollup_sql_hash(dataset, sql, bind_params):
+    """Fingerprint of the resolved SQL (and bind values) a rollup is built from."""
+    payload = json.dumps({
+        'ds': dataset.datasource_id,
+        'sql': sql.strip(),
+        'params': list(bind_params or []),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _part_column(index, part):
+    return f"m{index}_{part}"
+
+
+def build_rollup_sql(db_type, sql, dimensions, measures):
+    """
+    SELECT dims, SUM(COALESCE(m, 0)) AS m0_sum, COUNT(*) AS m0_cnt, MIN(...) AS m0_min,
+    MAX(...) AS m0_max, ... FROM (sql) GROUP BY dims
+    Partials follow QueryExecutor.measure_sql (NULL measures count as 0). NULL
+    dimension values are kept as groups here and dropped when re-aggregating.
+    Measures are stored under positional aliases so long column names stay within
+    the identifier limits of every dialect.
+    """
+    sql = sql.strip()
+    if sql.endswith(';'):
+        sql = sql[:-1]
+    with_prefix, body = QueryExecutor.split_cte(sql)
+    quote = lambda name: QueryExecutor.quote_identifier(db_type, name)
+    group_cols = [quote(c) for c in dimensions]
+    select_cols = list(group_cols)
+    for i, col in enumerate(measures):
+        for part, aggregation in zip(ROLLUP_PARTS, ('sum', 'count', 'min', 'max')):
+            measure = QueryExecutor.measure_sql(db_type, col, aggregation)
+            select_cols.append(f"{measure} AS {quote(_part_column(i, part))}")
+    alias = get_backend(db_type).table_alias("bi_rollup")
+    return (f"{with_prefix}SELECT {', '.join(select_cols)} FROM ({body}){alias} "
+            f"GROUP BY {', '.join(group_cols)}")
+
+
+def rollup_table(table, dimensions, measures):
+    """The rollup of a pyarrow Table (an extract), same columns as build_rollup_sql."""
+    from core.dataset.extract import _fill_measures, _to_numpy
+
+    aggregations = []
+    names = list(dimensions)
+    for i, col in enumerate(measures):
+        for part, func in zip(ROLLUP_PARTS, ('sum', 'count', 'min', 'max')):
+            aggregations.append((col, func))
+            names.append(_part_column(i, part))
+    table = _fill_measures(table.select(list(dimensions) + list(measures)), measures)
+    grouped = table.group_by(dimensions, use_threads=False)
+    # Aggregates come back as "<column>_<func>"; the key position differs between pyarrow versions
+    result = grouped.aggregate(aggregations)
+    arrays = [result.column(name) for name in dimensions]
+    arrays += [result.column(f"{col}_{func}") for col, func in aggregations]
+    return QueryResult(names, [_to_numpy(c) for c in arrays])
+
+
+class RollupStore:
+    """
+    Pre-aggregated rollups of hot datasets. A rollup is the dataset grouped by
+    its declared dimensions with SUM/COUNT/MIN/MAX of each measure, stored in
+    DataSetRollup and refreshed by 'cache' scheduled tasks (core.reporting.tasks).
+    Chart queries grouping by a subset of the dimensions are answered by
+    re-aggregating the rollup instead of querying the source.
+    """
+
+    @staticmethod
+    def refresh(dataset, resolver=None):
+        """
+        Materialize every rollup declared on dataset, returns the number refreshed.
+        Rollups no longer declared are deleted; failures are stored on the row.
+        """
+        definitions = get_rollup_definitions(dataset)
+        DataSetRollup.objects.filter(dataset=dataset).exclude(
+            definition_key__in=[d['key'] for d in definitions]
+        ).delete()
+        if not definitions:
+            return 0
+
+        from core.dataset.extract import ExtractStore
+
+        # Rollups answer queries with the dataset's default parameters
+        sql, bind_params = resolve_dataset(dataset, resolver=resolver)
+        sql_hash = get_rollup_sql_hash(dataset, sql, bind_params)
+        max_rows = getattr(settings, 'BI_ROLLUP_MAX_ROWS', 200000)
+        # Datasets in extract mode are rolled up from the local snapshot, so an
+        # incremental extract refresh doesn't cost a full scan of the source
+        table = ExtractStore.get_table(dataset, sql, bind_params)
+
+        refreshed = 0
+        for definition in definitions:
+            rollup, _ = DataSetRollup.objects.get_or_create(
+                dataset=dataset, definition_key=definition['key'],
+                defaults={
+                    'dimensions': json.dumps(definition['dimensions'], ensure_ascii=False),
+                    'measures': json.dumps(definition['measures'], ensure_ascii=False),
+                }
+            )
+            try:
+                if table is not None:
+                    result = rollup_table(table, definition['dimensions'], definition['measures'])
+                    if max_rows and len(result) > max_rows:
+                        raise ValueError(f"Rollup has more than {max_rows} rows")
+                else:
+                    rollup_sql = build_rollup_sql(
+                        dataset.datasource.db_type, sql, definition['dimensions'], definition['measures']
+                    )
+                    result = QueryExecutor.execute(
+                        dataset.datasource, rollup_sql, params=bind_params, use_cache=False, max_rows=max_rows
+                    )
+            except Exception as e:
+                logger.warning(f"Rollup {rollup.pk} of dataset {dataset.pk} failed: {e}")
+                rollup.error = str(e)
+                rollup.save(update_fields=['error'])
+                continue
+
+            rollup.sql_hash = sql_hash
+            rollup.data = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            rollup.row_count = len(result)
+            rollup.refreshed_at = timezone.now()
+            rollup.error = ''
+            rollup.save(update_fields=['sql_hash', 'data', 'row_count', 'refreshed_at', 'error'])
+            refreshed += 1
+            logger.info(f"Refreshed rollup {rollup.pk} of dataset {dataset.pk}: {len(result)} rows")
+        return refreshed
+
+    @staticmethod
+    def _load_data(rollup_id, refreshed_at):
+        with _loaded_lock:
+            cached = _loaded.get(rollup_id)
+        if cached is not None and cached[0] == refreshed_at:
+            return cached[1]
+        data = DataSetRollup.objects.filter(pk=rollup_id).values_list('data', flat=True).first()
+        if data is None:
+            return None
+        result = pickle.loads(zlib.decompress(bytes(data)))
+        with _loaded_lock:
+            _loaded[rollup_id] = (refreshed_at, result)
+        return result
+
+    @staticmethod
+    def answer(dataset, sql, bind_params, spec, filters=None, limit=None):
+        """
+        Answer an aggregation spec (QueryExecutor.get_aggregation_spec) from a
+        matching rollup, returns a QueryResult shaped like the grouped SQL query
+        or None when no fresh rollup covers it.
+        """
+        definitions = get_rollup_definitions(dataset)
+        if not spec or not definitions:
+            return None
+        wanted_filters = QueryCache.normalize_filters(filters)
+        filter_cols = {f[0] for f in wanted_filters}
+        sql_hash = get_rollup_sql_hash(dataset, sql, bind_params)
+
+        candidates = DataSetRollup.objects.filter(
+            dataset_id=dataset.pk, sql_hash=sql_hash, error='', refreshed_at__isnull=False,
+            definition_key__in=[d['key'] for d in definitions]
+        ).order_by('row_count').values_list('id', 'dimensions', 'measures', 'refreshed_at')
+        for rollup_id, dimensions, measures, refreshed_at in candidates:
+            dimensions = json.loads(dimensions)
+            measures = json.loads(measures)
+            if not set(spec['group_by']) <= set(dimensions) or not filter_cols <= set(dimensions):
+                continue
+            if not set(spec['measures']) <= set(measures):
+                continue
+
+            result = RollupStore._load_data(rollup_id, refreshed_at)
+            if result is None:
+                continue
+            if wanted_filters:
+                # Only filters that give the same answer in memory as in SQL
+                mask = _filter_mask(result, wanted_filters)
+                if mask is None:
+                    continue
+                result = result.take(mask)
+            logger.debug(f"Answered dataset {dataset.pk} query from rollup {rollup_id}")
+            return RollupStore._reaggregate(result, measures, spec, limit)
+        return None
+
+    @staticmethod
+    def _reaggregate(result, rollup_measures, spec, limit):
+        group_by = spec['group_by']
+        aggregation = spec['aggregation']
+        if not len(result):
+            return QueryResult.empty(group_by + spec['measures'])
+
+        # Rows with a NULL group value are dropped, like the pushed-down query and aggregate_data
+        grouped = result.to_dataframe().groupby(group_by, dropna=True, sort=True)
+        out = {}
+        for col in spec['measures']:
+            i = rollup_measures.index(col)
+            if aggregation == 'sum':
+                out[col] = grouped[_part_column(i, 'sum')].sum(min_count=1)
+            elif aggregation == 'count':
+                out[col] = grouped[_part_column(i, 'cnt')].sum()
+            elif aggregation == 'min':
+                out[col] = grouped[_part_column(i, 'min')].min()
+            elif aggregation == 'max':
+                out[col] = grouped[_part_column(i, 'max')].max()
+            else:
+                # mean: total of the sums over total of the row counts
+                counts = grouped[_part_column(i, 'cnt')].sum()
+                sums = grouped[_part_column(i, 'sum')].sum(min_count=1)
+                out[col] = sums.astype(float) / counts.where(counts > 0, np.nan)
+
+        frame = pd.DataFrame(out).reset_index()
+        if limit:
+            frame = frame.head(limit)
+        # NaN from empty groups -> None, as the database returns NULL
+        frame = frame.astype(object).where(frame.notna(), None)
+        return QueryResult.from_dataframe(frame)
+
+
+def refresh_rollups(dataset_ids=None):
+    """
+    Refresh the rollups of the given datasets (all datasets declaring rollups
+    when None), returns the number of rollups refreshed.
+    """
+    queryset = DataSet.objects.select_related('datasource')
+    if dataset_ids is not None:
+        queryset = queryset.filter(pk__in=dataset_ids)
+    else:
+        queryset = queryset.filter(params_config__contains='rollups')
+
+    refreshed = 0
+    for dataset in queryset:
+        try:
+            refreshed += RollupStore.refresh(dataset)
+        except Exception as e:
+            logger.error(f"Refreshing rollups of dataset {dataset.pk} failed: {e}")
+    return refreshed
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import operator
+
+import numpy as np
+from django.conf import settings
+
+from core.dataset.cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+# Filter ops that give the same answer in memory as in SQL on numeric columns.
+# Text comparisons and LIKE depend on the database collation, so they always go to the source.
+NUMERIC_OPS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'gt': operator.gt,
+    'lt': operator.lt,
+    'gte': operator.ge,
+    'lte': operator.le,
+}
+
+
+def _to_number(val):
+    """Coerce a filter value the way QueryExecutor binds it, None if not numeric."""
+    try:
+        num = float(val)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return int(num) if num.is_integer() and '.' not in str(val) else num
+
+
+def _filter_mask(result, filters):
+    """
+    Boolean row mask for normalized filters ([col, op, val]) evaluated on a
+    cached result, or None if any of them can't be evaluated exactly in memory.
+    """
+    mask = np.ones(len(result), dtype=bool)
+    for col, op, val in filters:
+        if col not in result.columns:
+            return None
+        arr = result.column(col)
+        if op in ('is_null', 'is_not_null'):
+            if arr.dtype == object:
+                nulls = np.array([v is None for v in arr.tolist()], dtype=bool)
+            else:
+                nulls = np.zeros(len(arr), dtype=bool)
+            mask &= nulls if op == 'is_null' else ~nulls
+            continue
+        num = _to_number(val)
+        if op not in NUMERIC_OPS or num is None or arr.dtype.kind not in 'iuf':
+            return None
+        mask &= NUMERIC_OPS[op](arr, num)
+    return mask
+
+
+class SemanticCache:
+    """
+    Index of the cached results of one base query (datasource + dataset SQL +
+    params + version), so a narrower request can be answered from a wider one:
+      - a smaller limit from a larger or complete result (first rows)
+      - extra filters evaluated in memory on a complete result
+      - a subset of the columns
+    Aggregated queries are neither indexed nor answered here.
+    """
+    INDEX_PREFIX = 'bi:query:idx:'
+
+    @staticmethod
+    def base_key(datasource, sql, params=None, version=None):
+        payload = json.dumps({
+            'ds': datasource.pk,
+            'ds_ver': str(datasource.updated_at),
+            'sql': sql.strip(),
+            'params': list(params or []),
+            'version': version,
+        }, sort_keys=True, default=str)
+        return SemanticCache.INDEX_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _get_index(base_key):
+        try:
+            return QueryCache.get_backend().get(base_key) or []
+        except Exception as e:
+            logger.warning(f"Query cache index read failed: {e}")
+            return []
+
+    @staticmethod
+    def register(base_key, cache_key, filters, limit, columns, result, ttl):
+        """Remember a freshly cached result so narrower requests can use it."""
+        entry = {
+            'key': cache_key,
+            'filters': QueryCache.normalize_filters(filters),
+            'limit': limit,
+            'columns': list(columns) if columns else None,
+            # All matching rows are there when the limit didn't cut the result off
+            'complete': not limit or len(result) < limit,
+        }
+        index = [e for e in SemanticCache._get_index(base_key) if e['key'] != cache_key]
+        index.append(entry)
+        max_entries = getattr(settings, 'BI_QUERY_CACHE_INDEX_SIZE', 16)
+        try:
+            QueryCache.get_backend().set(base_key, index[-max_entries:], ttl)
+        except Exception as e:
+            logger.warning(f"Query cache index write failed: {e}")
+
+    @staticmethod
+    def lookup(base_key, filters, limit, columns):
+        """Return a QueryResult answering the request from a cached entry, or None."""
+        index = SemanticCache._get_index(base_key)
+        if not index:
+            return None
+        wanted_filters = QueryCache.normalize_filters(filters)
+        wanted_set = {tuple(f) for f in wanted_filters}
+
+        # Prefer complete entries, then the smallest result that fits
+        candidates = sorted(index, key=lambda e: (not e['complete'], e['limit'] or 0))
+        for entry in candidates:
+            entry_filters = {tuple(f) for f in entry['filters']}
+            if not entry_filters <= wanted_set:
+                continue
+            extra = [f for f in wanted_filters if tuple(f) not in entry_filters]
+            if not entry['complete']:
+                # A truncated result only answers the same rows with a smaller limit
+                if extra or not limit or limit > entry['limit']:
+                    continue
+            if entry['columns'] is not None:
+                needed = set(columns or []) | {f[0] for f in extra}
+                if not columns or not needed <= set(entry['columns']):
+                    continue
+
+            result = QueryCache.get(entry['key'])
+            if result is None:
+                continue
+            if extra:
+                mask = _filter_mask(result, extra)
+                if mask is None:
+                    continue
+                result = result.take(mask)
+            if columns:
+                if not all(c in result.columns for c in columns):
+                    continue
+                result = result.select(list(dict.fromkeys(columns)))
+            if limit:
+                result = result.slice(0, limit)
+            return result
+        return None
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from core.dataset.models import DataSet
+from core.dataset.dependencies import sync_dependencies, invalidate_dataset
+
+@receiver(post_save, sender=DataSet)
+def dataset_saved(sender, instance, **kwargs):
+    """
+    Keep the dependency graph in sync with the SQL and drop cached results
+    of the dataset and everything built on it.
+    """
+    sync_dependencies(instance)
+    invalidate_dataset(instance.pk)
+
+@receiver(pre_delete, sender=DataSet)
+def dataset_deleted(sender, instance, **kwargs):
+    # Before the cascade removes the edges we need to find the dependents
+    invalidate_dataset(instance.pk)
@@ -0,0 +1,128 @@
+import datetime
+from functools import lru_cache
+
+from django.utils import timezone
+
+# minute, hour, day of month, month, day of week (0 or 7 = Sunday)
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+DAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+# How far ahead next_after() looks before giving up (e.g. "0 0 30 2 *")
+MAX_YEARS = 5
+
+
+def _parse_value(value, names):
+    value = value.strip().lower()
+    if names and value in names:
+        return names[value]
+    return int(value)
+
+
+def _parse_field(field, low, high, names=None):
+    """Parse one cron field (lists, ranges, steps, names) into a sorted tuple of values."""
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_part = part.split('/', 1)
+            step = int(step_part)
+            if step < 1:
+                raise ValueError(f"Invalid step: {step_part}")
+        if part in ('*', '?'):
+            start, end = low, high
+        elif '-' in part:
+            start_part, end_part = part.split('-', 1)
+            start, end = _parse_value(start_part, names), _parse_value(end_part, names)
+        else:
+            start = _parse_value(part, names)
+            # "5/15" means from 5 to the end of the range
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Value out of range: {field}")
+        values.update(range(start, end + 1, step))
+    return tuple(sorted(values))
+
+
+class CronExpression:
+    """
+    Standard 5-field cron expression ("minute hour day month weekday"), with
+    lists, ranges, steps, month/day names and @daily-style aliases.
+    As in cron, when both day of month and day of week are restricted a day
+    matching either one fires.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression: {expression}")
+        try:
+            self.minutes = _parse_field(fields[0], *FIELD_RANGES[0])
+            self.hours = _parse_field(fields[1], *FIELD_RANGES[1])
+            self.days = _parse_field(fields[2], *FIELD_RANGES[2])
+            self.months = _parse_field(fields[3], *FIELD_RANGES[3], MONTH_NAMES)
+            self.weekdays = tuple(sorted({d % 7 for d in _parse_field(fields[4], *FIELD_RANGES[4], DAY_NAMES)}))
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression: {expression} ({e})")
+        self.any_day = fields[2] in ('*', '?')
+        self.any_weekday = fields[4] in ('*', '?')
+
+    def _day_matches(self, day):
+        weekday = (day.weekday() + 1) % 7
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return weekday in self.weekdays
+        if self.any_weekday:
+            return day.day in self.days
+        return day.day in self.days or weekday in self.weekdays
+
+    def next_after(self, after):
+        """
+        First time strictly after `after` the expression fires. Evaluated on the
+        wall clock of the current timezone (TIME_ZONE); aware in, aware out.
+        """
+        aware = timezone.is_aware(after)
+        local = timezone.localtime(after).replace(tzinfo=None) if aware else after
+        t = local.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit_year = t.year + MAX_YEARS
+
+        while t.year <= limit_year:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+                continue
+            hour = next((h for h in self.hours if h >= t.hour), None)
+            if hour is None:
+                t = t.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+                continue
+            if hour != t.hour:
+                t = t.replace(hour=hour, minute=0)
+            minute = next((m for m in self.minutes if m >= t.minute), None)
+            if minute is None:
+                t = t.replace(minute=0) + datetime.timedelta(hours=1)
+                continue
+            t = t.replace(minute=minute)
+            return timezone.make_aware(t) if aware else t
+        raise ValueError(f"Cron expression never fires: {self.expression}")
+
+
+@lru_cache(maxsize=256)
+def parse_cron(expression):
+    """Parsed (cached) CronExpression; raises ValueError when it is invalid."""
+    return CronExpression(expression)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.reporting.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = "Run the task scheduler (several nodes may run it against the same database)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the tasks due now and exit")
+        parser.add_argument('--workers', type=int, help="Tasks run in parallel (default BI_SCHEDULER_WORKERS)")
+        parser.add_argument('--interval', type=float, help="Seconds between polls (default BI_SCHEDULER_POLL_INTERVAL)")
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(max_workers=options['workers'])
+        if options['once']:
+            submitted = scheduler.tick()
+            scheduler.stop(wait=True)
+            self.stdout.write(f"Ran {submitted} tasks")
+            return
+
+        self.stdout.write(f"Scheduler {scheduler.worker_id} running, Ctrl+C to stop")
+        try:
+            scheduler.run_forever(poll_interval=options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.stop(wait=True)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.reporting.models import ScheduledTask
+from core.reporting.tasks import run_task
+
+
+class Command(BaseCommand):
+    help = "Run scheduled tasks now (by id, or every active task of a type)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('task_ids', nargs='*', type=int)
+        parser.add_argument('--type', dest='task_type', help="Run every active task of this type, e.g. cache")
+
+    def handle(self, *args, **options):
+        if options['task_ids']:
+            tasks = ScheduledTask.objects.filter(pk__in=options['task_ids'])
+        elif options['task_type']:
+            tasks = ScheduledTask.objects.filter(task_type=options['task_type'], is_active=True)
+        else:
+            raise CommandError("Give task ids or --type")
+
+        for task in tasks:
+            try:
+                summary = run_task(task)
+            except Exception as e:
+                self.stderr.write(f"[{task.pk}] {task.name}: {e}")
+                continue
+            self.stdout.write(f"[{task.pk}] {task.name}: {summary}")
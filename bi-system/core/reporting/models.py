@@ -90,5 +90,32 @@ class ScheduledTask(models.Model):
     next_run = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
 
+    # Held by the scheduler node running the task (see core.reporting.scheduler)
+    lease_owner = models.CharField(max_length=100, blank=True, default='')
+    lease_expires = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         db_table = 'bi_scheduled_task'
+
+
+class ScheduledTaskRun(models.Model):
+    """
+    Run history of scheduled tasks
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.ForeignKey(ScheduledTask, on_delete=models.CASCADE, related_name='runs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    worker = models.CharField(max_length=100, blank=True, default='')
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True, help_text="Seconds")
+    message = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'bi_scheduled_task_run'
+        ordering = ['-started_at']
@@ -0,0 +1,141 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from core.reporting.cron import parse_cron
+from core.reporting.models import ScheduledTask
+from core.reporting.tasks import TASK_HANDLERS, run_task
+
+logger = logging.getLogger(__name__)
+
+
+def compute_next_run(task, after=None):
+    """Next time a task is due after `after` (default now), None for an invalid cron expression."""
+    try:
+        return parse_cron(task.cron_expression).next_after(after or timezone.now())
+    except ValueError as e:
+        logger.warning(f"Task {task.pk} ({task.name}): {e}")
+        return None
+
+
+class Scheduler:
+    """
+    Runs due ScheduledTask rows on a thread pool. Several app nodes can run a
+    scheduler against the same database: a task is claimed with one conditional
+    UPDATE that takes its lease and moves next_run forward, so each due run is
+    executed by exactly one node, and a task still running elsewhere is skipped.
+    """
+
+    def __init__(self, max_workers=None, lease_seconds=None):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_workers = max_workers or getattr(settings, 'BI_SCHEDULER_WORKERS', 4)
+        self.lease_seconds = lease_seconds or getattr(settings, 'BI_SCHEDULER_LEASE_SECONDS', 3600)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bi-scheduler')
+        self.running = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        # Tasks of types without a handler, already logged
+        self.unsupported = set()
+
+    def schedule_missing(self):
+        """Give active tasks without next_run their first run time."""
+        tasks = ScheduledTask.objects.filter(is_active=True, next_run__isnull=True, task_type__in=list(TASK_HANDLERS))
+        for task in tasks:
+            next_run = compute_next_run(task)
+            if next_run:
+                ScheduledTask.objects.filter(pk=task.pk, next_run__isnull=True).update(next_run=next_run)
+
+    def claim(self, task, now):
+        """Take the lease of a due task, True if this node is the one to run it."""
+        next_run = compute_next_run(task, after=now)
+        if next_run is None:
+            # Invalid cron expression: unschedule instead of running it
+            ScheduledTask.objects.filter(pk=task.pk, next_run=task.next_run).update(next_run=None)
+            return False
+        claimed = ScheduledTask.objects.filter(
+            Q(lease_expires__isnull=True) | Q(lease_expires__lt=now),
+            pk=task.pk, is_active=True, next_run=task.next_run,
+        ).update(
+            lease_owner=self.worker_id,
+            lease_expires=now + timedelta(seconds=self.lease_seconds),
+            next_run=next_run,
+        )
+        return claimed == 1
+
+    def release(self, task):
+        ScheduledTask.objects.filter(pk=task.pk, lease_owner=self.worker_id).update(
+            lease_owner='', lease_expires=None
+        )
+
+    def tick(self):
+        """Claim and submit every due task, returns the number submitted."""
+        self.schedule_missing()
+        now = timezone.now()
+        with self.lock:
+            free = self.max_workers - len(self.running)
+        if free <= 0:
+            return 0
+
+        self.log_unsupported()
+        submitted = 0
+        due = ScheduledTask.objects.filter(
+            Q(lease_expires__isnull=True) | Q(lease_expires__lt=now),
+            is_active=True, next_run__lte=now, task_type__in=list(TASK_HANDLERS),
+        ).order_by('next_run')[:free]
+        for task in due:
+            if not self.claim(task, now):
+                continue
+            with self.lock:
+                self.running.add(task.pk)
+            self.pool.submit(self._run, task)
+            submitted += 1
+        return submitted
+
+    def log_unsupported(self):
+        """
+        Warn once about active tasks whose type has no handler (e.g. 'email'):
+        they are left alone rather than recorded as a failed run on every tick.
+        """
+        tasks = ScheduledTask.objects.filter(is_active=True).exclude(
+            task_type__in=list(TASK_HANDLERS)).values_list('pk', 'name', 'task_type')
+        for pk, name, task_type in tasks:
+            if (pk, task_type) not in self.unsupported:
+                self.unsupported.add((pk, task_type))
+                logger.warning(f"Task {pk} ({name}): unsupported task type '{task_type}', not scheduled")
+
+    def _run(self, task):
+        try:
+            run_task(task, worker=self.worker_id)
+        except Exception:
+            pass  # Recorded in ScheduledTaskRun by run_task
+        finally:
+            try:
+                self.release(task)
+            finally:
+                with self.lock:
+                    self.running.discard(task.pk)
+                close_old_connections()
+
+    def run_forever(self, poll_interval=None):
+        poll_interval = poll_interval or getattr(settings, 'BI_SCHEDULER_POLL_INTERVAL', 30)
+        logger.info(f"Scheduler {self.worker_id} started ({self.max_workers} workers)")
+        while not self.stopped.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            close_old_connections()
+            self.stopped.wait(poll_interval)
+
+    def stop(self, wait=True):
+        self.stopped.set()
+        self.pool.shutdown(wait=wait)
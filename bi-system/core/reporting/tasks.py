@@ -0,0 +1,134 @@
+import json
+import logging
+import time
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Rows shown by the dataset previews (dataset_preview_view, api_preview_dataset_data)
+PREWARM_PREVIEW_LIMIT = 100
+
+
+def load_target_config(task):
+    """Parse ScheduledTask.target_config, returns a dict (empty when unset or invalid)."""
+    try:
+        config = json.loads(task.target_config or '{}')
+    except (TypeError, ValueError):
+        return {}
+    return config if isinstance(config, dict) else {}
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    return value if isinstance(value, list) else [value]
+
+
+def prewarm_datasets(dataset_ids):
+    """
+    Run each dataset's default preview query with refresh, so the first viewer
+    hits the cache. Only the previewed rows are cached, not the whole result;
+    the aggregated chart queries are warmed by prewarm_reports.
+    """
+    from core.dataset.cache import QueryCache, get_dataset_cache_ttl
+    from core.dataset.extract import execute_dataset
+    from core.dataset.models import DataSet
+    from core.dataset.resolver import SqlResolver, resolve_dataset
+
+    resolver = SqlResolver()
+    warmed = 0
+    for dataset in DataSet.objects.filter(pk__in=dataset_ids).select_related('datasource'):
+        try:
+            sql, bind_params = resolve_dataset(dataset, resolver=resolver)
+            execute_dataset(
+                dataset, sql, params=bind_params, limit=PREWARM_PREVIEW_LIMIT, refresh=True,
+                cache_ttl=get_dataset_cache_ttl(dataset), cache_version=QueryCache.dataset_version(dataset.pk)
+            )
+            warmed += 1
+        except Exception as e:
+            logger.error(f"Pre-warming dataset {dataset.pk} failed: {e}")
+    return warmed
+
+
+def prewarm_reports(report_ids):
+    """Render each report with its default parameters and refresh, filling the query cache."""
+    from apps.dashboard.views import _get_report_render_data
+    from core.dataset.resolver import SqlResolver
+    from core.reporting.models import Report
+
+    warmed = 0
+    for report in Report.objects.filter(pk__in=report_ids):
+        try:
+            _get_report_render_data(report, params={}, refresh=True, resolver=SqlResolver())
+            warmed += 1
+        except Exception as e:
+            logger.error(f"Pre-warming report {report.pk} failed: {e}")
+    return warmed
+
+
+def run_cache_task(task):
+    """
+    'cache' task: refresh the dataset extracts (core.dataset.extract) and
+    rollups (core.dataset.rollup), then pre-warm the query cache.
+    target_config: {"dataset_ids": [1, 2], "report_ids": [3], "full": false}
+      - without dataset_ids every dataset in extract mode or declaring rollups
+        is refreshed; listed datasets also get their default preview cached
+      - report_ids are rendered with default parameters, e.g. before business hours
+        (pre-warmed results live as long as the datasets' cache TTL)
+      - "full" reloads incremental extracts completely
+    """
+    from core.dataset.extract import refresh_extracts
+    from core.dataset.rollup import refresh_rollups
+
+    config = load_target_config(task)
+    dataset_ids = _as_list(config.get('dataset_ids'))
+    report_ids = _as_list(config.get('report_ids'))
+    extracts = refresh_extracts(dataset_ids, full=bool(config.get('full')))
+    rollups = refresh_rollups(dataset_ids)
+    summary = f"Refreshed {extracts} extracts, {rollups} rollups"
+    if dataset_ids:
+        summary += f", pre-warmed {prewarm_datasets(dataset_ids)} datasets"
+    if report_ids:
+        summary += f", pre-warmed {prewarm_reports(report_ids)} reports"
+    return summary
+
+
+TASK_HANDLERS = {
+    'cache': run_cache_task,
+}
+
+
+def run_task(task, worker=''):
+    """
+    Run a ScheduledTask now, record it in ScheduledTaskRun and set last_run.
+    Returns the handler's summary; errors are recorded and re-raised.
+    """
+    from core.dataset.admission import background_queries
+    from core.reporting.models import ScheduledTaskRun
+
+    run = ScheduledTaskRun.objects.create(task=task, worker=worker, started_at=timezone.now())
+    started = time.monotonic()
+    logger.info(f"Running task {task.pk} ({task.name})")
+    try:
+        handler = TASK_HANDLERS.get(task.task_type)
+        if handler is None:
+            raise ValueError(f"Unsupported task type: {task.task_type}")
+        # Task queries yield to viewer queries on busy data sources
+        with background_queries():
+            summary = handler(task)
+    except Exception as e:
+        run.status = 'failed'
+        run.message = str(e)
+        logger.error(f"Task {task.pk} ({task.name}) failed: {e}")
+        raise
+    else:
+        run.status = 'success'
+        run.message = summary or ''
+        return summary
+    finally:
+        run.finished_at = timezone.now()
+        run.duration = time.monotonic() - started
+        run.save(update_fields=['status', 'message', 'finished_at', 'duration'])
+        task.last_run = run.started_at
+        task.save(update_fields=['last_run'])
@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+
+from django.test import SimpleTestCase
+
+from core.dataset.admission import BACKGROUND, INTERACTIVE, AdmissionController, QueryRejected
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    """Per-DataSource query slots, held in the (local memory) query cache."""
+
+    def controller(self, **kwargs):
+        options = {'queue_size': 5, 'timeout': 2, 'lease': 60, 'reserve': 1, 'poll_interval': 0.01}
+        options.update(kwargs)
+        return AdmissionController(key=f"test-{uuid.uuid4().hex[:8]}", **options)
+
+    def test_limit(self):
+        controller = self.controller(timeout=0.05)
+        slots = [controller.acquire(2), controller.acquire(2)]
+        with self.assertRaises(QueryRejected):
+            controller.acquire(2)
+        controller.release(slots.pop())
+        slots.append(controller.acquire(2))
+        for slot in slots:
+            controller.release(slot)
+        self.assertEqual(controller.stats()['timeouts'], 1)
+
+    def test_background_leaves_reserved_slots(self):
+        controller = self.controller(timeout=0.05)
+        background = controller.acquire(3, BACKGROUND)
+        controller.acquire(3, BACKGROUND)
+        with self.assertRaises(QueryRejected):
+            controller.acquire(3, BACKGROUND)
+        # The reserved slot is still free for viewers
+        controller.acquire(3, INTERACTIVE)
+        controller.release(background)
+        controller.acquire(3, BACKGROUND)
+
+    def test_reserve_is_capped_below_the_limit(self):
+        controller = self.controller(reserve=2, timeout=0.05)
+        self.assertEqual(controller.background_slots(1), 1)
+        self.assertEqual(controller.background_slots(2), 1)
+        self.assertEqual(controller.background_slots(4), 2)
+        slot = controller.acquire(1, BACKGROUND)
+        with self.assertRaises(QueryRejected):
+            controller.acquire(1, INTERACTIVE)
+        controller.release(slot)
+
+    def test_invalid_reserve(self):
+        with self.assertRaises(ValueError):
+            self.controller(reserve=-1)
+
+    def test_interactive_waiters_go_first(self):
+        controller = self.controller(reserve=0)
+        slot = controller.acquire(1)
+        order = []
+
+        def wait(priority):
+            acquired = controller.acquire(1, priority)
+            order.append(priority)
+            controller.release(acquired)
+
+        background = threading.Thread(target=wait, args=(BACKGROUND,))
+        background.start()
+        while not controller.stats()['waiting_background']:
+            time.sleep(0.005)
+        interactive = threading.Thread(target=wait, args=(INTERACTIVE,))
+        interactive.start()
+        while not controller.stats()['waiting_interactive']:
+            time.sleep(0.005)
+        controller.release(slot)
+        background.join()
+        interactive.join()
+        self.assertEqual(order, [INTERACTIVE, BACKGROUND])
+
+    def test_queue_is_bounded(self):
+        controller = self.controller(queue_size=1)
+        slot = controller.acquire(1)
+        waiter = threading.Thread(target=lambda: controller.release(controller.acquire(1)))
+        waiter.start()
+        while not controller.stats()['waiting_interactive']:
+            time.sleep(0.005)
+        with self.assertRaises(QueryRejected):
+            controller.acquire(1)
+        controller.release(slot)
+        waiter.join()
+        self.assertEqual(controller.stats()['rejected'], 1)
@@ -0,0 +1,217 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import duckdb
+import pyarrow as pa
+from django.test import TestCase, override_settings
+
+from apps.dashboard.utils.data_processing import aggregate_data
+from apps.dashboard.views import fetch_chart_data
+from core.data_source.backends import get_backend
+from core.data_source.models import DataSource
+from core.dataset.executor import QueryExecutor
+from core.dataset import extract as extract_module
+from core.dataset.extract import ExtractStore, _to_arrow_array
+from core.dataset.metadata import get_numeric_columns
+from core.dataset.models import DataSet
+from core.dataset.rollup import RollupStore, build_rollup_sql, rollup_table
+
+SOURCE_SQL = "SELECT * FROM sales"
+ROWS = [
+    ('a', 'x', 3), ('a', 'y', None), ('b', 'x', 2), ('b', 'x', 5),
+    (None, 'x', 7), ('c', None, 4), ('c', 'y', None), ('d', 'y', None),
+]
+AGGREGATIONS = ['sum', 'mean', 'max', 'min', 'count']
+# Text measures holding formatted numbers: aggregate_data strips the commas
+FORMATTED_ROWS = [('a', '1,234'), ('a', '2,000'), ('b', '5')]
+
+
+def _normalize(records):
+    # Compare numbers by value (int vs float vs Decimal) with a little tolerance
+    out = []
+    for record in records:
+        row = {}
+        for key, value in record.items():
+            if value is not None and not isinstance(value, str):
+                value = round(float(value), 6)
+            row[key] = value
+        out.append(row)
+    return out
+
+
+class AggregationParityTests(TestCase):
+    """Pushed-down, extract and rollup aggregates give the same numbers as aggregate_data."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data_dir = tempfile.mkdtemp()
+        cls.settings_override = override_settings(BI_LOCAL_DATA_DIRS=[cls.data_dir], BI_QUERY_CACHE_TTL=0)
+        cls.settings_override.enable()
+
+        conn = sqlite3.connect(os.path.join(cls.data_dir, 'sales.sqlite3'))
+        conn.execute("CREATE TABLE sales (region TEXT, channel TEXT, qty INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?, ?)", ROWS)
+        conn.execute("CREATE TABLE formatted (region TEXT, amount TEXT)")
+        conn.executemany("INSERT INTO formatted VALUES (?, ?)", FORMATTED_ROWS)
+        conn.commit()
+        conn.close()
+
+        conn = duckdb.connect(os.path.join(cls.data_dir, 'sales.duckdb'))
+        conn.execute("CREATE TABLE sales (region VARCHAR, channel VARCHAR, qty INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?, ?)", ROWS)
+        conn.execute("CREATE TABLE formatted (region VARCHAR, amount VARCHAR)")
+        conn.executemany("INSERT INTO formatted VALUES (?, ?)", FORMATTED_ROWS)
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.data_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.sources = [
+            DataSource.objects.create(name='sqlite', db_type='sqlite', db_name='sales.sqlite3', password=''),
+            DataSource.objects.create(name='duckdb', db_type='duckdb', db_name='sales.duckdb', password=''),
+        ]
+
+    def expected(self, datasource, aggregation, series_col):
+        raw = QueryExecutor.execute(datasource, SOURCE_SQL, use_cache=False)
+        return _normalize(aggregate_data(raw, 'region', ['qty'], aggregation, series_col))
+
+    def test_pushdown_matches_aggregate_data(self):
+        for datasource in self.sources:
+            for aggregation in AGGREGATIONS:
+                for series_col in (None, 'channel'):
+                    with self.subTest(db=datasource.db_type, aggregation=aggregation, series=series_col):
+                        spec = QueryExecutor.get_aggregation_spec('region', 'qty', aggregation, series_col)
+                        result = QueryExecutor.execute(datasource, SOURCE_SQL, aggregation=spec, use_cache=False)
+                        self.assertEqual(_normalize(result.records()),
+                                         self.expected(datasource, aggregation, series_col))
+
+    def test_text_measures_are_aggregated_in_memory(self):
+        for datasource in self.sources:
+            with self.subTest(db=datasource.db_type):
+                sql = "SELECT * FROM formatted"
+                dataset = DataSet.objects.create(name=f'formatted_{datasource.pk}', datasource=datasource, sql_script=sql)
+                _, records = fetch_chart_data(dataset, sql, 'region', 'amount', 'sum', use_cache=False)
+                self.assertEqual({r['region']: r['amount'] for r in records}, {'a': 3234, 'b': 5})
+
+    def test_numeric_types(self):
+        backend = get_backend('duckdb')
+        for type_name in ('INTEGER', 'DECIMAL(10,2)', 'DOUBLE', 'int8', 'Decimal', 'numeric'):
+            self.assertTrue(backend.is_numeric_type(type_name), type_name)
+        for type_name in (None, '', 'VARCHAR', 'INTERVAL', 'DATE', 'bool'):
+            self.assertFalse(backend.is_numeric_type(type_name), type_name)
+        dataset = DataSet.objects.create(name='sales', datasource=self.sources[1], sql_script=SOURCE_SQL)
+        self.assertEqual(get_numeric_columns(dataset, SOURCE_SQL), {'qty'})
+
+    def test_mean_counts_null_measures_as_zero(self):
+        spec = QueryExecutor.get_aggregation_spec('region', 'qty', 'mean')
+        result = QueryExecutor.execute(self.sources[0], SOURCE_SQL, aggregation=spec, use_cache=False)
+        records = {r['region']: r['qty'] for r in result.records()}
+        self.assertEqual(records['a'], 1.5)
+        self.assertNotIn(None, records)
+
+    def test_extract_matches_aggregate_data(self):
+        raw = QueryExecutor.execute(self.sources[0], SOURCE_SQL, use_cache=False)
+        table = pa.table({name: _to_arrow_array(pa, raw.column(name)) for name in raw.columns})
+        for aggregation in AGGREGATIONS:
+            for series_col in (None, 'channel'):
+                with self.subTest(aggregation=aggregation, series=series_col):
+                    spec = QueryExecutor.get_aggregation_spec('region', 'qty', aggregation, series_col)
+                    result = ExtractStore.query(table, aggregation=spec)
+                    self.assertEqual(_normalize(result.records()),
+                                     self.expected(self.sources[0], aggregation, series_col))
+
+    def test_rollup_matches_aggregate_data(self):
+        datasource = self.sources[0]
+        dimensions, measures = ['region', 'channel'], ['qty']
+        raw = QueryExecutor.execute(datasource, SOURCE_SQL, use_cache=False)
+        table = pa.table({name: _to_arrow_array(pa, raw.column(name)) for name in raw.columns})
+        rollups = {
+            'sql': QueryExecutor.execute(
+                datasource, build_rollup_sql('sqlite', SOURCE_SQL, dimensions, measures), use_cache=False
+            ),
+            'extract': rollup_table(table, dimensions, measures),
+        }
+        for source, rollup in rollups.items():
+            for aggregation in AGGREGATIONS:
+                for series_col in (None, 'channel'):
+                    with self.subTest(rollup=source, aggregation=aggregation, series=series_col):
+                        spec = QueryExecutor.get_aggregation_spec('region', 'qty', aggregation, series_col)
+                        result = RollupStore._reaggregate(rollup, measures, spec, None)
+                        self.assertEqual(_normalize(result.records()),
+                                         self.expected(datasource, aggregation, series_col))
+
+
+class IncrementalExtractTests(TestCase):
+    """Watermark refreshes of a dataset extract (ExtractStore.refresh)."""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        settings_override = override_settings(
+            BI_LOCAL_DATA_DIRS=[self.data_dir], BI_EXTRACT_DIR=os.path.join(self.data_dir, 'extracts'),
+            BI_QUERY_CACHE_TTL=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Opened extracts are cached by dataset pk, which the test database reuses
+        extract_module._opened.clear()
+        self.addCleanup(extract_module._opened.clear)
+
+        self.db_path = os.path.join(self.data_dir, 'events.sqlite3')
+        self.source_sql("CREATE TABLE events (ts INTEGER, amount INTEGER)")
+        self.source_sql("INSERT INTO events VALUES (1, 10), (2, 20), (3, 30), (4, 40), (5, 50), (NULL, 99)")
+        datasource = DataSource.objects.create(name='events', db_type='sqlite', db_name='events.sqlite3', password='')
+        self.dataset = DataSet.objects.create(
+            name='events', datasource=datasource, sql_script="SELECT ts, amount FROM events",
+            params_config=json.dumps({'extract': {'watermark': 'ts', 'lookback': 1}}),
+        )
+
+    def source_sql(self, sql):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    def snapshot(self):
+        extract = ExtractStore.refresh(self.dataset)
+        table = ExtractStore._open(self.dataset.pk, extract.file_name)
+        rows = sorted(zip(table.column('ts').to_pylist(), table.column('amount').to_pylist()),
+                      key=lambda row: (row[0] is None, row[0] or 0))
+        return extract, rows
+
+    def test_incremental_refresh_replaces_the_window(self):
+        extract, rows = self.snapshot()
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(extract.watermark, '5')
+
+        # Lower bound is 5 - lookback = 4: ts 4 and 5 are read again, ts 3 is not
+        self.source_sql("UPDATE events SET amount = amount + 1")
+        self.source_sql("INSERT INTO events VALUES (6, 60)")
+        extract, rows = self.snapshot()
+        self.assertEqual(rows, [(1, 10), (2, 20), (3, 30), (4, 41), (5, 51), (6, 60), (None, 99)])
+        self.assertEqual(extract.watermark, '6')
+        self.assertEqual(extract.row_count, 7)
+
+    def test_full_refresh(self):
+        self.snapshot()
+        self.source_sql("UPDATE events SET amount = amount + 1")
+        extract = ExtractStore.refresh(self.dataset, full=True)
+        table = ExtractStore._open(self.dataset.pk, extract.file_name)
+        self.assertEqual(sorted(v for v in table.column('amount').to_pylist()), [11, 21, 31, 41, 51, 100])
+
+    def test_schema_change_reloads_in_full(self):
+        self.snapshot()
+        # The new rows' amount no longer casts to the snapshot's int64 column
+        self.source_sql("UPDATE events SET amount = amount + 1")
+        self.source_sql("INSERT INTO events VALUES (6, 'n/a')")
+        extract, rows = self.snapshot()
+        self.assertEqual(extract.version, 2)  # Only the full reload was written
+        self.assertEqual(rows, [(1, '11'), (2, '21'), (3, '31'), (4, '41'), (5, '51'), (6, 'n/a'), (None, '100')])
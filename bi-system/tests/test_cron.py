@@ -0,0 +1,66 @@
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.data_source.models import DataSource
+from core.dataset.models import DataSet
+from core.reporting.cron import CronExpression, parse_cron
+from core.reporting.tasks import PREWARM_PREVIEW_LIMIT, prewarm_datasets
+
+
+def at(*args):
+    return datetime.datetime(*args)
+
+
+class CronExpressionTests(SimpleTestCase):
+    def test_fields(self):
+        cron = CronExpression('*/15 9-17 * jan,JUL mon-fri')
+        self.assertEqual(cron.minutes, (0, 15, 30, 45))
+        self.assertEqual(cron.hours, tuple(range(9, 18)))
+        self.assertEqual(cron.months, (1, 7))
+        self.assertEqual(cron.weekdays, (1, 2, 3, 4, 5))
+        self.assertEqual(CronExpression('0 0 * * 7').weekdays, (0,))
+        self.assertEqual(CronExpression('5/20 * * * *').minutes, (5, 25, 45))
+
+    def test_aliases(self):
+        self.assertEqual(CronExpression('@daily').next_after(at(2024, 3, 1, 12, 0)), at(2024, 3, 2, 0, 0))
+        self.assertEqual(CronExpression('@hourly').next_after(at(2024, 3, 1, 12, 0)), at(2024, 3, 1, 13, 0))
+
+    def test_invalid(self):
+        for expression in ('', '* * * *', '60 * * * *', '* * 0 * *', '*/0 * * * *', '5-1 * * * *', 'x * * * *'):
+            with self.assertRaises(ValueError, msg=expression):
+                CronExpression(expression)
+        with self.assertRaises(ValueError):
+            CronExpression('0 0 30 2 *').next_after(at(2024, 1, 1))
+
+    def test_next_after(self):
+        cron = CronExpression('30 8 * * mon-fri')
+        # Friday 2024-03-01 08:30 -> next Monday
+        self.assertEqual(cron.next_after(at(2024, 3, 1, 8, 30)), at(2024, 3, 4, 8, 30))
+        self.assertEqual(cron.next_after(at(2024, 3, 4, 8, 29, 59)), at(2024, 3, 4, 8, 30))
+        self.assertEqual(CronExpression('0 0 29 2 *').next_after(at(2023, 3, 1)), at(2024, 2, 29))
+        self.assertEqual(CronExpression('59 23 31 12 *').next_after(at(2024, 12, 31, 23, 59)), at(2025, 12, 31, 23, 59))
+
+    def test_day_of_month_or_weekday(self):
+        # Both restricted: either one matches, as in cron
+        cron = CronExpression('0 0 1 * sun')
+        self.assertEqual(cron.next_after(at(2024, 3, 1, 0, 0)), at(2024, 3, 3, 0, 0))
+        self.assertEqual(cron.next_after(at(2024, 3, 31, 0, 0)), at(2024, 4, 1, 0, 0))
+
+    def test_aware_times_use_the_current_timezone(self):
+        after = timezone.make_aware(at(2024, 3, 1, 8, 0))
+        result = parse_cron('0 9 * * *').next_after(after)
+        self.assertTrue(timezone.is_aware(result))
+        self.assertEqual(timezone.localtime(result).replace(tzinfo=None), at(2024, 3, 1, 9, 0))
+
+
+class PrewarmTests(TestCase):
+    def test_prewarm_caches_the_preview_not_the_whole_result(self):
+        datasource = DataSource.objects.create(name='sales', db_type='sqlite', db_name='sales.sqlite3', password='')
+        dataset = DataSet.objects.create(name='sales', datasource=datasource, sql_script='SELECT * FROM sales')
+        with mock.patch('core.dataset.extract.execute_dataset') as execute_dataset:
+            self.assertEqual(prewarm_datasets([dataset.pk]), 1)
+        self.assertEqual(execute_dataset.call_args.kwargs['limit'], PREWARM_PREVIEW_LIMIT)
+        self.assertTrue(execute_dataset.call_args.kwargs['refresh'])
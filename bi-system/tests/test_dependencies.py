@@ -0,0 +1,76 @@
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from core.data_source.models import DataSource
+from core.dataset.cache import QueryCache
+from core.dataset.dependencies import get_dependents
+from core.dataset.models import DataSet, DataSetDependency
+
+
+class DependencyInvalidationTests(TestCase):
+    """Saving a dataset invalidates the cache of every dataset built on it (core.dataset.signals)."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.datasource = DataSource.objects.create(
+            name='sales', db_type='sqlite', db_name='sales.sqlite3', password=''
+        )
+        # orders <- regions <- summary, unrelated stands alone
+        self.orders = self.dataset('orders', 'SELECT * FROM orders')
+        self.regions = self.dataset('regions', f'SELECT region FROM {{{{ dataset:{self.orders.pk} }}}}')
+        self.summary = self.dataset('summary', f'SELECT COUNT(*) FROM {{{{ dataset:{self.regions.pk} }}}}')
+        self.unrelated = self.dataset('unrelated', 'SELECT * FROM customers')
+
+    def dataset(self, name, sql_script):
+        return DataSet.objects.create(name=name, datasource=self.datasource, sql_script=sql_script)
+
+    def versions(self):
+        return {
+            dataset.name: QueryCache.dataset_version(dataset.pk)
+            for dataset in (self.orders, self.regions, self.summary, self.unrelated)
+        }
+
+    def test_dependency_rows_follow_the_sql(self):
+        self.assertEqual(
+            set(DataSetDependency.objects.values_list('dataset_id', 'depends_on_id')),
+            {(self.regions.pk, self.orders.pk), (self.summary.pk, self.regions.pk)},
+        )
+        self.assertEqual(get_dependents(self.orders.pk), {self.regions.pk, self.summary.pk})
+
+    def test_saving_upstream_bumps_direct_and_transitive_dependents(self):
+        before = self.versions()
+        self.orders.sql_script = 'SELECT * FROM orders WHERE amount > 0'
+        self.orders.save()
+        after = self.versions()
+        for name in ('orders', 'regions', 'summary'):
+            self.assertNotEqual(before[name], after[name], name)
+        self.assertEqual(before['unrelated'], after['unrelated'])
+
+    def test_saving_a_dependent_leaves_upstream_cache(self):
+        before = self.versions()
+        self.regions.save()
+        after = self.versions()
+        self.assertEqual(before['orders'], after['orders'])
+        self.assertNotEqual(before['regions'], after['regions'])
+        self.assertNotEqual(before['summary'], after['summary'])
+
+    def test_removed_reference_is_no_longer_invalidated(self):
+        self.regions.sql_script = 'SELECT region FROM orders'
+        self.regions.save()
+        before = self.versions()
+        self.orders.save()
+        after = self.versions()
+        self.assertEqual(before['regions'], after['regions'])
+        self.assertEqual(before['summary'], after['summary'])
+
+    def test_deleting_upstream_bumps_dependents(self):
+        before = self.versions()
+        self.orders.delete()
+        self.assertNotEqual(before['regions'], QueryCache.dataset_version(self.regions.pk))
+        self.assertNotEqual(before['summary'], QueryCache.dataset_version(self.summary.pk))
+
+    def test_cycle_is_rejected(self):
+        self.orders.sql_script = f'SELECT * FROM {{{{ dataset:{self.summary.pk} }}}}'
+        with self.assertRaises(ValidationError):
+            self.orders.full_clean()
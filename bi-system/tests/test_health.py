@@ -0,0 +1,122 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from core.data_source.catalog import SchemaCatalog
+from core.data_source.health import (
+    CircuitBreaker, DataSourceUnavailable, check_available, get_breaker, is_connection_error, reset_breaker,
+)
+from core.data_source.models import DataSource
+from core.dataset.admission import BACKGROUND, get_query_priority
+from core.dataset.executor import QueryExecutor
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """State machine of a DataSource's circuit breaker: closed -> open -> probed closed."""
+
+    def breaker(self, probe=None, **kwargs):
+        breaker = CircuitBreaker('test', probe or (lambda: None), **kwargs)
+        self.addCleanup(breaker.close)
+        return breaker
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = self.breaker(failure_threshold=3, probe_interval=60)
+        breaker.record_failure(OSError('down'))
+        breaker.record_failure(OSError('down'))
+        breaker.record_success(0.01)  # Resets the run of failures
+        breaker.record_failure(OSError('down'))
+        breaker.record_failure(OSError('down'))
+        self.assertFalse(breaker.is_open)
+        breaker.check()
+        breaker.record_failure(OSError('down'))
+        self.assertTrue(breaker.is_open)
+        with self.assertRaises(DataSourceUnavailable):
+            breaker.check()
+        stats = breaker.stats()
+        self.assertEqual((stats['state'], stats['failures'], stats['rejected']), ('open', 5, 1))
+
+    def test_zero_threshold_never_opens(self):
+        breaker = self.breaker(failure_threshold=0)
+        for _ in range(10):
+            breaker.record_failure(OSError('down'))
+        self.assertFalse(breaker.is_open)
+
+    def test_probe_closes_the_breaker(self):
+        recovered = threading.Event()
+
+        def probe():
+            if not recovered.is_set():
+                raise OSError('still down')
+
+        breaker = self.breaker(probe, failure_threshold=1, probe_interval=0.01)
+        breaker.record_failure(OSError('down'))
+        self.assertTrue(breaker.is_open)
+        time.sleep(0.05)
+        self.assertTrue(breaker.is_open)
+        recovered.set()
+        deadline = time.monotonic() + 2
+        while breaker.is_open and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(breaker.is_open)
+        self.assertGreaterEqual(breaker.stats()['probes'], 2)
+        breaker.check()
+
+    def test_connection_errors(self):
+        class OperationalError(Exception):
+            pass
+
+        self.assertTrue(is_connection_error(OperationalError()))
+        self.assertTrue(is_connection_error(ConnectionResetError()))
+        self.assertFalse(is_connection_error(ValueError()))
+
+
+class BreakerRegistryTests(TestCase):
+    def setUp(self):
+        self.datasource = DataSource.objects.create(
+            name='down', db_type='sqlite', db_name='missing.sqlite3', password=''
+        )
+        self.addCleanup(reset_breaker, self.datasource.pk)
+
+    def open_breaker(self):
+        breaker = get_breaker(self.datasource, mock.Mock(side_effect=OSError('down')))
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure(OSError('down'))
+        return breaker
+
+    def test_reset(self):
+        check_available(self.datasource.pk)  # No breaker yet
+        self.open_breaker()
+        with self.assertRaises(DataSourceUnavailable):
+            check_available(self.datasource.pk)
+        reset_breaker(self.datasource.pk)
+        check_available(self.datasource.pk)
+
+    def test_open_breaker_is_checked_before_admission(self):
+        self.open_breaker()
+        with mock.patch('core.dataset.executor.admit') as admit:
+            with self.assertRaises(DataSourceUnavailable):
+                QueryExecutor.execute(self.datasource, 'SELECT 1', use_cache=False)
+            with self.assertRaises(DataSourceUnavailable):
+                QueryExecutor.describe(self.datasource, 'SELECT 1')
+        admit.assert_not_called()
+
+    def test_schema_catalog_goes_through_breaker_and_admission(self):
+        self.open_breaker()
+        with mock.patch('core.data_source.catalog.admit') as admit:
+            with self.assertRaises(DataSourceUnavailable):
+                SchemaCatalog.load(self.datasource)
+        admit.assert_not_called()
+
+        reset_breaker(self.datasource.pk)
+        priorities = []
+
+        def admit(datasource):
+            priorities.append(get_query_priority())
+            raise RuntimeError('stop before connecting')
+
+        with mock.patch('core.data_source.catalog.admit', admit):
+            with self.assertRaises(RuntimeError):
+                SchemaCatalog.load(self.datasource)
+        self.assertEqual(priorities, [BACKGROUND])
@@ -0,0 +1,78 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import duckdb
+from django.test import SimpleTestCase, override_settings
+
+from core.data_source.backends import get_backend
+
+
+class LocalBackendTests(SimpleTestCase):
+    """SQLite/DuckDB data sources only read their own file inside BI_LOCAL_DATA_DIRS."""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.outside_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        self.addCleanup(shutil.rmtree, self.outside_dir, True)
+        override = override_settings(BI_LOCAL_DATA_DIRS=[self.data_dir])
+        override.enable()
+        self.addCleanup(override.disable)
+
+        conn = duckdb.connect(os.path.join(self.data_dir, 'local.duckdb'))
+        conn.execute("CREATE TABLE t AS SELECT 1 AS a")
+        conn.close()
+        conn = sqlite3.connect(os.path.join(self.data_dir, 'local.sqlite3'))
+        conn.execute("CREATE TABLE t (a INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.commit()
+        conn.close()
+        self.secret = os.path.join(self.outside_dir, 'secret.csv')
+        with open(self.secret, 'w') as f:
+            f.write("x\n42\n")
+
+    def query(self, db_type, db_name, sql):
+        conn = get_backend(db_type).connect('', 0, db_name, '', '')
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def test_duckdb_reads_its_file(self):
+        self.assertEqual(self.query('duckdb', 'local.duckdb', "SELECT a FROM t"), [(1,)])
+
+    def test_duckdb_has_no_file_access(self):
+        for sql in (
+            f"SELECT * FROM read_csv('{self.secret}')",
+            f"COPY (SELECT 1) TO '{os.path.join(self.data_dir, 'out.csv')}'",
+            f"ATTACH '{os.path.join(self.data_dir, 'new.duckdb')}' AS other",
+            "SET enable_external_access = true",
+            "CREATE TABLE u (a INTEGER)",
+        ):
+            with self.subTest(sql=sql):
+                with self.assertRaises(duckdb.Error):
+                    self.query('duckdb', 'local.duckdb', sql)
+        self.assertEqual(sorted(os.listdir(self.data_dir)), ['local.duckdb', 'local.sqlite3'])
+
+    def test_duckdb_rejects_memory(self):
+        with self.assertRaises(ValueError):
+            get_backend('duckdb').connect('', 0, ':memory:', '', '')
+
+    def test_sqlite_is_read_only(self):
+        self.assertEqual(self.query('sqlite', 'local.sqlite3', "SELECT a FROM t"), [(1,)])
+        with self.assertRaises(sqlite3.Error):
+            self.query('sqlite', 'local.sqlite3', "INSERT INTO t VALUES (2)")
+
+    def test_paths_outside_data_dirs_are_rejected(self):
+        shutil.copy(os.path.join(self.data_dir, 'local.sqlite3'), self.outside_dir)
+        for db_type, name in (('sqlite', 'local.sqlite3'), ('duckdb', 'local.duckdb')):
+            with self.subTest(db_type=db_type):
+                with self.assertRaises(ValueError):
+                    get_backend(db_type).connect('', 0, os.path.join(self.outside_dir, name), '', '')
+                with self.assertRaises(ValueError):
+                    get_backend(db_type).connect('', 0, os.path.join('..', os.path.basename(self.outside_dir), name), '', '')
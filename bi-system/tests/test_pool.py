@@ -0,0 +1,67 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from core.data_source.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.closed = False
+        self.closed_unlocked = None
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+        if self.pool is not None:
+            # Whether another thread could use the pool while this connection was closing
+            result = []
+
+            def probe():
+                acquired = self.pool._lock.acquire(timeout=1)
+                if acquired:
+                    self.pool._lock.release()
+                result.append(acquired)
+
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+            self.closed_unlocked = result[0]
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def pool(self, **kwargs):
+        options = {'max_size': 2, 'checkout_timeout': 0.05, 'validate_after': 60}
+        options.update(kwargs)
+        pool = ConnectionPool('test', lambda: FakeConnection(pool), 'SELECT 1', **options)
+        return pool
+
+    def test_reuses_idle_connections(self):
+        pool = self.pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['created'], 1)
+
+    def test_checkout_timeout(self):
+        pool = self.pool()
+        pool.acquire()
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_idle_connections_are_closed_outside_the_lock(self):
+        pool = self.pool(idle_timeout=0.01)
+        conn = pool.acquire()
+        pool.release(conn)
+        time.sleep(0.05)
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+        self.assertTrue(conn.closed_unlocked)
+        self.assertEqual(pool.stats()['closed'], 1)
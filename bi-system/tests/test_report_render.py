@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from apps.dashboard import views
+from core.data_source.models import DataSource
+from core.dataset.models import DataSet
+from core.dataset.resolver import SqlResolver
+from core.reporting.models import Report
+
+
+# Queries run inline: worker threads would not see the test's transaction
+@override_settings(BI_RENDER_MAX_WORKERS=1)
+class ReportRenderTests(TestCase):
+    """Chart queries of a report render are collected into one ExecutionPlan (core.dataset.parallel)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data_dir = tempfile.mkdtemp()
+        cls.settings_override = override_settings(BI_LOCAL_DATA_DIRS=[cls.data_dir], BI_QUERY_CACHE_TTL=0)
+        cls.settings_override.enable()
+        conn = sqlite3.connect(os.path.join(cls.data_dir, 'sales.sqlite3'))
+        conn.execute("CREATE TABLE sales (region TEXT, amount INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?)", [('a', 1), ('b', 2), ('b', 3)])
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.data_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        datasource = DataSource.objects.create(
+            name='sales', db_type='sqlite', db_name='sales.sqlite3', password=''
+        )
+        self.dataset = DataSet.objects.create(
+            name='sales', datasource=datasource, sql_script='SELECT * FROM sales'
+        )
+        self.broken = DataSet.objects.create(
+            name='broken', datasource=datasource, sql_script='SELECT * FROM missing_table'
+        )
+
+    def chart(self, title, dataset=None, **kwargs):
+        chart = {
+            'title': title, 'type': 'bar', 'dataset_id': (dataset or self.dataset).pk,
+            'x_axis': 'region', 'y_axis': 'amount', 'aggregation': 'sum',
+        }
+        chart.update(kwargs)
+        return chart
+
+    def render(self, charts):
+        report = Report.objects.create(
+            name='render', code='render-test-report', template_config=json.dumps({'charts': charts})
+        )
+        with mock.patch.object(views, 'fetch_chart_data', wraps=views.fetch_chart_data) as fetch:
+            data = views._get_report_render_data(report, params={}, use_cache=False, resolver=SqlResolver())
+        return data, fetch.call_count
+
+    def test_identical_chart_queries_run_once(self):
+        data, queries = self.render([self.chart('one'), self.chart('two', type='line')])
+        self.assertEqual(queries, 1)
+        first, second = data['charts_data']
+        self.assertEqual(first['data'], second['data'])
+        self.assertEqual(
+            sorted((row['region'], row['amount']) for row in first['data']), [('a', 1), ('b', 5)]
+        )
+
+    def test_different_queries_are_not_merged(self):
+        data, queries = self.render([
+            self.chart('all'),
+            self.chart('filtered', filters=[{'col': 'region', 'op': 'eq', 'val': 'b'}]),
+            self.chart('count', aggregation='count'),
+        ])
+        self.assertEqual(queries, 3)
+        all_rows, filtered, count = data['charts_data']
+        self.assertEqual(len(all_rows['data']), 2)
+        self.assertEqual([(row['region'], row['amount']) for row in filtered['data']], [('b', 5)])
+        self.assertEqual(
+            sorted((row['region'], row['amount']) for row in count['data']), [('a', 1), ('b', 2)]
+        )
+
+    def test_failing_chart_does_not_break_the_others(self):
+        with self.assertLogs('apps.dashboard.views', 'WARNING') as logs:
+            data, queries = self.render([
+                self.chart('one'), self.chart('broken', dataset=self.broken), self.chart('two'),
+            ])
+        self.assertEqual(queries, 2)
+        # The fallbacks of fetch_chart_data are logged, not printed
+        self.assertTrue(any(f'dataset {self.broken.pk}' in line for line in logs.output), logs.output)
+        one, broken, two = data['charts_data']
+        self.assertIsNone(data['visual_error'])
+        self.assertTrue(broken['error'].startswith('查询失败'), broken['error'])
+        self.assertEqual([], broken['data'])
+        for entry in (one, two):
+            self.assertIsNone(entry['error'])
+            self.assertEqual(len(entry['data']), 2)
@@ -0,0 +1,139 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from core.data_source.models import DataSource
+from core.dataset.dependencies import sync_dependencies
+from core.dataset.executor import QueryExecutor
+from core.dataset.models import DataSet
+from core.dataset.resolver import DatasetCycleError, SqlResolver, TemplateParamError, forget_templates
+
+
+class SqlResolverTests(TestCase):
+    """Rendering of {{ param:KEY }} and nested {{ dataset:ID }} placeholders."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data_dir = tempfile.mkdtemp()
+        cls.settings_override = override_settings(BI_LOCAL_DATA_DIRS=[cls.data_dir], BI_QUERY_CACHE_TTL=0)
+        cls.settings_override.enable()
+        conn = sqlite3.connect(os.path.join(cls.data_dir, 'sales.sqlite3'))
+        conn.execute("CREATE TABLE sales (region TEXT, amount INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?)", [('a', 1), ('b', 2), ('b', 3), ('c', 4)])
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.data_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.datasource = DataSource.objects.create(
+            name='sales', db_type='sqlite', db_name='sales.sqlite3', password=''
+        )
+
+    def tearDown(self):
+        forget_templates(DataSet.objects.values_list('id', flat=True))
+
+    def dataset(self, name, sql_script):
+        dataset = DataSet.objects.create(name=name, datasource=self.datasource, sql_script=sql_script)
+        sync_dependencies(dataset)
+        return dataset
+
+    def run_sql(self, sql, params):
+        return QueryExecutor.execute(self.datasource, sql, params=params, use_cache=False)
+
+    def test_params_are_bound_in_placeholder_order(self):
+        child = self.dataset('child', "SELECT * FROM sales WHERE amount >= {{ param:min }}")
+        sql, params = SqlResolver().resolve(
+            "SELECT * FROM {{ dataset:%d }} AS s WHERE region IN ({{ param:regions }}) "
+            "AND region <> '{{ param:skip }}'" % child.pk,
+            {'min': 2, 'regions': ['b', 'c'], 'skip': 'c'}, cte=False,
+        )
+        self.assertNotIn("'b'", sql)
+        self.assertEqual(params, [2, 'b', 'c', 'c'])
+        self.assertEqual(sorted(self.run_sql(sql, params).column('amount')), [2, 3])
+
+    def test_row_count_param_is_inlined_as_integer(self):
+        sql, params = SqlResolver().resolve("SELECT * FROM sales LIMIT {{ param:n }}", {'n': '2'})
+        self.assertEqual((sql, params), ("SELECT * FROM sales LIMIT 2", []))
+        with self.assertRaisesMessage(TemplateParamError, "n"):
+            SqlResolver().resolve("SELECT * FROM sales LIMIT {{ param:n }}", {'n': '2; DROP TABLE sales'})
+
+    def test_cte_mode_emits_each_dataset_once(self):
+        child = self.dataset('child', "SELECT * FROM sales WHERE amount >= {{ param:min }}")
+        script = ("SELECT region FROM {{ dataset:%d }} AS x "
+                  "UNION ALL SELECT region FROM {{ dataset:%d }} AS y") % (child.pk, child.pk)
+        sql, params = SqlResolver().resolve(script, {'min': 3}, cte=True)
+        self.assertTrue(sql.startswith("WITH bi_ds_%d AS" % child.pk))
+        self.assertEqual(sql.count("FROM sales"), 1)
+        self.assertEqual(params, [3])
+        self.assertEqual(len(self.run_sql(sql, params)), 4)
+
+    def test_cte_mode_hoists_nested_with_clause(self):
+        child = self.dataset(
+            'child',
+            "WITH t AS (SELECT region, amount FROM sales WHERE amount > {{ param:min }}) "
+            "SELECT region, SUM(amount) AS total FROM t GROUP BY region",
+        )
+        # The outer script defines its own "t", so the child's one is renamed
+        script = ("WITH t AS (SELECT 'b' AS region) "
+                  "SELECT c.region, c.total FROM {{ dataset:%d }} AS c JOIN t ON t.region = c.region") % child.pk
+        sql, params = SqlResolver().resolve(script, {'min': 1}, cte=True)
+        self.assertEqual(sql.upper().count("WITH"), 1)
+        self.assertIn("t_%d AS (" % child.pk, sql)
+        self.assertIn("FROM t_%d GROUP BY" % child.pk, sql)
+        self.assertEqual(params, [1])
+        result = self.run_sql(sql, params)
+        self.assertEqual(result.column('total'), [5])
+
+    def test_nested_with_clause_in_subquery_mode(self):
+        child = self.dataset('child', "WITH t AS (SELECT * FROM sales) SELECT * FROM t")
+        sql, params = SqlResolver().resolve("SELECT COUNT(*) AS n FROM {{ dataset:%d }} AS c" % child.pk, cte=False)
+        self.assertEqual(self.run_sql(sql, params).column('n'), [4])
+
+    def test_apostrophe_in_comment(self):
+        child = self.dataset('child', "SELECT * FROM sales")
+        script = ("-- customer's orders\n"
+                  "SELECT * FROM {{ dataset:%d }} AS s /* the region's filter */ "
+                  "WHERE region = {{ param:region }} -- don't\nAND amount >= {{ param:min }}") % child.pk
+        for cte in (False, True):
+            sql, params = SqlResolver().resolve(script, {'region': 'b', 'min': 3}, cte=cte)
+            self.assertNotIn("{{", sql)
+            self.assertEqual(params, ['b', 3])
+            self.assertEqual(self.run_sql(sql, params).column('amount'), [3])
+
+    def test_placeholders_in_comments_are_left_alone(self):
+        sql, params = SqlResolver().resolve(
+            "SELECT * FROM sales -- was {{ param:old }}\nWHERE region = '{{ param:region }}'", {'region': 'a'}
+        )
+        self.assertIn("-- was {{ param:old }}", sql)
+        self.assertEqual(params, ['a'])
+
+    def test_mysql_string_literals(self):
+        script = "SELECT 'it\\'s' AS a, \"{{ param:x }}%\" AS b FROM t WHERE c = {{ param:y }}"
+        sql, params = SqlResolver().resolve(script, {'x': 'p', 'y': 1}, db_type='mysql')
+        self.assertEqual(sql, "SELECT 'it\\'s' AS a, ? AS b FROM t WHERE c = ?")
+        self.assertEqual(params, ['p%', 1])
+
+    def test_cycle_is_rejected_on_save(self):
+        first = self.dataset('first', "SELECT * FROM sales")
+        second = self.dataset('second', "SELECT * FROM {{ dataset:%d }} AS f" % first.pk)
+        first.sql_script = "SELECT * FROM {{ dataset:%d }} AS s" % second.pk
+        with self.assertRaises(ValidationError):
+            first.full_clean()
+
+    def test_cycle_saved_before_the_check_raises(self):
+        first = self.dataset('first', "SELECT * FROM sales")
+        second = self.dataset('second', "SELECT * FROM {{ dataset:%d }} AS f" % first.pk)
+        DataSet.objects.filter(pk=first.pk).update(sql_script="SELECT * FROM {{ dataset:%d }} AS s" % second.pk)
+        for cte in (False, True):
+            with self.assertRaises(DatasetCycleError):
+                SqlResolver().resolve("SELECT * FROM {{ dataset:%d }} AS x" % first.pk, cte=cte)
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.reporting.models import ScheduledTask, ScheduledTaskRun
+from core.reporting.scheduler import Scheduler
+
+
+class SchedulerTests(TestCase):
+    """Claiming due ScheduledTask rows (core.reporting.scheduler)."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        patcher = mock.patch('core.reporting.scheduler.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scheduler(self):
+        scheduler = Scheduler(max_workers=2, lease_seconds=600)
+        self.addCleanup(scheduler.stop)
+        # Run submitted tasks inline, inside the test's transaction
+        scheduler.pool = mock.Mock(submit=lambda fn, *args: fn(*args))
+        return scheduler
+
+    def task(self, task_type='cache', cron_expression='0 * * * *', **kwargs):
+        return ScheduledTask.objects.create(
+            name=f'{task_type} task', cron_expression=cron_expression, task_type=task_type,
+            next_run=self.now - timedelta(minutes=1), **kwargs
+        )
+
+    def test_unsupported_task_types_are_skipped(self):
+        task = self.task('email')
+        scheduler = self.scheduler()
+        with self.assertLogs('core.reporting.scheduler', 'WARNING') as logs:
+            self.assertEqual(scheduler.tick(), 0)
+            self.assertEqual(scheduler.tick(), 0)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("unsupported task type 'email'", logs.output[0])
+        self.assertFalse(ScheduledTaskRun.objects.filter(task=task).exists())
+
+    def test_two_workers_claim_a_due_task_once(self):
+        self.task()
+        first, second = self.scheduler(), self.scheduler()
+        # Both nodes read the due task before either claims it
+        seen_first = ScheduledTask.objects.get()
+        seen_second = ScheduledTask.objects.get()
+        self.assertTrue(first.claim(seen_first, self.now))
+        self.assertFalse(second.claim(seen_second, self.now))
+        task = ScheduledTask.objects.get()
+        self.assertEqual(task.lease_owner, first.worker_id)
+        self.assertGreater(task.next_run, self.now)
+
+    def test_leased_task_is_skipped_until_the_lease_expires(self):
+        self.task(lease_owner='other', lease_expires=self.now + timedelta(minutes=5))
+        scheduler = self.scheduler()
+        self.assertEqual(scheduler.tick(), 0)
+
+        # The other node died: its lease runs out and the task is taken over
+        ScheduledTask.objects.update(lease_expires=self.now - timedelta(seconds=1))
+        self.assertEqual(scheduler.tick(), 1)
+        task = ScheduledTask.objects.get()
+        self.assertEqual(task.lease_owner, '')  # Released after the run
+        self.assertGreater(task.next_run, self.now)
+
+    def test_tick_runs_and_records_the_task(self):
+        task = self.task()
+        scheduler = self.scheduler()
+        self.assertEqual(scheduler.tick(), 1)
+        run = ScheduledTaskRun.objects.get(task=task)
+        self.assertEqual(run.status, 'success', run.message)
+        self.assertEqual(run.worker, scheduler.worker_id)
+        self.assertIsNotNone(run.finished_at)
+        task.refresh_from_db()
+        self.assertEqual(task.last_run, run.started_at)
+        # Not due again until the next cron time
+        self.assertEqual(scheduler.tick(), 0)
+
+    def test_failed_run_is_recorded(self):
+        task = self.task()
+        with mock.patch.dict('core.reporting.tasks.TASK_HANDLERS', {'cache': mock.Mock(side_effect=RuntimeError('boom'))}):
+            self.assertEqual(self.scheduler().tick(), 1)
+        run = ScheduledTaskRun.objects.get(task=task)
+        self.assertEqual((run.status, run.message), ('failed', 'boom'))
+
+    def test_invalid_cron_expression_is_unscheduled(self):
+        self.task(cron_expression='not cron')
+        self.assertEqual(self.scheduler().tick(), 0)
+        self.assertIsNone(ScheduledTask.objects.get().next_run)
+        self.assertFalse(ScheduledTaskRun.objects.exists())
+
+    def test_run_task_command(self):
+        task = self.task()
+        call_command('run_task', task.pk, stdout=mock.Mock(), stderr=mock.Mock())
+        self.assertEqual(ScheduledTaskRun.objects.get(task=task).status, 'success')
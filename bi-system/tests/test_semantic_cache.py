@@ -0,0 +1,104 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from core.data_source.models import DataSource
+from core.dataset.executor import QueryExecutor
+
+SQL = "SELECT * FROM sales ORDER BY id"
+ROWS = [(1, 'a', 1), (2, 'b', 2), (3, 'b', 3), (4, 'c', 4), (5, 'c', 5)]
+
+
+class SemanticCacheTests(TestCase):
+    """Narrower requests are answered from a wider cached result without querying the source."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data_dir = tempfile.mkdtemp()
+        cls.settings_override = override_settings(BI_LOCAL_DATA_DIRS=[cls.data_dir], BI_QUERY_CACHE_TTL=300)
+        cls.settings_override.enable()
+        conn = sqlite3.connect(os.path.join(cls.data_dir, 'sales.sqlite3'))
+        conn.execute("CREATE TABLE sales (id INTEGER, region TEXT, amount INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?, ?)", ROWS)
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.data_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['default'].clear()
+        self.datasource = DataSource.objects.create(
+            name='sales', db_type='sqlite', db_name='sales.sqlite3', password=''
+        )
+
+    def execute(self, sql=SQL, **kwargs):
+        """Run a query, returns (result, whether the source was queried)."""
+        with mock.patch.object(QueryExecutor, '_fetch_result', wraps=QueryExecutor._fetch_result) as fetch:
+            result = QueryExecutor.execute(self.datasource, sql, **kwargs)
+        return result, fetch.called
+
+    def assert_hit(self, expected_rows, **kwargs):
+        result, queried = self.execute(**kwargs)
+        self.assertFalse(queried, "answered by the source, not the cache")
+        self.assertEqual(result.rows(), expected_rows)
+
+    def assert_miss(self, sql=SQL, **kwargs):
+        _, queried = self.execute(sql, **kwargs)
+        self.assertTrue(queried, "answered from the cache")
+
+    def test_narrower_limit(self):
+        self.execute()
+        self.assert_hit([list(row) for row in ROWS[:2]], limit=2)
+
+    def test_narrower_limit_of_truncated_result(self):
+        self.execute(limit=3)
+        self.assert_hit([list(row) for row in ROWS[:2]], limit=2)
+        # The truncated result doesn't hold rows 4 and 5
+        self.assert_miss(limit=5)
+        self.assert_miss()
+
+    def test_extra_filter(self):
+        self.execute()
+        self.assert_hit([[4, 'c', 4], [5, 'c', 5]], filters=[{'col': 'amount', 'op': 'gt', 'val': '3'}])
+        self.assert_hit([[4, 'c', 4]], filters=[{'col': 'amount', 'op': 'gt', 'val': '3'}], limit=1)
+
+    def test_column_subset(self):
+        self.execute()
+        self.assert_hit([['a', 1], ['b', 2]], columns=['region', 'amount'], limit=2)
+
+    def test_different_params_miss(self):
+        sql = "SELECT * FROM sales WHERE amount >= ? ORDER BY id"
+        self.execute(sql, params=[2])
+        self.assert_miss(sql, params=[3])
+
+    def test_filter_on_column_not_in_cached_result_misses(self):
+        self.execute(columns=['id', 'region'])
+        self.assert_miss(columns=['id', 'region'], filters=[{'col': 'amount', 'op': 'gt', 'val': '3'}])
+
+    def test_text_filter_misses(self):
+        # Text comparisons depend on the source's collation
+        self.execute()
+        self.assert_miss(filters=[{'col': 'region', 'op': 'eq', 'val': 'b'}])
+
+    def test_aggregate_misses(self):
+        self.execute()
+        spec = QueryExecutor.get_aggregation_spec('region', 'amount', 'sum')
+        self.assert_miss(aggregation=spec)
+        # ... and an aggregated result doesn't answer raw requests either
+        caches['default'].clear()
+        self.execute(aggregation=spec)
+        self.assert_miss(limit=1)
+
+    def test_dataset_version_misses(self):
+        self.execute(cache_version='1')
+        self.assert_miss(cache_version='2', limit=1)
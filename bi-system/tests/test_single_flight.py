@@ -0,0 +1,41 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from core.dataset.cache import SingleFlight
+
+
+class SingleFlightTests(SimpleTestCase):
+    def start_leader(self, flights, release):
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'leader'
+
+        leader = threading.Thread(target=flights.do, args=('q', slow))
+        leader.start()
+        started.wait(5)
+        self.addCleanup(leader.join)
+        self.addCleanup(release.set)
+        return leader
+
+    def test_followers_share_the_leaders_result(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        self.start_leader(flights, release)
+        results = []
+        follower = threading.Thread(target=lambda: results.append(flights.do('q', lambda: 'follower', 5)))
+        follower.start()
+        time.sleep(0.1)  # Let the follower join the flight
+        release.set()
+        follower.join()
+        self.assertEqual(results, ['leader'])
+
+    def test_follower_stops_waiting_after_timeout(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        self.start_leader(flights, release)
+        self.assertEqual(flights.do('q', lambda: 'follower', 0.05), 'follower')